@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+from utils.dedup_utils import build_dedup_key
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    """
+    Populate dedup_key for existing events. Only the oldest row for a given key
+    gets it; later duplicates keep NULL so the unique index can be created.
+    """
+    Event = apps.get_model('events', 'Event')
+    seen = set()
+    for event in Event.objects.order_by('id').only('id', 'title', 'dtstart', 'location').iterator():
+        key = build_dedup_key(
+            event.title, event.dtstart.date() if event.dtstart else None, event.location
+        )
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        Event.objects.filter(pk=event.pk).update(dedup_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_alter_events_id'),
+        ('events', '0005_migrate_events_to_new_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='dedup_key',
+            field=models.CharField(blank=True, help_text="sha256 of 'springcareerfair2024|2024-03-20|studentcenterballroom'", max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='event',
+            name='dedup_key',
+            field=models.CharField(blank=True, help_text="sha256 of 'springcareerfair2024|2024-03-20|studentcenterballroom'", max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='source_shortcode',
+            field=models.CharField(blank=True, db_index=True, help_text="'DOlrnIjkd18'", max_length=32, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE events_event
+                SET source_shortcode = split_part(source_url, '/', 5)
+                WHERE source_shortcode IS NULL
+                  AND source_url LIKE 'https://www.instagram.com/p/%'
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
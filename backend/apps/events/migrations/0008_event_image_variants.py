@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_source_shortcode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='image_variants',
+            field=models.JSONField(blank=True, help_text="{'thumb': 'https://.../events/<sha256>.thumb.webp', 'card': '...', 'full': '...'}", null=True),
+        ),
+    ]
@@ -102,6 +102,18 @@ class Event(models.Model):
         null=True, blank=True,
         help_text="'https://example.com/image1.jpg,https://example.com/image2.jpg'"
     )
+    image_variants = models.JSONField(
+        null=True, blank=True,
+        help_text="{'thumb': 'https://.../events/<sha256>.thumb.webp', 'card': '...', 'full': '...'}"
+    )
+    source_shortcode = models.CharField(
+        max_length=32, blank=True, null=True, db_index=True,
+        help_text="'DOlrnIjkd18'"
+    )
+    dedup_key = models.CharField(
+        max_length=64, unique=True, blank=True, null=True,
+        help_text="sha256 of 'springcareerfair2024|2024-03-20|studentcenterballroom'"
+    )
 
     # Additional event metadata
     reactions = models.JSONField(
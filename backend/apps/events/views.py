@@ -1,3 +1,4 @@
+from django.db.models import Q
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
@@ -7,6 +8,7 @@ from rest_framework.throttling import AnonRateThrottle
 from services.openai_service import generate_embedding
 from utils.embedding_utils import find_similar_events
 from utils.filters import EventFilter
+from utils.openai_usage import SEARCH_TIMEOUT_S
 
 from .models import Events
 
@@ -31,17 +33,27 @@ def get_events(request):
             )
         filtered_queryset = filterset.qs
 
-        # Apply vector similarity search if search term provided
+        # Apply vector similarity search if search term provided, falling back
+        # to lexical matching when the embedding budget or timeout is hit
         if search_term:
-            search_embedding = generate_embedding(search_term)
-            start_date = request.GET.get("start_date")
-            similar_events = find_similar_events(
-                embedding=search_embedding, min_date=start_date
+            search_embedding = generate_embedding(
+                search_term, endpoint="search", timeout=SEARCH_TIMEOUT_S
             )
-            for event in similar_events:
-                print(event["name"], event["similarity"])
-            similar_event_ids = [event["id"] for event in similar_events]
-            filtered_queryset = filtered_queryset.filter(id__in=similar_event_ids)
+            if search_embedding is None:
+                filtered_queryset = filtered_queryset.filter(
+                    Q(title__icontains=search_term)
+                    | Q(description__icontains=search_term)
+                    | Q(location__icontains=search_term)
+                )
+            else:
+                start_date = request.GET.get("start_date")
+                similar_events = find_similar_events(
+                    embedding=search_embedding, min_date=start_date
+                )
+                for event in similar_events:
+                    print(event["name"], event["similarity"])
+                similar_event_ids = [event["id"] for event in similar_events]
+                filtered_queryset = filtered_queryset.filter(id__in=similar_event_ids)
 
         # Return selected event fields (excluding description and embedding)
         fields = [
@@ -57,6 +69,7 @@ def get_events(request):
             "food",
             "registration",
             "image_url",
+            "image_variants",
             "club_type",
             "added_at",
         ]
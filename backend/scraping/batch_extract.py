@@ -0,0 +1,290 @@
+"""
+Bulk event extraction through the OpenAI Batch API, for backfills of many
+posts. Requests run on the batch queue (cheaper, separate from the per-minute
+limits of interactive calls) and the results go through the normal insert
+path. A job directory holds the request JSONL, the post manifest and the job
+state, so each step can be rerun on its own:
+
+    python batch_extract.py prepare JOB_DIR (--archive-dir DIR | --profile HANDLE) [--since YYYY-MM-DD]
+    python batch_extract.py submit JOB_DIR
+    python batch_extract.py ingest JOB_DIR [--no-wait]
+    python batch_extract.py run JOB_DIR ...   (all three)
+
+OPENAI_BATCH_BACKEND=local swaps in the file-based batch client.
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import instagram_feed
+from feed_archive import ArchivedPost, FeedArchive
+from instaloader import Profile
+from logging_config import logger
+from scraper_context import ScraperContext
+
+from apps.events.models import Events
+from services.batch_service import get_batch_client, wait_for_batch
+from services.openai_service import generate_embeddings, openai_service
+from services.storage_service import (
+    collect_image_derivatives,
+    fetch_image,
+    schedule_image_derivatives,
+    upload_image,
+    upload_vision_variant,
+)
+from utils.image_utils import ImageData, ImageRejectedError
+
+POLL_INTERVAL_SECONDS = 60
+# Expired and cancelled batches still return the requests that finished
+INGESTIBLE_STATUSES = {"completed", "expired", "cancelled"}
+
+
+class BatchJob:
+    """Files of one batch extraction job, under a single directory"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.requests_path = self.root / "requests.jsonl"
+        self.posts_path = self.root / "posts.jsonl"
+        self.state_path = self.root / "job.json"
+        self.report_path = self.root / "run_report.json"
+
+    def load_state(self) -> dict:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def save_state(self, state: dict):
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        tmp_path.replace(self.state_path)
+
+    def posts(self) -> dict[str, dict]:
+        with open(self.posts_path, encoding="utf-8") as f:
+            records = (json.loads(line) for line in f if line.strip())
+            return {record["shortcode"]: record for record in records}
+
+
+def _archived_posts(archive_dir, since):
+    archive = FeedArchive(archive_dir)
+    for record in archive.iter_records():
+        if record.get("kind") != "post":
+            continue
+        post = ArchivedPost(record)
+        if post.date_utc.replace(tzinfo=timezone.utc) < since:
+            continue
+        image_data = archive.get_blob(post.image_sha256) if post.image_sha256 else None
+        try:
+            image = ImageData.from_bytes(image_data) if image_data else None
+        except ImageRejectedError as e:
+            logger.warning(f"Skipping archived image of {post.shortcode}: {e}")
+            image = None
+        yield post, image
+
+
+def _profile_posts(loader, handle, since):
+    consec_old_posts = 0
+    for post in Profile.from_username(loader.context, handle).get_posts():
+        if post.date_utc.replace(tzinfo=timezone.utc) < since:
+            consec_old_posts += 1
+            if consec_old_posts >= instagram_feed.MAX_CONSEC_OLD_POSTS:
+                break
+            continue
+        consec_old_posts = 0
+        raw_image_url = instagram_feed.get_post_image_url(post)
+        image = None
+        if raw_image_url:
+            instagram_feed._polite_sleep(1, 3)
+            image = fetch_image(raw_image_url)
+        yield post, image
+
+
+def prepare(job: BatchJob, posts) -> int:
+    """
+    Upload each new post's image and write its extraction request. A job
+    that was already submitted keeps its requests, so rerunning doesn't pay
+    for the same posts twice.
+    """
+    state = job.load_state()
+    if state.get("batch_id"):
+        logger.info(
+            f"Job already submitted as {state['batch_id']}, not preparing it again"
+        )
+        return state.get("requests", 0)
+    job.root.mkdir(parents=True, exist_ok=True)
+    ctx = ScraperContext()
+    written = 0
+    with (
+        open(job.requests_path, "w", encoding="utf-8") as requests_file,
+        open(job.posts_path, "w", encoding="utf-8") as posts_file,
+    ):
+        for post, image in posts:
+            if instagram_feed.get_seen_shortcodes([post.shortcode], ctx):
+                continue
+            image_url = upload_image(image) if image else None
+            vision_url = None
+            if image_url:
+                schedule_image_derivatives(image, image_url)
+                vision_url = upload_vision_variant(image)
+            request = openai_service.extraction_batch_request(
+                post.shortcode, post.caption, image_url, vision_url
+            )
+            requests_file.write(json.dumps(request) + "\n")
+            posts_file.write(
+                json.dumps(
+                    {
+                        "shortcode": post.shortcode,
+                        "owner_username": post.owner_username,
+                        "caption": post.caption,
+                        "date_utc": post.date_utc.isoformat(),
+                        "image_url": image_url,
+                    }
+                )
+                + "\n"
+            )
+            written += 1
+    job.save_state(
+        {
+            **state,
+            "prepared_at": datetime.now(timezone.utc).isoformat(),
+            "requests": written,
+            "image_variants": collect_image_derivatives(),
+        }
+    )
+    logger.info(f"Prepared {written} extraction request(s) in {job.requests_path}")
+    return written
+
+
+def submit(job: BatchJob, client) -> str:
+    state = job.load_state()
+    if state.get("batch_id"):
+        logger.info(f"Job already submitted as {state['batch_id']}")
+        return state["batch_id"]
+    state["batch_id"] = client.submit(job.requests_path)
+    state["submitted_at"] = datetime.now(timezone.utc).isoformat()
+    job.save_state(state)
+    return state["batch_id"]
+
+
+def ingest(job: BatchJob, client, wait=True) -> int:
+    """
+    Write the events of every finished request through the normal insert
+    path. OpenAI usage (the batch at the batch price, plus the embeddings) is
+    written to the job's run report.
+    """
+    state = job.load_state()
+    batch_id = state["batch_id"]
+    status = (
+        wait_for_batch(client, batch_id, POLL_INTERVAL_SECONDS)
+        if wait
+        else client.status(batch_id)
+    )
+    if status not in INGESTIBLE_STATUSES:
+        logger.warning(f"Batch {batch_id} is {status}, nothing to ingest")
+        return 0
+    if status != "completed":
+        logger.warning(f"Batch {batch_id} {status}, ingesting its finished requests")
+
+    posts = job.posts()
+    ingested = set(state.get("ingested", []))
+    instagram_feed.reset_run_metrics()
+    ctx = ScraperContext()
+    ctx.refresh()
+    events_added = 0
+    failed = 0
+    completed = []
+    for result in client.results(batch_id):
+        shortcode = result["custom_id"]
+        record = posts.get(shortcode)
+        if not record or shortcode in ingested:
+            continue
+        events_data = openai_service.parse_extraction_batch_result(
+            result, record["image_url"]
+        )
+        if events_data is None:
+            failed += 1
+            continue
+        post = ArchivedPost(record)
+        completed.append(
+            (post, instagram_feed._complete_events(post, events_data, ctx))
+        )
+
+    # One embeddings request for the whole batch rather than one per event
+    embeddings = iter(
+        generate_embeddings(
+            [
+                event.get("description", "")
+                for _, events in completed
+                for event in events
+            ]
+        )
+    )
+    # Prepare the whole batch before writing, so copies of an event posted by
+    # several clubs are clustered (ctx.run_events) and only one is written
+    prepared = [
+        (
+            post,
+            instagram_feed._prepare_post_events(
+                post, events, ctx, [next(embeddings) for _ in events]
+            ),
+        )
+        for post, events in completed
+    ]
+
+    for post, pending_events in prepared:
+        events_added += instagram_feed._write_post_events(post, pending_events, ctx)
+        ingested.add(post.shortcode)
+
+    for image_url, urls in state.get("image_variants", {}).items():
+        Events.objects.filter(source_image_url=image_url).update(image_variants=urls)
+    state["ingested"] = sorted(ingested)
+    job.save_state(state)
+    instagram_feed.write_run_report(job.report_path, prometheus_path=None)
+    logger.info(
+        f"Ingested {len(ingested)}/{len(posts)} post(s) from batch {batch_id}: "
+        f"{events_added} events added, {failed} failed request(s)"
+    )
+    return events_added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk event extraction via the Batch API"
+    )
+    parser.add_argument("step", choices=["prepare", "submit", "ingest", "run"])
+    parser.add_argument("job_dir", type=Path)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--archive-dir", help="Read posts from a feed archive")
+    source.add_argument("--profile", help="Read posts from a club's profile")
+    parser.add_argument(
+        "--since",
+        type=lambda s: datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=timezone.utc),
+        default=datetime.now(timezone.utc) - timedelta(days=30),
+    )
+    parser.add_argument(
+        "--no-wait", action="store_true", help="Don't wait for the batch"
+    )
+    args = parser.parse_args()
+
+    job = BatchJob(args.job_dir)
+    client = get_batch_client()
+    if args.step in ("prepare", "run"):
+        if args.archive_dir:
+            posts = _archived_posts(args.archive_dir, args.since)
+        elif args.profile:
+            loader = instagram_feed.session()
+            if not loader:
+                logger.critical("Failed to initialize Instagram session, stopping...")
+                sys.exit(1)
+            posts = _profile_posts(loader, args.profile, args.since)
+        else:
+            parser.error("prepare needs --archive-dir or --profile")
+        prepare(job, posts)
+    if args.step in ("submit", "run"):
+        submit(job, client)
+    if args.step in ("ingest", "run"):
+        ingest(job, client, wait=not args.no_wait)
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of club directory page parsing: full trees with html.parser
+and lxml against the targeted (SoupStrainer) parsing the scraper uses, over
+saved pages. Pages are the crawler's HTTP cache entries (see
+wusa_club_directory_scraper.HttpCache) or any *.html fixture files.
+
+    python benchmark_html_parsing.py [--pages DIR] [--repeat N]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from wusa_club_directory_scraper import (
+    CATEGORY_SECTION_CLASS,
+    CATEGORY_SECTION_ONLY,
+    HTTP_CACHE_DIR,
+    LINKS_ONLY,
+    find_club_links,
+    find_instagram_handle,
+    parse_club_page,
+    parse_html,
+)
+
+
+def load_pages(pages_dir) -> list[tuple[str, str]]:
+    """(kind, text) for every saved page: listing, category or club"""
+    pages = []
+    for path in sorted(Path(pages_dir).iterdir()):
+        if path.suffix == ".json":
+            text = json.loads(path.read_text(encoding="utf-8")).get("text") or ""
+        elif path.suffix == ".html":
+            text = path.read_text(encoding="utf-8")
+        else:
+            continue
+        if "club-name-header" in text:
+            pages.append(("club", text))
+        elif "learn more" in text.lower():
+            pages.append(("category", text))
+        else:
+            pages.append(("listing", text))
+    return pages
+
+
+def extract_full(kind, text, parser):
+    """What the scraper reads from a page, from a full parse tree"""
+    soup = parse_html(text, parser=parser)
+    if kind == "listing":
+        section = soup.find(class_=CATEGORY_SECTION_CLASS)
+        return len(section.find_all("a", href=True)) if section else 0
+    if kind == "category":
+        return find_club_links(soup)
+    name_tag = soup.find(class_="club-name-header")
+    club_name = name_tag.get_text(strip=True) if name_tag else None
+    return club_name, find_instagram_handle(soup)
+
+
+def extract_targeted(kind, text, parser):
+    if kind == "listing":
+        section = parse_html(text, CATEGORY_SECTION_ONLY, parser).find(
+            class_=CATEGORY_SECTION_CLASS
+        )
+        return len(section.find_all("a", href=True)) if section else 0
+    if kind == "category":
+        return find_club_links(parse_html(text, LINKS_ONLY, parser))
+    return parse_club_page(text, parser)
+
+
+MODES = {
+    "html.parser, full tree": lambda kind, text: extract_full(
+        kind, text, "html.parser"
+    ),
+    "lxml, full tree": lambda kind, text: extract_full(kind, text, "lxml"),
+    "lxml, targeted": lambda kind, text: extract_targeted(kind, text, "lxml"),
+}
+
+
+def bench(pages, extract, repeat) -> dict[str, float]:
+    """Median parse-and-extract time per page in ms, by page kind"""
+    timings = {}
+    for kind, text in pages:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extract(kind, text)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings.setdefault(kind, []).append(statistics.median(samples))
+    return {kind: statistics.mean(values) for kind, values in timings.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark club page parsing")
+    parser.add_argument("--pages", default=str(HTTP_CACHE_DIR))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"No saved pages in {args.pages}; crawl once or add *.html fixtures")
+        sys.exit(1)
+    mismatches = sum(
+        extract_full(kind, text, "lxml") != extract_targeted(kind, text, "lxml")
+        for kind, text in pages
+    )
+    counts = {kind: sum(k == kind for k, _ in pages) for kind, _ in pages}
+    print(f"{len(pages)} page(s): {counts}; targeted/full mismatches: {mismatches}")
+    for label, extract in MODES.items():
+        per_kind = bench(pages, extract, args.repeat)
+        summary = ", ".join(f"{kind} {ms:.2f}" for kind, ms in sorted(per_kind.items()))
+        print(f"{label:<24} ms/page: {summary}")
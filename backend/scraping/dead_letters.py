@@ -0,0 +1,126 @@
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from logging_config import logger
+
+DEAD_LETTER_DIR = Path(
+    os.getenv("DEAD_LETTER_DIR", Path(__file__).resolve().parent / "dead_letters")
+)
+# Records held in memory before a write, and the size a file rotates at
+DEAD_LETTER_FLUSH_EVERY = int(os.getenv("DEAD_LETTER_FLUSH_EVERY", "100"))
+DEAD_LETTER_MAX_BYTES = int(os.getenv("DEAD_LETTER_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Events that were complete but couldn't be written; replay_dead_letters.py
+# re-inserts these once the database is back
+RECOVERABLE_STATUSES = {"db_unavailable", "no_table", "failed_sql", "insert_error"}
+
+
+def pack_embedding(embedding) -> str | None:
+    """Embedding as base64 little-endian float32, about a quarter of its JSON size"""
+    if embedding is None:
+        return None
+    return base64.b64encode(np.asarray(embedding, dtype="<f4").tobytes()).decode(
+        "ascii"
+    )
+
+
+def unpack_embedding(packed: str | None) -> list[float] | None:
+    if not packed:
+        return None
+    return np.frombuffer(base64.b64decode(packed), dtype="<f4").tolist()
+
+
+def _parse(line: str) -> dict | None:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+class DeadLetterStore:
+    """
+    Events the pipeline extracted but didn't store, with why.
+
+    Records are buffered in memory and appended in batches to gzip-compressed
+    JSONL files, which rotate once they pass DEAD_LETTER_MAX_BYTES. Each
+    process writes its own files, so sharded workers never interleave lines.
+    """
+
+    def __init__(
+        self,
+        root: Path = DEAD_LETTER_DIR,
+        flush_every: int = DEAD_LETTER_FLUSH_EVERY,
+        max_bytes: int = DEAD_LETTER_MAX_BYTES,
+    ):
+        self.root = Path(root)
+        self.flush_every = flush_every
+        self.max_bytes = max_bytes
+        self._buffer = []
+        self._path = None
+        self._lock = threading.Lock()
+
+    def add(self, pending: dict, status: str, reason: str | None = None):
+        """
+        Record a pending event (event_data, club_ig, post_url and, if it was
+        generated, embedding) with why it wasn't stored
+        """
+        record = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "status": status,
+            "reason": reason,
+            "recoverable": status in RECOVERABLE_STATUSES,
+            "club_handle": pending["club_ig"],
+            "url": pending["post_url"],
+            "event": pending["event_data"],
+            "embedding": pack_embedding(pending.get("embedding")),
+        }
+        line = json.dumps(record, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_every:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._path is None or (
+            self._path.exists() and self._path.stat().st_size >= self.max_bytes
+        ):
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            self._path = self.root / f"dead-letters-{stamp}-{os.getpid()}.jsonl.gz"
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self._path, "at", encoding="utf-8") as f:
+                f.writelines(self._buffer)
+            self._buffer.clear()
+        except OSError as e:
+            logger.error(f"Failed to write {len(self._buffer)} dead letter(s): {e}")
+
+    def files(self) -> list[Path]:
+        return sorted(self.root.glob("dead-letters-*.jsonl.gz"))
+
+    def iter_records(self, paths=None):
+        for path in self.files() if paths is None else paths:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = _parse(line)
+                    if record is None:
+                        logger.warning(f"Skipping corrupt dead letter in {path.name}")
+                    else:
+                        yield record
+
+
+# Singleton instance
+dead_letters = DeadLetterStore()
+atexit.register(dead_letters.flush)
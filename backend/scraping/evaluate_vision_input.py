@@ -0,0 +1,104 @@
+"""
+Compare event extraction from full-size images against the downscaled vision
+copies (VISION_MAX_SIDE / VISION_JPEG_QUALITY / OPENAI_IMAGE_DETAIL) over
+archived posts, reporting field agreement, tokens, cost and latency of each.
+Images are sent inline as data URLs, so nothing is uploaded.
+
+    python evaluate_vision_input.py [--archive-dir DIR] [--limit N]
+"""
+
+import argparse
+import base64
+import os
+
+# Always call the model: rule-based extraction would bypass the comparison
+os.environ["RULES_ONLY_EXTRACTION"] = "0"
+
+import instagram_feed  # noqa: F401  (sets up Django and sys.path)
+from feed_archive import ARCHIVE_DIR, ArchivedPost, FeedArchive
+from logging_config import logger
+
+from services.openai_service import openai_service
+from services.storage_service import VISION_JPEG_QUALITY, VISION_MAX_SIDE
+from utils.image_utils import ImageData, ImageRejectedError, render_variant
+from utils.openai_usage import openai_usage
+
+COMPARED_FIELDS = ("name", "date", "start_time", "end_time", "location", "price")
+
+
+def _data_url(data: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def load_corpus(archive_dir, limit=None):
+    """(post, image) pairs for archived posts with a readable image"""
+    archive = FeedArchive(archive_dir)
+    corpus = []
+    for record in archive.iter_records():
+        if record.get("kind") != "post" or not record.get("image_sha256"):
+            continue
+        data = archive.get_blob(record["image_sha256"])
+        try:
+            image = ImageData.from_bytes(data) if data else None
+        except ImageRejectedError:
+            continue
+        if image:
+            corpus.append((ArchivedPost(record), image))
+        if limit and len(corpus) >= limit:
+            break
+    return corpus
+
+
+def run_pass(corpus, make_url) -> tuple[dict, dict]:
+    """Extract every post with the given image URL builder; returns events and usage"""
+    openai_usage.reset()
+    results = {}
+    for post, image in corpus:
+        results[post.shortcode] = openai_service.extract_events_from_caption(
+            post.caption, make_url(image)
+        )
+    return results, openai_usage.report()["endpoints"].get("extraction", {})
+
+
+def agreement(baseline: dict, candidate: dict) -> dict[str, float]:
+    """Share of posts whose first event agrees on each field (and on event count)"""
+    counts = dict.fromkeys((*COMPARED_FIELDS, "events"), 0)
+    for shortcode, events in baseline.items():
+        other = candidate.get(shortcode) or []
+        counts["events"] += len(events) == len(other)
+        first, other_first = (events or [{}])[0], (other or [{}])[0]
+        for field in COMPARED_FIELDS:
+            counts[field] += first.get(field) == other_first.get(field)
+    total = len(baseline) or 1
+    return {field: count / total for field, count in counts.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate downscaled vision input")
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR))
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.archive_dir, args.limit)
+    logger.info(f"Comparing vision input on {len(corpus)} archived post(s)")
+    full, full_usage = run_pass(
+        corpus, lambda image: _data_url(image.data, image.content_type)
+    )
+    small, small_usage = run_pass(
+        corpus,
+        lambda image: _data_url(
+            render_variant(
+                image.decode(), VISION_MAX_SIDE, "JPEG", VISION_JPEG_QUALITY
+            ),
+            "image/jpeg",
+        ),
+    )
+
+    for label, usage in (("full", full_usage), (f"{VISION_MAX_SIDE}px", small_usage)):
+        logger.info(
+            f"{label}: {usage.get('prompt_tokens', 0)} prompt tokens, "
+            f"${usage.get('cost_usd', 0.0):.4f}, "
+            f"{usage.get('mean_latency_s', 0.0):.2f}s mean latency"
+        )
+    for field, share in agreement(full, small).items():
+        logger.info(f"Agreement on {field}: {share:.0%}")
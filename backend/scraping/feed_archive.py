@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from logging_config import logger
+
+ARCHIVE_DIR = Path(
+    os.getenv("FEED_ARCHIVE_DIR", Path(__file__).resolve().parent / "archive")
+)
+
+
+class FeedArchive:
+    """
+    Append-only archive of fetched feed posts for offline replay.
+
+    Records go to gzip-compressed JSONL files, one per UTC day (appending adds
+    a gzip member, which gzip readers handle transparently). Image bytes are
+    stored once each under blobs/<sha256>.
+
+    - post records: raw post node, caption, owner, timestamp and image hash
+    - extraction records: the events the LLM returned for a post
+    """
+
+    def __init__(self, root: Path = ARCHIVE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+
+    def _append(self, record: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        line = json.dumps(record, default=str, ensure_ascii=False) + "\n"
+        with gzip.open(self.root / f"posts-{day}.jsonl.gz", "at", encoding="utf-8") as f:
+            f.write(line)
+
+    def put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_dir / digest
+        if not path.exists():
+            self.blob_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes | None:
+        try:
+            return (self.blob_dir / digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def append_post(self, post, image_url: str | None, image_data: bytes | None):
+        try:
+            self._append(
+                {
+                    "kind": "post",
+                    "archived_at": datetime.now(timezone.utc).isoformat(),
+                    "shortcode": post.shortcode,
+                    "owner_username": post.owner_username,
+                    "date_utc": post.date_utc.isoformat(),
+                    "caption": post.caption,
+                    "image_url": image_url,
+                    "image_sha256": self.put_blob(image_data) if image_data else None,
+                    "node": post._node,
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Failed to archive post {post.shortcode}: {e}")
+
+    def append_extraction(self, shortcode: str, events: list[dict]):
+        try:
+            self._append({"kind": "extraction", "shortcode": shortcode, "events": events})
+        except Exception as e:
+            logger.warning(f"Failed to archive extraction for {shortcode}: {e}")
+
+    def iter_records(self):
+        for path in sorted(self.root.glob("posts-*.jsonl.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class ArchivedPost:
+    """Stand-in for instaloader.Post built from an archived post record"""
+
+    def __init__(self, record: dict):
+        self.shortcode = record["shortcode"]
+        self.owner_username = record["owner_username"]
+        self.caption = record["caption"]
+        self.date_utc = datetime.fromisoformat(record["date_utc"])
+        # When the post was scraped; records from other sources fall back to its date
+        archived_at = record.get("archived_at")
+        self.archived_at = (
+            datetime.fromisoformat(archived_at) if archived_at else self.date_utc
+        )
+        self.image_url = record.get("image_url")
+        self.image_sha256 = record.get("image_sha256")
+        self._node = record.get("node") or {}
@@ -0,0 +1,139 @@
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from logging_config import logger
+
+CHECKPOINT_FILE = Path(
+    os.getenv(
+        "FEED_CHECKPOINT_FILE", Path(__file__).resolve().parent / "feed_checkpoint.json"
+    )
+)
+
+# Post states, in pipeline order
+STARTED = "started"
+UPLOADED = "uploaded"
+EXTRACTED = "extracted"
+DONE = "done"
+FAILED = "failed"
+IN_FLIGHT_STATES = (STARTED, UPLOADED, EXTRACTED)
+# Posts a resumed run processes again
+UNFINISHED_STATES = (*IN_FLIGHT_STATES, FAILED)
+
+
+class FeedCheckpoint:
+    """
+    Durable progress for process_recent_feed, rewritten atomically after every
+    post state change.
+
+    - high_water: newest post of a completed run with nothing older left
+      undone; anything at or before it doesn't need to be walked again
+    - run: the current (or last interrupted) run and the state of each post it
+      touched, including the uploaded image URL and extracted events so a
+      resumed post skips the work it already did
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_FILE):
+        self.path = Path(path)
+        self.high_water = None
+        self.run = None
+
+    @classmethod
+    def load(cls, path: Path = CHECKPOINT_FILE):
+        checkpoint = cls(path)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                data = json.load(f)
+            checkpoint.high_water = data.get("high_water")
+            checkpoint.run = data.get("run")
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint.path}: {e}")
+        return checkpoint
+
+    def save(self):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"high_water": self.high_water, "run": self.run}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path.replace(self.path)
+
+    @property
+    def interrupted(self) -> bool:
+        return bool(self.run) and not self.run.get("completed")
+
+    def start_run(self, resume: bool = False):
+        """Begin a run; with resume, an interrupted run's post states are kept"""
+        if resume and self.interrupted:
+            logger.info(
+                f"Resuming run started at {self.run['started_at']} "
+                f"({len(self.unfinished_shortcodes())} post(s) unfinished)"
+            )
+        else:
+            if self.interrupted:
+                logger.warning("Previous run was interrupted; starting over (use --resume)")
+            self.run = {
+                "started_at": _now_iso(),
+                "completed": False,
+                "posts": {},
+            }
+        self.save()
+
+    def finish_run(self, walked_to_cutoff: bool = True):
+        """
+        Complete the run. high_water only advances to the newest post with no
+        failed or unfinished post older than it, and not at all if the walk
+        stopped (at max_posts) before the cutoff, since the posts it never
+        reached are older than everything it did.
+        """
+        newest = self._newest_settled() if walked_to_cutoff else None
+        if newest and (
+            not self.high_water or newest["post_time"] > self.high_water["post_time"]
+        ):
+            self.high_water = newest
+        self.run["completed"] = True
+        self.save()
+
+    def _newest_settled(self) -> dict | None:
+        newest = None
+        posts = sorted(self.run["posts"].items(), key=lambda item: item[1]["post_time"])
+        for shortcode, post in posts:
+            if post.get("state") != DONE:
+                break
+            newest = {"post_time": post["post_time"], "shortcode": shortcode}
+        return newest
+
+    def high_water_time(self) -> datetime | None:
+        if not self.high_water:
+            return None
+        return datetime.fromisoformat(self.high_water["post_time"])
+
+    def get(self, shortcode: str) -> dict:
+        return self.run["posts"].get(shortcode, {})
+
+    def is_done(self, shortcode: str) -> bool:
+        return self.get(shortcode).get("state") == DONE
+
+    def unfinished_shortcodes(self) -> list[str]:
+        """Posts left half-processed or failed, which a resumed run retries"""
+        return [
+            shortcode
+            for shortcode, post in self.run["posts"].items()
+            if post.get("state") in UNFINISHED_STATES
+        ]
+
+    def update(self, post, state: str, **fields):
+        """Record a post's new state (plus e.g. image_url or events) and persist"""
+        post_time = post.date_utc.replace(tzinfo=timezone.utc).isoformat()
+        record = self.run["posts"].setdefault(
+            post.shortcode, {"owner": post.owner_username, "post_time": post_time}
+        )
+        record.update(fields, state=state, updated_at=_now_iso())
+        self.save()
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
@@ -7,30 +7,59 @@ import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
 django.setup()
-from django.db import connection, close_old_connections, OperationalError, ProgrammingError
-from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, close_old_connections, transaction, OperationalError, ProgrammingError
 from django.utils import timezone as django_timezone
 
-import csv
+import argparse
+import asyncio
 import random
 import time
 import traceback
-import re
-import requests
+import httpx
 import json
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
-from instaloader import Instaloader
+from instaloader import Instaloader, Post, Profile, instaloadercontext
+from psycopg2.extras import execute_values
 
-from apps.clubs.models import Clubs
 from apps.events.models import Events
-from services.openai_service import extract_events_from_caption, generate_embedding
-from services.storage_service import upload_image_from_url
+from services.openai_service import (
+    extract_events_from_caption,
+    extract_events_from_caption_async,
+    generate_embedding,
+    is_fallback_extraction,
+)
+from services.storage_service import (
+    fetch_image,
+    fetch_image_async,
+    collect_image_derivatives,
+    schedule_image_derivatives,
+    upload_image,
+    upload_vision_variant,
+)
 from zyte_setup import setup_zyte
 from logging_config import logger
+from dead_letters import dead_letters
+from feed_archive import FeedArchive
+from feed_checkpoint import (
+    DONE,
+    EXTRACTED,
+    FAILED,
+    IN_FLIGHT_STATES,
+    STARTED,
+    UPLOADED,
+    FeedCheckpoint,
+)
+from scraper_context import ScraperContext, scraper_context
 from utils.embedding_utils import find_similar_events
+from utils.event_classifier import event_classifier
+from utils.dedup_utils import build_dedup_key, normalize_string
+from utils.openai_usage import openai_usage
+from utils.proxy_pool import ProxyPool
+from utils.run_metrics import pipeline_metrics
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
@@ -42,8 +71,32 @@ USER_AGENTS = [
 
 MAX_POSTS = int(os.getenv("MAX_POSTS", "100"))
 MAX_CONSEC_OLD_POSTS = 10
+FEED_PAGE_SIZE = 12
+# Feed posts processed concurrently by process_recent_feed_async
+FEED_CONCURRENCY = int(os.getenv("FEED_CONCURRENCY", "4"))
+RUN_REPORT_FILE = Path(
+    os.getenv(
+        "RUN_REPORT_FILE", Path(__file__).resolve().parent / "logs" / "run_report.json"
+    )
+)
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE")
 CUTOFF_DAYS = 2
 
+
+@dataclass
+class RunOptions:
+    """How far a feed or profile walk goes, and what it records along the way"""
+
+    cutoff: datetime | None = None
+    max_posts: int = MAX_POSTS
+    max_consec_old_posts: int = MAX_CONSEC_OLD_POSTS
+    resume: bool = False
+    archive: FeedArchive | None = None
+    concurrency: int = FEED_CONCURRENCY
+
+    def resolved_cutoff(self) -> datetime:
+        return self.cutoff or datetime.now(timezone.utc) - timedelta(days=CUTOFF_DAYS)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -108,54 +161,162 @@ def extract_s3_filename_from_url(image_url: str) -> str:
     return f"events/{filename}"
 
 
-def normalize_string(s):
-    if not s:
-        return ""
-    return re.sub(r"\W+", "", s).lower().strip()
+def _is_richer_copy(new_image, new_desc, old_image, old_desc):
+    """New copy wins if it adds an image or a meaningfully longer description"""
+    return bool((not old_image and new_image) or (
+        len(new_desc or "") > len(old_desc or "") + 10
+    ))
+
+
+def _prefer_run_entry(new, old):
+    return _is_richer_copy(
+        new["image_url"], new["description"], old["image_url"], old["description"]
+    )
+
+
+def _supersede_run_entry(earlier, replace_ids, ctx):
+    """
+    A richer copy replaces an event seen earlier this run: an unwritten
+    earlier copy is dropped (its replacements carry over), a written one is
+    replaced by id. Returns whether a vector search is still needed, which is
+    only when the earlier copy's outcome is unknown (still preparing, still
+    writing, or not written).
+    """
+    outcome, pending = ctx.run_events.supersede(earlier)
+    if outcome == "dropped":
+        replace_ids.extend(pending["replace_ids"])
+        return False
+    if outcome == "written" and pending.get("event_id") is not None:
+        replace_ids.append(pending["event_id"])
+        return False
+    return True
+
 
+def is_duplicate_event(event_data, ctx=None):
+    """Check for duplicate events (same name, date, location) with one indexed lookup"""
+    return _find_duplicate_event(event_data, ctx) is not None
 
-def is_duplicate_event(event_data):
-    """Check for duplicate events (same name, date, location, time)"""
-    name = normalize_string(event_data.get("name") or event_data.get("title"))
-    location = normalize_string(event_data.get("location"))
+
+def _find_duplicate_event(event_data, ctx=None):
+    """
+    Return (image_url, description) of the stored event sharing this event's
+    dedup key, or None if there is no such event.
+    """
+    name = event_data.get("name") or event_data.get("title")
+    location = event_data.get("location")
     date_str = (event_data.get("date") or "").strip()
     if not date_str:
-        return False
+        return None
     try:
         event_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
         logger.warning(f"Invalid date for duplicate check: '{date_str}'")
-        return False
+        return None
 
-    tables = _db_table_names()
+    tables = (ctx or scraper_context).tables
     try:
         if "events_event" in tables:
             close_old_connections()
-            candidates = Events.objects.filter(dtstart__date=event_date)
-            for c in candidates:
-                c_name = normalize_string(getattr(c, "title", "") or getattr(c, "name", ""))
-                c_loc = normalize_string(getattr(c, "location", "") or "")
-                if c_name == name and c_loc == location:
-                    return True
-            return False
+            dedup_key = build_dedup_key(name, event_date, location)
+            return (
+                Events.objects.filter(dedup_key=dedup_key)
+                .values_list("source_image_url", "description")
+                .first()
+            )
         elif "events" in tables:
+            # Legacy table has no dedup_key column; normalize in SQL instead
             with connection.cursor() as cur:
                 cur.execute(
-                    "SELECT name, location FROM public.events WHERE date = %s", [event_date]
+                    """
+                    SELECT image_url, description FROM public.events
+                    WHERE date = %s
+                      AND lower(regexp_replace(coalesce(name, ''), '\\W+', '', 'g')) = %s
+                      AND lower(regexp_replace(coalesce(location, ''), '\\W+', '', 'g')) = %s
+                    LIMIT 1
+                    """,
+                    [event_date, normalize_string(name), normalize_string(location)],
                 )
-                for row in cur.fetchall():
-                    c_name, c_loc = row[0], row[1] or ""
-                    if normalize_string(c_name) == name and normalize_string(c_loc) == location:
-                        return True
-            return False
+                return cur.fetchone()
         else:
-            return False
+            return None
     except (ProgrammingError, OperationalError) as db_err:
         logger.error(f"Database error during duplicate check (table missing or DB down): {db_err}")
-        return False
+        return None
     except Exception as e:
         logger.error(f"Database error during duplicate check: {e!s}")
-        return False
+        return None
+
+
+def _upsert_events_sql(rows):
+    """
+    Insert rows into events_event in one statement. A row with the same
+    dedup_key is only overwritten when the new copy is richer (see
+    _is_richer_copy), so concurrent scraper runs cannot both insert the same
+    event. Rows must have distinct dedup keys.
+    Returns (id, dedup_key) for every row inserted or merged; existing copies
+    that were kept are left out.
+    """
+    sql = """
+    INSERT INTO events_event
+      (title, description, location, dtstamp, dtstart, dtend, dtstart_utc,
+       dtend_utc, utc_start_ts, utc_end_ts, all_day, status, raw_json,
+       source_url, source_image_url, reactions, embedding, food, registration,
+       added_at, price, club_type, ig_handle, source_shortcode, dedup_key)
+    VALUES %s
+    ON CONFLICT (dedup_key) DO UPDATE SET
+      title = EXCLUDED.title,
+      description = EXCLUDED.description,
+      dtend = EXCLUDED.dtend,
+      dtend_utc = EXCLUDED.dtend_utc,
+      utc_end_ts = EXCLUDED.utc_end_ts,
+      raw_json = EXCLUDED.raw_json,
+      source_url = EXCLUDED.source_url,
+      source_shortcode = EXCLUDED.source_shortcode,
+      source_image_url = EXCLUDED.source_image_url,
+      embedding = EXCLUDED.embedding,
+      food = EXCLUDED.food,
+      registration = EXCLUDED.registration,
+      price = EXCLUDED.price,
+      club_type = EXCLUDED.club_type,
+      ig_handle = EXCLUDED.ig_handle
+    WHERE (events_event.source_image_url IS NULL AND EXCLUDED.source_image_url IS NOT NULL)
+       OR length(coalesce(EXCLUDED.description, ''))
+          > length(coalesce(events_event.description, '')) + 10
+    RETURNING id, dedup_key
+    """
+    template = """
+    (%s, %s, %s, now(), %s, %s, %s, %s, %s, %s, false, %s, %s,
+     %s, %s, %s, %s, %s, %s, now(), %s, %s, %s, %s, %s)
+    """
+    vals = [
+        (
+            row.get("title"),
+            row.get("description"),
+            row.get("location"),
+            row.get("dtstart"),
+            row.get("dtend"),
+            row.get("dtstart"),
+            row.get("dtend"),
+            row.get("dtstart"),
+            row.get("dtend"),
+            row.get("status"),
+            json.dumps(row.get("raw_json") or {}),
+            row.get("source_url"),
+            row.get("source_image_url"),
+            json.dumps(row.get("reactions") or {}),
+            row.get("embedding"),
+            row.get("food"),
+            row.get("registration", False),
+            row.get("price"),
+            row.get("club_type"),
+            row.get("ig_handle"),
+            row.get("source_shortcode"),
+            row.get("dedup_key"),
+        )
+        for row in rows
+    ]
+    with connection.cursor() as cur:
+        return execute_values(cur.cursor, sql, vals, template=template, fetch=True)
 
 
 def _insert_legacy_event_sql(create_kwargs):
@@ -193,57 +354,28 @@ def _insert_legacy_event_sql(create_kwargs):
         return row[0] if row else None
 
 
-def append_event_to_csv(
-    event_data, club_ig, post_url, status="success", embedding=None
-):
-    csv_file = Path(__file__).resolve().parent / "events_scraped.csv"
-    csv_file.parent.mkdir(parents=True, exist_ok=True)
-    file_exists = csv_file.exists()
-
-    with open(csv_file, "a", newline="", encoding="utf-8") as csvfile:
-        fieldnames = [
-            "club_handle",
-            "url",
-            "name",
-            "date",
-            "start_time",
-            "end_time",
-            "location",
-            "price",
-            "food",
-            "registration",
-            "image_url",
-            "description",
-            "status",
-            "reactions",
-            "embedding",
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(
-            {
-                "club_handle": club_ig,
-                "url": post_url,
-                "name": event_data.get("name", ""),
-                "date": event_data.get("date", ""),
-                "start_time": event_data.get("start_time", ""),
-                "end_time": event_data.get("end_time", ""),
-                "location": event_data.get("location", ""),
-                "price": event_data.get("price", ""),
-                "food": event_data.get("food", ""),
-                "registration": event_data.get("registration", False),
-                "image_url": event_data.get("image_url", ""),
-                "description": event_data.get("description", ""),
-                "status": status,
-                "reactions": json.dumps(event_data.get("reactions") or {}),
-                "embedding": embedding or "",
-            }
-        )
+def record_dead_letter(pending, status, reason=None, ctx=None):
+    """Record an extracted event (a pending event) that wasn't stored, for review or replay"""
+    pipeline_metrics.count("dead_letters")
+    pending["dead_letter"] = status
+    (ctx or scraper_context).dead_letters.add(pending, status, reason)
 
 
-def insert_event_to_db(event_data, club_ig, post_url):
+def insert_event_to_db(event_data, club_ig, post_url, ctx=None):
     """Map scraped event data to Event model fields, insert to DB"""
+    pending = prepare_event_for_db(event_data, club_ig, post_url, ctx)
+    if not pending:
+        return False
+    return write_events_to_db([pending], ctx) > 0
+
+
+def prepare_event_for_db(event_data, club_ig, post_url, ctx=None, embedding=None):
+    """
+    Map scraped event data to Event model fields, generate its embedding
+    (unless one is given) and resolve duplicates. Nothing is written; returns
+    a pending event for write_events_to_db, or None if the event is a duplicate.
+    """
+    ctx = ctx or scraper_context
     event_name = event_data.get("name") or event_data.get("title") or ""
     date = event_data.get("date") or ""
     start_time = event_data.get("start_time") or ""
@@ -268,8 +400,8 @@ def insert_event_to_db(event_data, club_ig, post_url):
     except Exception:
         tz = django_timezone.utc
     
-    embedding = None
-    
+    dedup_key = build_dedup_key(event_name, event_date, location)
+
     try:
         if event_date:
             if start_time:
@@ -303,41 +435,67 @@ def insert_event_to_db(event_data, club_ig, post_url):
         dtstart_obj = None
         dtend_obj = None
  
+    tables = ctx.tables
+    replace_ids = []
+    run_entry = None
     try:
-        # Duplicate check (legacy)
-        if is_duplicate_event(event_data):
+        # Exact duplicate check: one probe on the dedup_key index. A stored copy
+        # is only revisited if this one is richer; the upsert in
+        # write_events_to_db re-checks the same rule atomically.
+        with pipeline_metrics.stage("dedup"):
+            stored = _find_duplicate_event(event_data, ctx)
+        if stored and not _is_richer_copy(image_url, description, *stored):
             logger.info(
                 f"Duplicate event detected, skipping {event_name} on {date} at {location}"
             )
-            return False
+            return None
+        if stored and "events_event" not in tables:
+            logger.info(
+                f"Duplicate event detected in legacy table, skipping {event_name} on {date} at {location}"
+            )
+            return None
 
-        # Get club_type based on club handle from Clubs model
-        try:
-            club = Clubs.objects.get(ig=club_ig)
-            club_type = club.club_type
-        except Clubs.DoesNotExist:
-            club_type = None
+        # Get club_type based on club handle from the cached Clubs map
+        club_type = ctx.club_type(club_ig)
+        if not ctx.has_club(club_ig):
             logger.warning(
                 f"Club with handle {club_ig} not found, inserting event with null club_type"
             )
 
         try:
-            embedding = generate_embedding(event_data.get("description", ""))
+            if embedding is None:
+                with pipeline_metrics.stage("embedding"):
+                    embedding = generate_embedding(event_data.get("description", ""))
         except Exception as emb_err:
             logger.warning(f"Embedding generation failed: {emb_err!s}")
             embedding = None
 
-        use_dtstart = True
-        try:
-            Events._meta.get_field("dtstart")
-        except FieldDoesNotExist:
-            use_dtstart = False
-            
-        try:
-            # Pass event date as min_date to filter out past events first for performance
-            similar_events = find_similar_events(
-                embedding, threshold=0.90, limit=10, min_date=event_date
+        use_dtstart = ctx.has_dtstart
+
+        # Copies of an event already seen this run resolve in memory instead of
+        # by vector search: only a richer copy goes on, replacing the earlier one
+        run_entry = {"image_url": image_url, "description": description}
+        earlier, accepted = ctx.run_events.claim(
+            event_date, embedding, run_entry, _prefer_run_entry
+        )
+        if earlier:
+            pipeline_metrics.count("in_run_duplicates")
+        if not accepted:
+            logger.info(
+                f"Duplicate of an event seen this run, skipping {event_name} on {date}"
             )
+            return None
+        search_db = _supersede_run_entry(earlier, replace_ids, ctx) if earlier else True
+
+        try:
+            if not search_db:
+                similar_events = []
+            else:
+                # Pass event date as min_date to filter out past events first for performance
+                with pipeline_metrics.stage("dedup"):
+                    similar_events = find_similar_events(
+                        embedding, threshold=0.90, limit=10, min_date=event_date
+                    )
             candidate_ids = [row["id"] for row in similar_events]
             if candidate_ids and event_date:
                 if use_dtstart:
@@ -346,19 +504,16 @@ def insert_event_to_db(event_data, club_ig, post_url):
                     qs = Events.objects.filter(id__in=candidate_ids, date=event_date)
                 
                 for existing in qs:
+                    if getattr(existing, "dedup_key", None) == dedup_key:
+                        continue  # merged in place by the upsert
                     # Only replace if new event has image but existing doesn't,
                     # or if new description is longer (more info)
-                    new_img = image_url
                     old_img = getattr(existing, "source_image_url", None) or getattr(existing, "image_url", None)
-                    new_desc = description or ""
-                    old_desc = existing.description or ""
-                    if (not old_img and new_img) or (
-                        len(new_desc) > len(old_desc) + 10
-                    ):
+                    if _is_richer_copy(image_url, description, old_img, existing.description):
                         logger.info(
                             f"Replacing older event: id={existing.id} with newer one"
                         )
-                        existing.delete()
+                        replace_ids.append(existing.id)
         except Exception as dedup_err:
             logger.error(f"Duplicate check via utility failed: {dedup_err}")   
     except Exception as e:
@@ -385,71 +540,186 @@ def insert_event_to_db(event_data, club_ig, post_url):
         "notes": None,
     }
 
-    tables = _db_table_names()
-    try:
-        if "events_event" in tables:
-            Events.objects.create(
-                ig_handle=club_ig,
-                source_url=post_url,
-                title=event_name,
-                dtstart=dtstart_obj or None,
-                dtend=dtend_obj or None,
-                location=location,
-                price=price,
-                food=food,
-                registration=registration,
-                source_image_url=image_url or None,
-                description=description,
-                embedding=embedding,
-                club_type=club_type,
-                status="scraped",
+    pending = {
+        "event_data": event_data,
+        "club_ig": club_ig,
+        "post_url": post_url,
+        "embedding": embedding,
+        "replace_ids": replace_ids,
+        "legacy_row": create_kwargs,
+        "row": {
+            "ig_handle": club_ig,
+            "source_url": post_url,
+            "source_shortcode": shortcode_from_url(post_url),
+            "title": event_name,
+            "dtstart": dtstart_obj or None,
+            "dtend": dtend_obj or None,
+            "location": location,
+            "price": price,
+            "food": food,
+            "registration": registration,
+            "source_image_url": image_url or None,
+            "description": description,
+            "embedding": embedding,
+            "club_type": club_type,
+            "status": "scraped",
+            "raw_json": event_data,
+            "dedup_key": dedup_key,
+        },
+    }
+    if run_entry:
+        if not ctx.run_events.attach(run_entry, pending):
+            logger.info(
+                f"Dropping {event_name}: a richer copy was found while preparing it"
             )
-            return True
-        elif "events" in tables:
-            new_id = _insert_legacy_event_sql(create_kwargs)
-            if new_id:
-                logger.info(f"Inserted legacy event id={new_id}")
-                append_event_to_csv(event_data, club_ig, post_url, status="success", embedding=embedding)
-                return True
-            else:
-                logger.error("Legacy SQL insert failed (no id returned)")
-                append_event_to_csv(event_data, club_ig, post_url, status="failed_sql")
-                return False
+            return None
+        pending["run_entry"] = run_entry
+    return pending
+
+
+def _begin_writes(pending_events, ctx):
+    """
+    Mark pending events as being written, dropping copies superseded by a
+    richer one found later in the run. Each check happens under the run index
+    lock, so a copy is either dropped here or waited for by the richer one.
+    """
+    claimed = []
+    for pending in pending_events:
+        if ctx.run_events.begin_write(pending.get("run_entry")):
+            claimed.append(pending)
         else:
-            logger.error("No events table available to insert")
-            append_event_to_csv(event_data, club_ig, post_url, status="no_table", embedding=embedding)
-            return False
+            logger.info(f"Dropping {pending['row']['title']}: a richer copy was found this run")
+    return claimed
+
+
+def _dedupe_pending_events(pending_events):
+    """Keep the richest copy of events sharing a dedup key within one batch"""
+    by_key = {}
+    unkeyed = []
+    for pending in pending_events:
+        row = pending["row"]
+        key = row["dedup_key"]
+        if not key:
+            unkeyed.append(pending)
+            continue
+        kept = by_key.get(key)
+        if kept is None or _is_richer_copy(
+            row["source_image_url"],
+            row["description"],
+            kept["row"]["source_image_url"],
+            kept["row"]["description"],
+        ):
+            by_key[key] = pending
+        if kept is not None:
+            pipeline_metrics.count("insert_duplicates")
+            logger.info(f"Duplicate event within batch: {row['title']} on {row['dtstart']}")
+    return list(by_key.values()) + unkeyed
+
+
+def write_events_to_db(pending_events, ctx=None):
+    """
+    Write pending events from prepare_event_for_db in one transaction: replaced
+    rows are deleted and new rows upserted together, so a crash never leaves a
+    post half-written. Returns the number of events written.
+    """
+    ctx = ctx or scraper_context
+    claimed = _begin_writes(pending_events, ctx)
+    try:
+        return _write_events(_dedupe_pending_events(claimed), ctx)
+    finally:
+        # Copies waiting to replace these resolve by event_id once it's set
+        for pending in claimed:
+            ctx.run_events.end_write(pending.get("run_entry"))
+
+
+def _write_events(pending_events, ctx):
+    if not pending_events:
+        return 0
+    tables = ctx.tables
+    written = []
+    try:
+        with transaction.atomic():
+            replace_ids = {i for pending in pending_events for i in pending["replace_ids"]}
+            if replace_ids:
+                Events.objects.filter(id__in=replace_ids).delete()
+
+            if "events_event" in tables:
+                rows = [pending["row"] for pending in pending_events]
+                ids_by_key = {key: event_id for event_id, key in _upsert_events_sql(rows)}
+                for pending in pending_events:
+                    pending["event_id"] = ids_by_key.get(pending["row"]["dedup_key"])
+                    if pending["event_id"] is not None:
+                        written.append(pending)
+                    else:
+                        pipeline_metrics.count("insert_duplicates")
+                        logger.info(
+                            f"Duplicate event detected on insert, kept existing {pending['row']['title']}"
+                        )
+            elif "events" in tables:
+                for pending in pending_events:
+                    new_id = _insert_legacy_event_sql(pending["legacy_row"])
+                    pending["event_id"] = new_id
+                    if new_id:
+                        logger.info(f"Inserted legacy event id={new_id}")
+                        written.append(pending)
+                    else:
+                        logger.error("Legacy SQL insert failed (no id returned)")
+                        record_dead_letter(
+                            pending,
+                            status="failed_sql",
+                            reason="legacy insert returned no id",
+                            ctx=ctx,
+                        )
+            else:
+                logger.error("No events table available to insert")
+                for pending in pending_events:
+                    record_dead_letter(
+                        pending, status="no_table", reason="no events table", ctx=ctx
+                    )
+                return 0
     except (ProgrammingError, OperationalError) as db_err:
         logger.error(f"Database error (table/field mismatch or DB down): {db_err}")
-        append_event_to_csv(event_data, club_ig, post_url, status="db_unavailable", embedding=embedding)
-        return False
+        for pending in pending_events:
+            record_dead_letter(
+                pending, status="db_unavailable", reason=str(db_err), ctx=ctx
+            )
+        return 0
     except Exception as e:
-        logger.exception(f"Unexpected error inserting event: {e}")
-        return False
+        logger.exception(f"Unexpected error inserting events: {e}")
+        for pending in pending_events:
+            record_dead_letter(pending, status="insert_error", reason=str(e), ctx=ctx)
+        return 0
 
+    return len(written)
 
-def _db_table_names():
-    try:
-        return set(connection.introspection.table_names())
-    except Exception:
-        return set()
-    
 
-def get_seen_shortcodes():
-    """Fetches all post shortcodes from events table in DB"""
-    logger.info("Fetching seen shortcodes from the database...")
-    tables = _db_table_names()
+def shortcode_from_url(post_url):
+    """'https://www.instagram.com/p/DOlrnIjkd18/' -> 'DOlrnIjkd18'"""
+    if not post_url:
+        return None
+    parts = [p for p in post_url.split("/") if p]
+    return parts[-1] if parts else None
+
+
+def get_seen_shortcodes(shortcodes, ctx=None):
+    """Returns which of the given post shortcodes already have events in the DB"""
+    shortcodes = [code for code in shortcodes if code]
+    if not shortcodes:
+        return set()
+    tables = (ctx or scraper_context).tables
     try:
         if "events_event" in tables:
-            events = Events.objects.filter(source_url__isnull=False).values_list("source_url", flat=True)
-            shortcodes = {url.split("/")[-2] for url in events if url}
-            return shortcodes
+            close_old_connections()
+            return set(
+                Events.objects.filter(source_shortcode__in=shortcodes).values_list(
+                    "source_shortcode", flat=True
+                )
+            )
         elif "events" in tables:
+            urls = [f"https://www.instagram.com/p/{code}/" for code in shortcodes]
             with connection.cursor() as cur:
-                cur.execute("SELECT url FROM public.events WHERE url IS NOT NULL")
-                rows = cur.fetchall()
-                shortcodes = {row[0].split("/")[-2] for row in rows if row and row[0]}
-                return shortcodes
+                cur.execute("SELECT url FROM public.events WHERE url = ANY(%s)", [urls])
+                return {shortcode_from_url(row[0]) for row in cur.fetchall() if row[0]}
         else:
             logger.warning("No events table found; treating all posts as unseen")
             return set()
@@ -458,126 +728,458 @@ def get_seen_shortcodes():
         return set()
 
 
-def process_recent_feed(
-    loader,
-    cutoff=datetime.now(timezone.utc) - timedelta(days=CUTOFF_DAYS),
-    max_posts=MAX_POSTS,
-    max_consec_old_posts=MAX_CONSEC_OLD_POSTS,
-):
-    # Process Instagram feed posts and extract event info. Stops
-    #   scraping once posts become older than cutoff.
-    events_added = 0
-    posts_processed = 0
-    consec_old_posts = 0
-    logger.info(f"Starting feed processing with cutoff: {cutoff}")
+def _iter_posts_with_seen(posts, ctx=None, page_size=FEED_PAGE_SIZE):
+    """
+    Yields (post, seen) pairs, looking up seen shortcodes with one indexed
+    query per page of posts rather than loading the whole history up front.
+    """
+    page = []
+    for post in posts:
+        page.append(post)
+        if len(page) >= page_size:
+            seen = get_seen_shortcodes([p.shortcode for p in page], ctx)
+            yield from ((p, p.shortcode in seen) for p in page)
+            page = []
+    if page:
+        seen = get_seen_shortcodes([p.shortcode for p in page], ctx)
+        yield from ((p, p.shortcode in seen) for p in page)
 
-    seen_shortcodes = get_seen_shortcodes()
 
-    for post in loader.get_feed_posts():
+def reset_run_metrics():
+    """Start this run's stage timings and OpenAI usage from zero"""
+    pipeline_metrics.reset()
+    openai_usage.reset()
+
+
+def write_run_report(path=RUN_REPORT_FILE, prometheus_path=METRICS_PROMETHEUS_FILE):
+    """Write per-stage timings, counters and OpenAI usage for this run"""
+    usage = openai_usage.report()
+    posts = pipeline_metrics.report()["counters"].get("posts_processed", 0)
+    usage["cost_per_post_usd"] = usage["cost_usd"] / posts if posts else 0.0
+    logger.info(
+        f"OpenAI usage: {usage['tokens']} tokens, ${usage['cost_usd']:.4f} "
+        f"(${usage['cost_per_post_usd']:.4f}/post)"
+    )
+    try:
+        pipeline_metrics.write_report(path, prometheus_path, extra={"openai": usage})
+        logger.info(f"Wrote run report to {path}")
+    except OSError as e:
+        logger.warning(f"Failed to write run report: {e}")
+
+
+def _polite_sleep(low, high):
+    """Random delay between requests so the scraper doesn't look like a bot"""
+    time.sleep(random.uniform(low, high))
+
+
+def _start_post(post, checkpoint):
+    """Saved in-flight work for a post (empty if none) and mark it started"""
+    saved = checkpoint.get(post.shortcode) if checkpoint else {}
+    if saved.get("state") not in IN_FLIGHT_STATES:
+        saved = {}
+    if checkpoint:
+        checkpoint.update(post, saved.get("state") or STARTED)
+    return saved
+
+
+def _skip_non_event(post, checkpoint):
+    """
+    Score the caption with the local pre-classifier; clear non-events are
+    marked done without downloading the image or calling the LLM
+    """
+    keep, score = event_classifier.is_probable_event(post.caption)
+    if keep:
+        pipeline_metrics.count("preclassifier_kept")
+        logger.debug(f"Pre-classifier kept post {post.shortcode} (score {score:.2f})")
+        return False
+    pipeline_metrics.count("preclassifier_skipped")
+    logger.info(
+        f"Pre-classifier skipped post {post.shortcode} as a likely non-event (score {score:.2f})"
+    )
+    if checkpoint:
+        checkpoint.update(post, DONE, events_added=0, skipped="preclassifier")
+    return True
+
+
+def _upload_post_image(image):
+    """
+    Upload a post's image and its LLM-input copy, and queue its display
+    derivatives. Returns (image_url, vision_url)
+    """
+    image_url = upload_image(image)
+    if not image_url:
+        return None, None
+    schedule_image_derivatives(image, image_url)
+    return image_url, upload_vision_variant(image)
+
+
+def store_image_derivatives():
+    """Wait for the run's image derivatives and record their URLs on the events"""
+    with pipeline_metrics.stage("image_derivatives"):
+        derivatives = collect_image_derivatives()
+        for image_url, urls in derivatives.items():
+            Events.objects.filter(source_image_url=image_url).update(image_variants=urls)
+
+
+def _check_extraction(events_data, stage):
+    """
+    Fail the llm_extraction stage only for the service's fallback result; no
+    events is the normal answer for a non-event post, counted separately
+    """
+    if not events_data:
+        pipeline_metrics.count("llm_no_events")
+    elif is_fallback_extraction(events_data):
+        stage.fail()
+
+
+def _record_extraction(post, events_data, checkpoint, archive):
+    pipeline_metrics.count("events_extracted", len(events_data or []))
+    if archive:
+        archive.append_extraction(post.shortcode, events_data or [])
+    if checkpoint:
+        checkpoint.update(post, EXTRACTED, events=events_data or [])
+
+
+def _collect_pending_events(post, events_data, ctx, today=None):
+    """
+    Validate a post's extracted events and prepare the complete ones for
+    writing. Events before today (the current UTC date by default) are skipped.
+    """
+    return _prepare_post_events(post, _complete_events(post, events_data, ctx, today), ctx)
+
+
+def _prepare_post_events(post, events_data, ctx, embeddings=None):
+    """
+    Prepare a post's complete events for writing. embeddings, if given, are
+    the events' embeddings in order (None entries are generated here).
+    """
+    post_url = f"https://www.instagram.com/p/{post.shortcode}/"
+    embeddings = embeddings or [None] * len(events_data)
+    pending_events = []
+    for event_data, embedding in zip(events_data, embeddings, strict=True):
+        pending = prepare_event_for_db(
+            event_data, post.owner_username, post_url, ctx, embedding=embedding
+        )
+        if pending:
+            pending_events.append(pending)
+    return pending_events
+
+
+def _complete_events(post, events_data, ctx, today=None):
+    """
+    A post's upcoming events that have every required field; the others are
+    skipped, or dead-lettered if fields are missing
+    """
+    post_url = f"https://www.instagram.com/p/{post.shortcode}/"
+    today = today or datetime.now(timezone.utc).date()
+
+    complete = []
+    for event_data in events_data:
+        date_str = (event_data.get("date") or "").strip()
+        if not date_str:
+            logger.warning(
+                f"Skipping event '{event_data.get('name', 'Unknown')}' from post {post.shortcode}: missing date"
+            )
+            continue
         try:
-            post_time = post.date_utc.replace(tzinfo=timezone.utc)
-            if post.shortcode in seen_shortcodes or post_time < cutoff:
-                consec_old_posts += 1
-                if consec_old_posts >= max_consec_old_posts:
-                    logger.info(
-                        f"Reached {max_consec_old_posts} consecutive old posts, stopping."
-                    )
-                    break
-                continue  # to next post
-
-            consec_old_posts = 0
-            posts_processed += 1
-            logger.info("\n" + "-" * 50)
-            logger.info(f"Processing post: {post.shortcode} by {post.owner_username}")
-
-            # Safely get image URL and upload to S3
-            raw_image_url = get_post_image_url(post)
-            if raw_image_url:
-                time.sleep(random.uniform(1, 3))
-                image_url = upload_image_from_url(raw_image_url)
-                logger.info(f"Uploaded image to S3: {image_url}")
-            else:
-                logger.warning(
-                    f"No image URL found for post {post.shortcode}, skipping image upload"
-                )
-                image_url = None
+            event_date = datetime.strptime(event_data.get("date"), "%Y-%m-%d").date()
+        except ValueError:
+            logger.warning(
+                f"Skipping event '{event_data.get('name', 'Unkown')}' from post {post.shortcode}: invalid date '{date_str}'"
+            )
+            continue
+        if event_date < today:
+            logger.info(
+                f"Skipping event '{event_data.get('name')}' with past date {event_date}"
+            )
+            continue
+
+        if (
+            event_data.get("name")
+            and event_data.get("date")
+            and event_data.get("location")
+            and event_data.get("start_time")
+        ):
+            complete.append(event_data)
+        else:
+            missing_fields = [
+                key
+                for key in ["name", "date", "location", "start_time"]
+                if not event_data.get(key)
+            ]
+            logger.warning(
+                f"Missing required fields for event '{event_data.get('name', 'Unknown')}': {missing_fields}, skipping event"
+            )
+            record_dead_letter(
+                {"event_data": event_data, "club_ig": post.owner_username, "post_url": post_url},
+                status="missing_fields",
+                reason=", ".join(missing_fields),
+                ctx=ctx,
+            )
+    return complete
+
+
+def _write_post_events(post, pending_events, ctx):
+    """Write a post's prepared events in one transaction. Returns events added"""
+    if not pending_events:
+        return 0
+    with pipeline_metrics.stage("db_insert") as stage:
+        written = write_events_to_db(pending_events, ctx)
+        # Duplicates aren't errors (they're counted as insert_duplicates),
+        # events that had to be dead-lettered are
+        if any(pending.get("dead_letter") for pending in pending_events):
+            stage.fail()
+    logger.info(
+        f"Added {written}/{len(pending_events)} event(s) from {post.owner_username}"
+    )
+    return written
+
 
-            events_data = extract_events_from_caption(post.caption, image_url)
-            if not events_data or len(events_data) == 0:
-                logger.warning(
-                    f"AI client returned no events for post {post.shortcode}"
+def process_post(post, ctx=None, checkpoint=None, archive=None, today=None):
+    """
+    Upload the image, extract events and write them for a single feed post.
+    Work recorded in the checkpoint (uploaded image, extracted events) is
+    reused, and with an archive the raw post, image and extraction are saved
+    for offline replay. Posts the pre-classifier rules out are skipped before
+    any download. today overrides the date past events are dropped before.
+    Returns the number of events added, or None if none were extracted.
+    """
+    ctx = ctx or scraper_context
+    saved = _start_post(post, checkpoint)
+    if not saved and _skip_non_event(post, checkpoint):
+        return None
+
+    if saved.get("state") in (UPLOADED, EXTRACTED):
+        image_url = saved.get("image_url")
+        vision_url = saved.get("vision_url")
+    else:
+        # Safely get image URL and upload to S3
+        raw_image_url = get_post_image_url(post)
+        image = None
+        image_url = vision_url = None
+        if raw_image_url:
+            _polite_sleep(1, 3)
+            image = fetch_image(raw_image_url)
+            if image:
+                image_url, vision_url = _upload_post_image(image)
+            logger.info(f"Uploaded image to S3: {image_url}")
+        else:
+            logger.warning(
+                f"No image URL found for post {post.shortcode}, skipping image upload"
+            )
+        if archive:
+            archive.append_post(post, raw_image_url, image.data if image else None)
+        if checkpoint:
+            checkpoint.update(post, UPLOADED, image_url=image_url, vision_url=vision_url)
+
+    if saved.get("state") == EXTRACTED:
+        events_data = saved.get("events") or []
+    else:
+        with pipeline_metrics.stage("llm_extraction") as stage:
+            events_data = extract_events_from_caption(
+                post.caption, image_url, vision_url
+            )
+            _check_extraction(events_data, stage)
+        _record_extraction(post, events_data, checkpoint, archive)
+    if not events_data or len(events_data) == 0:
+        logger.warning(
+            f"AI client returned no events for post {post.shortcode}"
+        )
+        if checkpoint:
+            checkpoint.update(post, DONE, events_added=0)
+        return None
+
+    # Process each event returned by the AI, then write the post's
+    # events in one transaction
+    pending_events = _collect_pending_events(post, events_data, ctx, today)
+    written = _write_post_events(post, pending_events, ctx)
+    if checkpoint:
+        checkpoint.update(post, DONE, events_added=written)
+    return written
+
+
+async def _db_thread(func, *args):
+    """
+    Run Django ORM work in a worker thread. The thread's connection is closed
+    afterwards (per CONN_MAX_AGE), as Django does at the end of a request, so
+    the thread pool doesn't hold one idle connection per thread.
+    """
+
+    def run():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return await asyncio.to_thread(run)
+
+
+async def process_post_async(post, http, ctx=None, checkpoint=None, archive=None):
+    """
+    asyncio version of process_post: the image download and event extraction
+    are awaited on the shared HTTP and OpenAI clients, while S3 and DB work
+    (boto3, Django) run in worker threads, Django through _db_thread. Checkpoint and archive updates stay
+    on the event loop thread.
+    """
+    ctx = ctx or scraper_context
+    saved = _start_post(post, checkpoint)
+    if not saved and _skip_non_event(post, checkpoint):
+        return None
+
+    if saved.get("state") in (UPLOADED, EXTRACTED):
+        image_url = saved.get("image_url")
+        vision_url = saved.get("vision_url")
+    else:
+        raw_image_url = get_post_image_url(post)
+        image = None
+        image_url = vision_url = None
+        if raw_image_url:
+            await asyncio.sleep(random.uniform(1, 3))
+            image = await fetch_image_async(raw_image_url, http)
+            if image:
+                image_url, vision_url = await asyncio.to_thread(
+                    _upload_post_image, image
                 )
-                continue
+            logger.info(f"Uploaded image to S3: {image_url}")
+        else:
+            logger.warning(
+                f"No image URL found for post {post.shortcode}, skipping image upload"
+            )
+        if archive:
+            archive.append_post(post, raw_image_url, image.data if image else None)
+        if checkpoint:
+            checkpoint.update(post, UPLOADED, image_url=image_url, vision_url=vision_url)
 
-            post_url = f"https://www.instagram.com/p/{post.shortcode}/"
-            today = datetime.now(timezone.utc).date()
+    if saved.get("state") == EXTRACTED:
+        events_data = saved.get("events") or []
+    else:
+        with pipeline_metrics.stage("llm_extraction") as stage:
+            events_data = await extract_events_from_caption_async(
+                post.caption, image_url, vision_url
+            )
+            _check_extraction(events_data, stage)
+        _record_extraction(post, events_data, checkpoint, archive)
+    if not events_data:
+        logger.warning(f"AI client returned no events for post {post.shortcode}")
+        if checkpoint:
+            checkpoint.update(post, DONE, events_added=0)
+        return None
 
-            # Process each event returned by the AI
-            for event_data in events_data:
-                date_str = (event_data.get("date") or "").strip()
-                if not date_str:
-                    logger.warning(
-                        f"Skipping event '{event_data.get('name', 'Unknown')}' from post {post.shortcode}: missing date"
-                    )
-                    continue
-                try:
-                    event_date = datetime.strptime(event_data.get("date"), "%Y-%m-%d").date()
-                except ValueError:
-                    logger.warning(
-                        f"Skipping event '{event_data.get('name', 'Unkown')}' from post {post.shortcode}: invalid date '{date_str}'"
-                    )
-                    continue
-                if event_date < today:
-                    logger.info(
-                        f"Skipping event '{event_data.get('name')}' with past date {event_date}"
-                    )
-                    continue
-
-                if (
-                    event_data.get("name")
-                    and event_data.get("date")
-                    and event_data.get("location")
-                    and event_data.get("start_time")
-                ):
-                    if insert_event_to_db(event_data, post.owner_username, post_url):
-                        events_added += 1
-                        logger.info(
-                            f"Successfully added event '{event_data.get('name')}' from {post.owner_username}"
-                        )
-                    else:
-                        logger.error(
-                            f"Failed to add event '{event_data.get('name')}' from {post.owner_username}"
-                        )
-                else:
-                    missing_fields = [
-                        key
-                        for key in ["name", "date", "location", "start_time"]
-                        if not event_data.get(key)
-                    ]
-                    logger.warning(
-                        f"Missing required fields for event '{event_data.get('name', 'Unknown')}': {missing_fields}, skipping event"
-                    )
-                    embedding = generate_embedding(event_data["description"])
-                    append_event_to_csv(
-                        event_data,
-                        post.owner_username,
-                        post_url,
-                        status="missing_fields",
-                        embedding=embedding,
-                    )
+    pending_events = await _db_thread(_collect_pending_events, post, events_data, ctx)
+    written = await _db_thread(_write_post_events, post, pending_events, ctx)
+    if checkpoint:
+        checkpoint.update(post, DONE, events_added=written)
+    return written
 
-            time.sleep(random.uniform(15, 45))
 
-            if posts_processed >= max_posts:
-                logger.info(f"Reached max post limit of {max_posts}, stopping")
-                break
+async def _resume_unfinished_posts(loader, http, ctx, checkpoint, archive=None):
+    """
+    Finish posts an interrupted run left half-processed and retry the ones
+    it failed. Returns events added
+    """
+    events_added = 0
+    for shortcode in checkpoint.unfinished_shortcodes():
+        logger.info(f"Resuming unfinished post: {shortcode}")
+        try:
+            post = await asyncio.to_thread(Post.from_shortcode, loader.context, shortcode)
+            events_added += (
+                await process_post_async(post, http, ctx, checkpoint, archive) or 0
+            )
+        except Exception as e:
+            logger.error(f"Error resuming post {shortcode}: {e!s}")
+            checkpoint.run["posts"][shortcode]["state"] = FAILED
+            checkpoint.save()
+    return events_added
+
+
+async def process_recent_feed_async(loader, options=None, ctx=None, checkpoint=None):
+    """
+    Walk the feed (paced by the polite sleeps) and process up to
+    options.concurrency posts at once in a TaskGroup. A post's failure is
+    contained to that post; cancelling the run cancels every in-flight post with it.
+    """
+    options = options or RunOptions()
+    cutoff = options.resolved_cutoff()
+    archive = options.archive
+    posts_processed = 0
+    consec_old_posts = 0
+    walked_to_cutoff = True
+    totals = {"events_added": 0}
+    reset_run_metrics()
+    ctx = ctx or ScraperContext()
+    await _db_thread(ctx.refresh)
+    checkpoint = checkpoint or FeedCheckpoint.load()
+    checkpoint.start_run(resume=options.resume)
+    semaphore = asyncio.Semaphore(options.concurrency)
+
+    async def run_post(post, http):
+        # Failures are contained to the post; only cancellation propagates
+        try:
+            added = await process_post_async(post, http, ctx, checkpoint, archive)
+            if added is not None:
+                totals["events_added"] += added
+                pipeline_metrics.count("events_added", added)
         except Exception as e:
             logger.error(
                 f"Error processing post {post.shortcode} by {post.owner_username}: {e!s}"
             )
             logger.error(f"Traceback: {traceback.format_exc()}")
-            time.sleep(random.uniform(3, 8))
-            continue  # with next post
+            pipeline_metrics.count("posts_failed")
+            checkpoint.update(post, FAILED, error=str(e))
+        finally:
+            semaphore.release()
+
+    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as http:
+        if options.resume:
+            totals["events_added"] += await _resume_unfinished_posts(
+                loader, http, ctx, checkpoint, archive
+            )
+            # Everything up to the last completed run's high water is already done
+            high_water = checkpoint.high_water_time()
+            if high_water and high_water > cutoff:
+                cutoff = high_water
+        logger.info(f"Starting feed processing with cutoff: {cutoff}")
+
+        feed_posts = pipeline_metrics.timed_iter("feed_fetch", loader.get_feed_posts())
+        feed = _iter_posts_with_seen(feed_posts, ctx)
+        async with asyncio.TaskGroup() as tasks:
+            while True:
+                # Feed pages and seen-checks are blocking (instaloader, Django)
+                item = await _db_thread(next, feed, None)
+                if item is None:
+                    break
+                post, seen = item
+                post_time = post.date_utc.replace(tzinfo=timezone.utc)
+                if seen or post_time < cutoff or checkpoint.is_done(post.shortcode):
+                    consec_old_posts += 1
+                    if consec_old_posts >= options.max_consec_old_posts:
+                        logger.info(
+                            f"Reached {options.max_consec_old_posts} consecutive old posts, stopping."
+                        )
+                        break
+                    continue  # to next post
+
+                consec_old_posts = 0
+                posts_processed += 1
+                pipeline_metrics.count("posts_processed")
+                logger.info("\n" + "-" * 50)
+                logger.info(f"Processing post: {post.shortcode} by {post.owner_username}")
+
+                await semaphore.acquire()
+                tasks.create_task(run_post(post, http))
+
+                if posts_processed >= options.max_posts:
+                    logger.info(f"Reached max post limit of {options.max_posts}, stopping")
+                    walked_to_cutoff = False
+                    break
+                await asyncio.sleep(random.uniform(15, 45))
+
+    checkpoint.finish_run(walked_to_cutoff)
+    dead_letters.flush()
+    await _db_thread(store_image_derivatives)
+    write_run_report()
+    events_added = totals["events_added"]
     logger.info(
         f"Feed processing completed. Processed {posts_processed} posts, added {events_added} events"
     )
@@ -585,89 +1187,144 @@ def process_recent_feed(
     logger.info(f"Added {events_added} event(s) to Supabase")
 
 
-def test_zyte_proxy(country="CA"):
+def process_recent_feed(loader, options=None, ctx=None, checkpoint=None):
+    # Process Instagram feed posts and extract event info. Stops
+    #   scraping once posts become older than options.cutoff.
+    asyncio.run(process_recent_feed_async(loader, options, ctx, checkpoint))
+
+
+def process_profile(loader, handle, options=None, ctx=None):
     """
-    Patch requests.Session to route through Zyte with geolocation,
-    test Zyte proxy routing and geolocation
+    Process one club's recent posts from its profile instead of the feed.
+    Pinned posts come first regardless of age, so old posts only stop the walk
+    after options.max_consec_old_posts in a row. Returns counts of new posts,
+    posts with events and events added, plus the newest post time seen
     """
-    zyte_cert_path = setup_zyte()
-    zyte_proxy = os.getenv("ZYTE_PROXY")
-    logger.debug(f"Zyte proxy config: proxy={zyte_proxy!r}, cert={zyte_cert_path!s}")
-    
-    if not zyte_proxy:
-        logger.warning("ZYTE_PROXY not set - skipping proxied geolocation test and trying direct request")
+    options = options or RunOptions()
+    cutoff = options.resolved_cutoff()
+    ctx = ctx or scraper_context
+    posts_processed = 0
+    event_posts = 0
+    events_added = 0
+    consec_old_posts = 0
+    newest_post = None
+
+    profile = Profile.from_username(loader.context, handle)
+    profile_posts = pipeline_metrics.timed_iter("feed_fetch", profile.get_posts())
+    for post, seen in _iter_posts_with_seen(profile_posts, ctx):
+        post_time = post.date_utc.replace(tzinfo=timezone.utc)
+        newest_post = max(newest_post or post_time, post_time)
+        if seen or post_time < cutoff:
+            consec_old_posts += 1
+            if consec_old_posts >= options.max_consec_old_posts:
+                break
+            continue
+
+        consec_old_posts = 0
+        posts_processed += 1
+        pipeline_metrics.count("posts_processed")
+        logger.info(f"Processing post: {post.shortcode} by {handle}")
         try:
-            resp = requests.get("https://ipapi.co/json/", timeout=15)
-            resp.raise_for_status()
-            logger.info("Direct geolocation test succeeded")
-            return True
+            added = process_post(post, ctx, archive=options.archive)
         except Exception as e:
-            logger.warning(f"Direct geolocation test failed: {e!s}")
-            return False
-    
-    old_request = requests.Session.request
-
-    def zyte_request(self, method, url, **kwargs):
-        headers = kwargs.get("headers", {})
-        headers["Zyte-Geolocation"] = country
-        kwargs["headers"] = headers
-        kwargs["proxies"] = {"http": zyte_proxy, "https": zyte_proxy}
-        if zyte_cert_path:
-            kwargs["verify"] = str(zyte_cert_path)
-        kwargs["timeout"] = kwargs.get("timeout", 30)
-        return old_request(self, method, url, **kwargs)
-
-    requests.Session.request = zyte_request
-    
-    logger.debug(f"Testing Zyte proxy geolocation: {country}")
-    try:
-        resp = requests.get(
-            "https://ipapi.co/json/",
-            timeout=30,
-            verify=str(zyte_cert_path) if zyte_cert_path else True,
-            proxies={"http": zyte_proxy, "https": zyte_proxy}
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        logger.debug(f"Connected via Zyte proxy")
-        logger.debug(f"Public IP: {data.get('ip')}")
-        logger.debug(f"Country: {data.get('country_name')} ({data.get('country')})")
-        logger.debug(f"City: {data.get('city')}")
-    except Exception as e:
-        logger.warning(f"Proxied geolocation failed: {e!s}")
-    return True
+            logger.error(f"Error processing post {post.shortcode} by {handle}: {e!s}")
+            pipeline_metrics.count("posts_failed")
+            _polite_sleep(3, 8)
+            continue
+        if added is not None:
+            event_posts += 1
+            events_added += added
+            pipeline_metrics.count("events_added", added)
+        _polite_sleep(15, 45)
+
+        if posts_processed >= options.max_posts:
+            break
+    return {
+        "posts": posts_processed,
+        "event_posts": event_posts,
+        "events_added": events_added,
+        "newest_post": newest_post.isoformat() if newest_post else None,
+    }
+
+
+def setup_proxy(country="CA"):
+    """
+    Route Instagram requests through the Zyte endpoints (PROXY_URLS or
+    ZYTE_PROXY) with geolocation; all other traffic goes direct.
+    Health-checks the endpoints and returns the pool for session()
+    """
+    zyte_cert_path = setup_zyte()
+    proxy_pool = ProxyPool.from_env(
+        headers={"Zyte-Geolocation": country}, cert_path=zyte_cert_path
+    )
+    if not proxy_pool.endpoints:
+        logger.warning("No proxy configured - Instagram requests go direct")
+        return proxy_pool
+    healthy = proxy_pool.health_check()
+    logger.info(f"{healthy}/{len(proxy_pool.endpoints)} proxy endpoint(s) healthy ({country})")
+    return proxy_pool
+
+
+def _route_instaloader(loader, proxy_pool):
+    """
+    Mount the proxy pool on the loader's session and on the temporary
+    copies instaloader makes for GraphQL and iPhone API queries
+    """
+    if not proxy_pool or not proxy_pool.endpoints:
+        return
+    proxy_pool.mount(loader.context._session)
+    # Unwrap a previous login's hook rather than stacking another one
+    copy_session = getattr(
+        instaloadercontext.copy_session, "wrapped", instaloadercontext.copy_session
+    )
+
+    def proxied_copy_session(session, request_timeout=None):
+        return proxy_pool.mount(copy_session(session, request_timeout))
+
+    proxied_copy_session.wrapped = copy_session
+    instaloadercontext.copy_session = proxied_copy_session
 
 
 @handle_instagram_errors
-def session():
+def session(account=None, proxy_pool=None):
+    """
+    Log in as account (username plus cookies), defaulting to the env
+    credentials, routing Instagram requests through proxy_pool if given
+    """
+    account = account or {
+        "username": USERNAME,
+        "csrftoken": CSRFTOKEN,
+        "sessionid": SESSIONID,
+        "ds_user_id": DS_USER_ID,
+        "mid": MID,
+        "ig_did": IG_DID,
+    }
+    username = account["username"]
     L = Instaloader(user_agent=random.choice(USER_AGENTS))
     try:
         SESSION_CACHE_DIR = Path(os.getenv("GITHUB_WORKSPACE", ".")) / ".insta_cache"
         SESSION_CACHE_DIR.mkdir(exist_ok=True)
+        session_file = SESSION_CACHE_DIR / f"session-{username}"
         files = [p for p in SESSION_CACHE_DIR.iterdir() if p.is_file()]
-        if files:
+        if files and not session_file.exists() and username == USERNAME:
             session_file = files[0]
-        else:
-            session_file = SESSION_CACHE_DIR / f"session-{USERNAME}"
     except Exception as e:
-        session_file = Path(__file__).resolve().parent.parent / ("session-" + USERNAME)
+        session_file = Path(__file__).resolve().parent.parent / ("session-" + username)
     try:
         if session_file.exists():
-            L.load_session_from_file(USERNAME, filename=str(session_file))
+            L.load_session_from_file(username, filename=str(session_file))
             logger.info(f"Loaded session from file: {session_file!s}")
         else:
             logger.info("No session file found, falling back to env")
             L.load_session(
-                USERNAME,
+                username,
                 {
-                    "csrftoken": CSRFTOKEN,
-                    "sessionid": SESSIONID,
-                    "ds_user_id": DS_USER_ID,
-                    "mid": MID,
-                    "ig_did": IG_DID,
+                    key: account.get(key)
+                    for key in ("csrftoken", "sessionid", "ds_user_id", "mid", "ig_did")
                 },
             )
         L.save_session_to_file(filename=str(session_file))
+        _route_instaloader(L, proxy_pool)
         return L
     except Exception as e:
         logger.error(f"Failed to load session: {e}")
@@ -675,12 +1332,31 @@ def session():
 
 
 if __name__ == "__main__":
-    test_zyte_proxy("CA")  
+    parser = argparse.ArgumentParser(description="Scrape events from the Instagram feed")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Finish an interrupted run and skip posts a previous run already covered",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        default=os.getenv("FEED_ARCHIVE") == "1",
+        help="Archive raw posts, images and extractions for replay_feed.py",
+    )
+    args = parser.parse_args()
+
+    proxy_pool = setup_proxy("CA")
     logger.info("Attemping to load Instagram session...")
-    L = session()
+    L = session(proxy_pool=proxy_pool)
     if L:
         logger.info("Session created successfully!")
-        process_recent_feed(L)
+        process_recent_feed(
+            L,
+            RunOptions(
+                resume=args.resume, archive=FeedArchive() if args.archive else None
+            ),
+        )
 
     else:
         logger.critical("Failed to initialize Instagram session, stopping...")
@@ -0,0 +1,214 @@
+"""
+Adaptive polling of club profiles. Per-club statistics (last post time,
+posting rate, share of posts that contain events) decide which clubs are due
+and in what order, under a global budget of Instagram requests per run:
+clubs that post events often are checked often, dormant ones rarely, and
+every club is still checked at least once per MAX_INTERVAL_DAYS.
+
+    python poll_scheduler.py [--budget N] [--workers N] [--dry-run]
+"""
+
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from logging_config import logger
+
+STATS_FILE = Path(
+    os.getenv("CLUB_STATS_FILE", Path(__file__).resolve().parent / "club_stats.json")
+)
+POLL_REQUEST_BUDGET = int(os.getenv("POLL_REQUEST_BUDGET", "300"))
+
+MIN_INTERVAL_DAYS = 0.25
+MAX_INTERVAL_DAYS = 14
+# Look-back for a club's first poll
+BOOTSTRAP_DAYS = 14
+# EWMA weight of the newest observation
+SMOOTHING = 0.3
+# Priors for clubs without history: a post every 3 days, half of them events
+PRIOR_POST_RATE = 1 / 3
+PRIOR_HIT_RATE = 0.5
+MIN_HIT_RATE = 0.05
+POSTS_PER_PAGE = 12
+
+
+def _parse(ts):
+    return datetime.fromisoformat(ts) if ts else None
+
+
+class PollScheduler:
+    """
+    Per-club polling statistics, persisted as JSON (atomic rewrite, like
+    FeedCheckpoint) keyed by handle:
+
+    - last_polled / last_post: ISO timestamps
+    - post_rate: smoothed new posts per day
+    - hit_rate: smoothed share of new posts that contained events
+    - polls / events_added: running totals
+    """
+
+    def __init__(self, path: Path = STATS_FILE):
+        self.path = Path(path)
+        self.clubs = {}
+
+    @classmethod
+    def load(cls, path: Path = STATS_FILE):
+        scheduler = cls(path)
+        try:
+            with open(scheduler.path, encoding="utf-8") as f:
+                scheduler.clubs = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable club stats {scheduler.path}: {e}")
+        return scheduler
+
+    def save(self):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.clubs, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def interval_days(self, handle: str) -> float:
+        """Target time between polls: roughly one expected event post"""
+        stats = self.clubs.get(handle, {})
+        event_rate = stats.get("post_rate", PRIOR_POST_RATE) * max(
+            stats.get("hit_rate", PRIOR_HIT_RATE), MIN_HIT_RATE
+        )
+        if event_rate <= 0:
+            return MAX_INTERVAL_DAYS
+        return min(max(1 / event_rate, MIN_INTERVAL_DAYS), MAX_INTERVAL_DAYS)
+
+    def expected_posts(self, handle: str, now: datetime) -> float:
+        stats = self.clubs.get(handle, {})
+        last_polled = _parse(stats.get("last_polled"))
+        days = (
+            (now - last_polled).total_seconds() / 86400
+            if last_polled
+            else BOOTSTRAP_DAYS
+        )
+        return stats.get("post_rate", PRIOR_POST_RATE) * days
+
+    def estimated_requests(self, handle: str, now: datetime) -> int:
+        """Profile lookup plus the post pages the walk is expected to fetch"""
+        return 1 + math.ceil((self.expected_posts(handle, now) + 1) / POSTS_PER_PAGE)
+
+    def cutoff(self, handle: str, now: datetime) -> datetime:
+        """Posts older than the previous poll were already seen"""
+        last_polled = _parse(self.clubs.get(handle, {}).get("last_polled"))
+        floor = now - timedelta(days=BOOTSTRAP_DAYS)
+        return max(last_polled, floor) if last_polled else floor
+
+    def plan(self, handles, budget: int = POLL_REQUEST_BUDGET, now=None):
+        """
+        Clubs to poll this run, most valuable first. Unpolled clubs and clubs
+        overdue for their forced check lead; other due clubs are ranked by
+        expected event posts since their last poll. Clubs that would overrun
+        the request budget are left for a later run.
+        """
+        now = now or datetime.now(timezone.utc)
+        candidates = []
+        for handle in handles:
+            stats = self.clubs.get(handle, {})
+            last_polled = _parse(stats.get("last_polled"))
+            if last_polled is None:
+                candidates.append((0, 0.0, handle))
+                continue
+            days = (now - last_polled).total_seconds() / 86400
+            if days >= MAX_INTERVAL_DAYS:
+                candidates.append((0, -days, handle))
+            elif days >= self.interval_days(handle):
+                value = self.expected_posts(handle, now) * stats.get(
+                    "hit_rate", PRIOR_HIT_RATE
+                )
+                candidates.append((1, -value, handle))
+        candidates.sort()
+
+        selected = []
+        spent = 0
+        for _, _, handle in candidates:
+            cost = self.estimated_requests(handle, now)
+            if spent + cost > budget:
+                continue
+            selected.append(handle)
+            spent += cost
+        logger.info(
+            f"Scheduled {len(selected)}/{len(candidates)} due clubs "
+            f"({len(handles)} total), ~{spent}/{budget} requests"
+        )
+        return selected
+
+    def record_poll(self, handle: str, result: dict, polled_at=None):
+        """Fold a process_profile result into the club's statistics"""
+        polled_at = polled_at or datetime.now(timezone.utc)
+        stats = self.clubs.setdefault(handle, {"polls": 0, "events_added": 0})
+        last_polled = _parse(stats.get("last_polled"))
+        days = (
+            (polled_at - last_polled).total_seconds() / 86400
+            if last_polled
+            else BOOTSTRAP_DAYS
+        )
+        observed_rate = result["posts"] / max(days, MIN_INTERVAL_DAYS)
+        stats["post_rate"] = _smooth(stats.get("post_rate"), observed_rate)
+        if result["posts"]:
+            stats["hit_rate"] = _smooth(
+                stats.get("hit_rate"), result["event_posts"] / result["posts"]
+            )
+        if result.get("newest_post") and (
+            not stats.get("last_post") or result["newest_post"] > stats["last_post"]
+        ):
+            stats["last_post"] = result["newest_post"]
+        stats["last_polled"] = polled_at.isoformat()
+        stats["polls"] += 1
+        stats["events_added"] += result["events_added"]
+
+
+def _smooth(previous, observed):
+    if previous is None:
+        return observed
+    return SMOOTHING * observed + (1 - SMOOTHING) * previous
+
+
+def run_scheduled(budget=POLL_REQUEST_BUDGET, workers=1, dry_run=False):
+    """Poll the clubs that are due through ShardCoordinator and update their stats"""
+    # Sets up Django and the scraper, which planning alone doesn't need
+    from sharded_feed import ShardCoordinator, load_club_handles
+
+    scheduler = PollScheduler.load()
+    now = datetime.now(timezone.utc)
+    handles = scheduler.plan(load_club_handles(), budget=budget, now=now)
+    if not handles:
+        logger.info("No clubs are due, skipping the run")
+        return
+    cutoffs = {handle: scheduler.cutoff(handle, now) for handle in handles}
+    if dry_run:
+        for handle in handles:
+            logger.info(
+                f"{handle}: every {scheduler.interval_days(handle):.1f}d, "
+                f"cutoff {cutoffs[handle]:%Y-%m-%d %H:%M}"
+            )
+        return
+
+    coordinator = ShardCoordinator(handles, num_workers=workers, cutoffs=cutoffs)
+    coordinator.run()
+    results = coordinator.club_results
+    for handle, result in results.items():
+        scheduler.record_poll(handle, result, polled_at=now)
+    scheduler.save()
+    logger.info(
+        f"Polled {len(results)} clubs, added "
+        f"{sum(r['events_added'] for r in results.values())} events"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll club profiles that are due")
+    parser.add_argument("--budget", type=int, default=POLL_REQUEST_BUDGET)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    args = parser.parse_args()
+
+    run_scheduled(budget=args.budget, workers=args.workers, dry_run=args.dry_run)
@@ -0,0 +1,78 @@
+"""
+Re-insert recoverable dead letters (complete events that couldn't be written,
+see dead_letters.py) through the normal dedup and insert path, in batched
+transactions. Stored embeddings are reused, so nothing calls OpenAI.
+
+Replayed files move to replayed/ under the dead letter directory; records
+that fail again are dead-lettered anew in the same directory, so a replay can
+simply be rerun.
+
+    python replay_dead_letters.py [--dir DIR] [--batch-size N] [--dry-run]
+"""
+
+import argparse
+from datetime import date, datetime, timezone
+
+import instagram_feed
+from dead_letters import DEAD_LETTER_DIR, DeadLetterStore, unpack_embedding
+from logging_config import logger
+from scraper_context import ScraperContext
+
+
+def _is_upcoming(record, today: date) -> bool:
+    try:
+        return (
+            datetime.strptime(record["event"].get("date") or "", "%Y-%m-%d").date()
+            >= today
+        )
+    except ValueError:
+        return False
+
+
+def replay(store: DeadLetterStore, batch_size=100, dry_run=False) -> int:
+    """Replay every recoverable, still-upcoming record; returns events added"""
+    paths = store.files()
+    today = datetime.now(timezone.utc).date()
+    records = [r for r in store.iter_records(paths) if r.get("recoverable")]
+    upcoming = [r for r in records if _is_upcoming(r, today)]
+    logger.info(
+        f"{len(upcoming)} recoverable dead letter(s) to replay from {len(paths)} file(s) "
+        f"({len(records) - len(upcoming)} already past)"
+    )
+    if dry_run or not paths:
+        return 0
+
+    ctx = ScraperContext(dead_letter_store=store)
+    ctx.refresh()
+    added = 0
+    for start in range(0, len(upcoming), batch_size):
+        pending_events = []
+        for record in upcoming[start : start + batch_size]:
+            pending = instagram_feed.prepare_event_for_db(
+                record["event"],
+                record["club_handle"],
+                record["url"],
+                ctx,
+                embedding=unpack_embedding(record.get("embedding")),
+            )
+            if pending:
+                pending_events.append(pending)
+        added += instagram_feed.write_events_to_db(pending_events, ctx)
+    store.flush()
+
+    replayed_dir = store.root / "replayed"
+    replayed_dir.mkdir(parents=True, exist_ok=True)
+    for path in paths:
+        path.replace(replayed_dir / path.name)
+    logger.info(f"Replay added {added}/{len(upcoming)} event(s)")
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recoverable dead letters")
+    parser.add_argument("--dir", default=str(DEAD_LETTER_DIR))
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Only count records")
+    args = parser.parse_args()
+
+    replay(DeadLetterStore(args.dir), batch_size=args.batch_size, dry_run=args.dry_run)
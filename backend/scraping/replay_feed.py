@@ -0,0 +1,174 @@
+"""
+Replay archived feed posts (see feed_archive.py) through the scraping pipeline
+without Instagram, S3 or OpenAI: images come from the blob store, extraction
+returns the recorded LLM output and embeddings are deterministic stand-ins.
+Extraction, dedup and DB insert run for real against the configured database,
+as of the day each post was archived (so events that have since passed are
+replayed too), inside one transaction that is rolled back at the end unless
+--commit is given:
+the replayed rows carry placeholder image URLs and fake embeddings, and the
+richer-copy rule could otherwise replace real events with them.
+
+    python replay_feed.py [--archive-dir DIR] [--shortcode CODE] [--limit N] [--commit]
+"""
+
+import argparse
+import copy
+import hashlib
+import os
+import random
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+from django.db import transaction
+
+# The OpenAI client refuses to initialise without a key, even though every
+# call it would make is stubbed below
+os.environ.setdefault("OPENAI_API_KEY", "replay-stub")
+
+import instagram_feed
+import scraper_context
+from feed_archive import ARCHIVE_DIR, ArchivedPost, FeedArchive
+from logging_config import logger
+from scraper_context import ScraperContext
+
+from utils.image_utils import ImageData
+
+EMBEDDING_DIMENSIONS = 1536
+
+
+class ReplayStubs:
+    """Stand-ins for the external services, answering for the current post"""
+
+    def __init__(self, archive: FeedArchive, extractions: dict[str, list[dict]]):
+        self.archive = archive
+        self.extractions = extractions
+        self.current = None
+
+    def fetch_image(self, _image_url):
+        digest = self.current.image_sha256
+        data = self.archive.get_blob(digest) if digest else None
+        return ImageData.from_bytes(data) if data else None
+
+    def upload_image(self, image, _filename=None):
+        digest = hashlib.sha256(image.data).hexdigest()
+        return f"https://replay.invalid/events/{digest}.jpg"
+
+    def upload_vision_variant(self, _image):
+        return None
+
+    def schedule_image_derivatives(self, _image, _image_url):
+        return None
+
+    def extract_events_from_caption(self, _caption_text, _image_url=None, _vision_url=None):
+        events = self.extractions.get(self.current.shortcode)
+        if events is None:
+            logger.warning(f"No recorded extraction for {self.current.shortcode}")
+            return []
+        return copy.deepcopy(events)
+
+    def generate_embedding(self, text):
+        if not text:
+            return None
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        rng = random.Random(seed)
+        return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSIONS)]
+
+
+def load_archive(archive: FeedArchive, shortcode: str | None = None):
+    """Returns archived post records in order and the latest extraction per post"""
+    posts = []
+    extractions = {}
+    for record in archive.iter_records():
+        if shortcode and record.get("shortcode") != shortcode:
+            continue
+        if record.get("kind") == "post":
+            posts.append(record)
+        elif record.get("kind") == "extraction":
+            extractions[record["shortcode"]] = record.get("events") or []
+    return posts, extractions
+
+
+def replay(
+    archive: FeedArchive,
+    shortcode: str | None = None,
+    limit: int | None = None,
+    commit: bool = False,
+):
+    posts, extractions = load_archive(archive, shortcode)
+    if limit:
+        posts = posts[:limit]
+    logger.info(
+        f"Replaying {len(posts)} archived post(s) from {archive.root}"
+        f"{'' if commit else ' (rolled back at the end)'}"
+    )
+
+    stubs = ReplayStubs(archive, extractions)
+    ctx = ScraperContext()
+    instagram_feed.reset_run_metrics()
+    events_added = 0
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        stack.enter_context(transaction.atomic())
+        # close_old_connections() drops a connection that is inside a transaction
+        for module in (instagram_feed, scraper_context):
+            stack.enter_context(
+                mock.patch.object(module, "close_old_connections", lambda: None)
+            )
+        for name in (
+            "fetch_image",
+            "upload_image",
+            "upload_vision_variant",
+            "schedule_image_derivatives",
+            "extract_events_from_caption",
+            "generate_embedding",
+        ):
+            stack.enter_context(mock.patch.object(instagram_feed, name, getattr(stubs, name)))
+        stack.enter_context(mock.patch.object(instagram_feed, "_polite_sleep", lambda *_: None))
+
+        for record in posts:
+            post = ArchivedPost(record)
+            stubs.current = post
+            try:
+                # A savepoint per post, so one failed post can't abort the rest
+                with transaction.atomic():
+                    events_added += (
+                        instagram_feed.process_post(
+                            post, ctx, today=post.archived_at.date()
+                        )
+                        or 0
+                    )
+            except Exception:
+                logger.exception(f"Error replaying post {post.shortcode}")
+        if not commit:
+            transaction.set_rollback(True)
+
+    elapsed = time.perf_counter() - started
+    rate = len(posts) / elapsed if elapsed else 0.0
+    logger.info(
+        f"Replay completed: {len(posts)} posts, {events_added} events added "
+        f"in {elapsed:.2f}s ({rate:.2f} posts/s)"
+    )
+    instagram_feed.write_run_report()
+    return events_added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay archived feed posts offline")
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR))
+    parser.add_argument("--shortcode", help="Only replay this post")
+    parser.add_argument("--limit", type=int, help="Replay at most this many posts")
+    parser.add_argument(
+        "--commit",
+        action="store_true",
+        help="Keep the replayed rows (only against a scratch database)",
+    )
+    args = parser.parse_args()
+
+    replay(
+        FeedArchive(args.archive_dir),
+        shortcode=args.shortcode,
+        limit=args.limit,
+        commit=args.commit,
+    )
@@ -0,0 +1,88 @@
+import os
+import time
+
+from dead_letters import dead_letters
+from django.core.exceptions import FieldDoesNotExist
+from django.db import close_old_connections, connection
+from logging_config import logger
+
+from apps.clubs.models import Clubs
+from apps.events.models import Events
+from utils.event_clusters import RunEventIndex
+
+CONTEXT_TTL_SECONDS = int(os.getenv("SCRAPER_CONTEXT_TTL", "900"))
+
+
+class ScraperContext:
+    """
+    Per-run cache of club metadata and DB schema capabilities, so the pipeline
+    doesn't re-query them for every event. Reloaded once the TTL expires.
+    run_events clusters the events seen this run (it isn't reset on reload);
+    dead_letters is the store events that couldn't be written go to.
+    """
+
+    def __init__(self, ttl_seconds: int = CONTEXT_TTL_SECONDS, dead_letter_store=None):
+        self.ttl_seconds = ttl_seconds
+        self.dead_letters = dead_letter_store or dead_letters
+        self._loaded_at = None
+        self._tables = set()
+        self._club_types = {}
+        self._has_dtstart = True
+        self.run_events = RunEventIndex()
+
+    def refresh(self):
+        """Reload table names, Events fields and the club handle -> club_type map"""
+        close_old_connections()
+        try:
+            self._tables = set(connection.introspection.table_names())
+        except Exception as e:
+            logger.warning(f"Could not introspect DB tables: {e}")
+            self._tables = set()
+
+        try:
+            Events._meta.get_field("dtstart")
+            self._has_dtstart = True
+        except FieldDoesNotExist:
+            self._has_dtstart = False
+
+        try:
+            self._club_types = dict(
+                Clubs.objects.exclude(ig__isnull=True).values_list("ig", "club_type")
+            )
+        except Exception as e:
+            logger.warning(f"Could not load club metadata: {e}")
+            self._club_types = {}
+
+        self._loaded_at = time.monotonic()
+        logger.debug(
+            f"Scraper context loaded: {len(self._tables)} tables, {len(self._club_types)} clubs"
+        )
+
+    def _ensure_fresh(self):
+        if (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self.ttl_seconds
+        ):
+            self.refresh()
+
+    @property
+    def tables(self) -> set[str]:
+        self._ensure_fresh()
+        return self._tables
+
+    @property
+    def has_dtstart(self) -> bool:
+        self._ensure_fresh()
+        return self._has_dtstart
+
+    def has_club(self, club_ig: str) -> bool:
+        self._ensure_fresh()
+        return club_ig in self._club_types
+
+    def club_type(self, club_ig: str) -> str | None:
+        self._ensure_fresh()
+        return self._club_types.get(club_ig)
+
+
+# Singleton instance
+scraper_context = ScraperContext()
@@ -0,0 +1,343 @@
+"""
+Sharded scraping: club handles from the Clubs table are partitioned across
+worker processes, each logged in as its own Instagram account, and each club's
+profile is walked by instagram_feed.process_profile.
+
+Every club is processed under a Postgres advisory-lock lease, so two workers
+(or two overlapping runs) never process the same account at once. The
+coordinator hands out one club at a time from each worker's shard; once a
+worker's shard is empty it takes work from the largest remaining shard, and if
+a worker dies its shard and in-progress club are picked up by the others.
+
+    python sharded_feed.py [--workers N] [--max-posts N] [--cutoff-days N]
+
+Accounts come from SCRAPER_ACCOUNTS (a JSON list of objects with username,
+sessionid, csrftoken, ds_user_id, mid and ig_did); without it every worker
+uses the USERNAME/SESSIONID/... account from the environment.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import instagram_feed
+from django.db import DEFAULT_DB_ALIAS, connections
+from logging_config import logger
+from scraper_context import ScraperContext
+
+from apps.clubs.models import Clubs
+
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "2"))
+MAX_CLUB_ATTEMPTS = 2
+MAX_WORKER_RESTARTS = 2
+POLL_INTERVAL_SECONDS = 5
+# First key of the two-int advisory lock form, so these leases can't collide
+# with advisory locks taken for anything else
+LEASE_NAMESPACE = 0x1C1B
+
+
+def club_handle(ig: str | None) -> str | None:
+    """Normalise a Clubs.ig value (handle or profile URL) to a bare handle"""
+    if not ig:
+        return None
+    handle = ig.strip().rstrip("/").split("/")[-1].lstrip("@")
+    return handle.lower() if handle and handle != "Not found" else None
+
+
+def load_club_handles() -> list[str]:
+    handles = {
+        club_handle(ig)
+        for ig in Clubs.objects.exclude(ig__isnull=True).values_list("ig", flat=True)
+    }
+    handles.discard(None)
+    return sorted(handles)
+
+
+def load_accounts() -> list[dict]:
+    raw = os.getenv("SCRAPER_ACCOUNTS")
+    if raw:
+        try:
+            accounts = [a for a in json.loads(raw) if a.get("username")]
+            if accounts:
+                return accounts
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring malformed SCRAPER_ACCOUNTS: {e}")
+    return [None]  # session() falls back to the env account
+
+
+def shard_of(handle: str, num_shards: int) -> int:
+    """Stable shard for a handle, so a club keeps the same account across runs"""
+    return int(hashlib.sha1(handle.encode("utf-8")).hexdigest(), 16) % num_shards
+
+
+def partition_clubs(handles: list[str], num_shards: int) -> list[deque]:
+    shards = [deque() for _ in range(num_shards)]
+    for handle in handles:
+        shards[shard_of(handle, num_shards)].append(handle)
+    return shards
+
+
+def lease_key(handle: str) -> int:
+    """32-bit signed advisory-lock key for a club handle"""
+    digest = hashlib.sha256(handle.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big", signed=True)
+
+
+class ClubLease:
+    """
+    Session-level advisory lock on a club, held on a dedicated connection so
+    Django closing or recycling the pipeline's connection can't drop it. If the
+    worker dies, Postgres releases the lock with its session.
+    """
+
+    def __init__(self):
+        self.connection = connections.create_connection(DEFAULT_DB_ALIAS)
+
+    def acquire(self, handle: str) -> bool:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_try_advisory_lock(%s, %s)",
+                [LEASE_NAMESPACE, lease_key(handle)],
+            )
+            return cursor.fetchone()[0]
+
+    def release(self, handle: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s, %s)",
+                [LEASE_NAMESPACE, lease_key(handle)],
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+def run_worker(worker_id, account, inbox, outbox, options):
+    """
+    Worker process: asks for a (club, cutoff) pair, processes it under a
+    lease, repeats. options are the instagram_feed.RunOptions for every club
+    """
+    # Connections inherited from the parent must not be shared
+    connections.close_all()
+    instagram_feed.reset_run_metrics()
+    # The proxy pool lives in process memory, so each worker sets up its own
+    proxy_pool = instagram_feed.setup_proxy("CA")
+    loader = instagram_feed.session(account, proxy_pool)
+    if not loader:
+        outbox.put(("exit", worker_id, None, "login failed"))
+        return
+
+    ctx = ScraperContext()
+    ctx.refresh()
+    lease = ClubLease()
+    try:
+        while True:
+            outbox.put(("ready", worker_id, None, None))
+            item = inbox.get()
+            if item is None:
+                break
+            handle, cutoff = item
+            if not lease.acquire(handle):
+                outbox.put(("busy", worker_id, handle, None))
+                continue
+            try:
+                logger.info(f"[worker {worker_id}] Processing club {handle}")
+                result = instagram_feed.process_profile(
+                    loader, handle, replace(options, cutoff=cutoff), ctx=ctx
+                )
+                outbox.put(("done", worker_id, handle, result))
+            except Exception as e:
+                logger.error(
+                    f"[worker {worker_id}] Error processing club {handle}: {e!s}"
+                )
+                outbox.put(("failed", worker_id, handle, str(e)))
+            finally:
+                lease.release(handle)
+    finally:
+        lease.close()
+        instagram_feed.dead_letters.flush()
+        try:
+            instagram_feed.store_image_derivatives()
+        except Exception as e:
+            logger.error(
+                f"[worker {worker_id}] Failed to store image derivatives: {e!s}"
+            )
+        report_file = instagram_feed.RUN_REPORT_FILE
+        instagram_feed.write_run_report(
+            report_file.with_name(
+                f"{report_file.stem}.worker-{worker_id}{report_file.suffix}"
+            ),
+            prometheus_path=None,
+        )
+    outbox.put(("exit", worker_id, None, None))
+
+
+class ShardCoordinator:
+    """
+    Starts the workers and feeds them clubs on request. Tracks which club each
+    worker holds, so a crashed worker's club goes back to its shard, and its
+    shard is drained by the surviving workers (or a restarted one).
+
+    options (instagram_feed.RunOptions) apply to every club; cutoffs optionally
+    gives a per-club cutoff (see poll_scheduler.py) overriding options.cutoff.
+    process_profile's result for each finished club ends up in club_results.
+    """
+
+    def __init__(
+        self,
+        handles,
+        num_workers=SHARD_WORKERS,
+        accounts=None,
+        options=None,
+        cutoffs=None,
+    ):
+        self.num_workers = max(1, min(num_workers, len(handles) or 1))
+        self.accounts = accounts or load_accounts()
+        self.options = options or instagram_feed.RunOptions()
+        self.cutoff = self.options.resolved_cutoff()
+        self.cutoffs = cutoffs or {}
+        self.club_results = {}
+        self.shards = partition_clubs(handles, self.num_workers)
+        self.attempts = {}
+        self.in_progress = {}
+        self.results = {"done": [], "busy": [], "failed": []}
+        self.events_added = 0
+        self.restarts = 0
+        self.mp = multiprocessing.get_context("spawn")
+        self.outbox = self.mp.Queue()
+        self.workers = {}
+
+    def _start_worker(self, worker_id):
+        inbox = self.mp.Queue()
+        process = self.mp.Process(
+            target=run_worker,
+            args=(
+                worker_id,
+                self.accounts[worker_id % len(self.accounts)],
+                inbox,
+                self.outbox,
+                self.options,
+            ),
+            name=f"shard-worker-{worker_id}",
+        )
+        process.start()
+        self.workers[worker_id] = (process, inbox)
+        logger.info(
+            f"Started worker {worker_id} (pid {process.pid}) with {len(self.shards[worker_id])} clubs"
+        )
+
+    def _next_club(self, worker_id):
+        """Next club from the worker's own shard, else from the largest other shard"""
+        shard = self.shards[worker_id]
+        if not shard:
+            shard = max(self.shards, key=len)
+        return shard.popleft() if shard else None
+
+    def _requeue(self, worker_id, handle):
+        self.attempts[handle] = self.attempts.get(handle, 0) + 1
+        if self.attempts[handle] >= MAX_CLUB_ATTEMPTS:
+            logger.error(
+                f"Giving up on club {handle} after {self.attempts[handle]} attempts"
+            )
+            self.results["failed"].append(handle)
+        else:
+            self.shards[worker_id].appendleft(handle)
+
+    def _reap_dead_workers(self):
+        for worker_id, (process, _) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            del self.workers[worker_id]
+            handle = self.in_progress.pop(worker_id, None)
+            if handle:
+                logger.warning(
+                    f"Worker {worker_id} died (exit code {process.exitcode}) while processing {handle}"
+                )
+                self._requeue(worker_id, handle)
+            remaining = sum(len(shard) for shard in self.shards)
+            if remaining and not self.workers:
+                if self.restarts >= MAX_WORKER_RESTARTS:
+                    logger.error(
+                        f"No workers left and restart limit reached; {remaining} clubs not processed"
+                    )
+                    return
+                self.restarts += 1
+                self._start_worker(worker_id)
+            elif remaining:
+                logger.info(
+                    f"Rebalancing {len(self.shards[worker_id])} clubs from worker {worker_id}"
+                )
+
+    def _handle(self, message):
+        kind, worker_id, handle, detail = message
+        if kind == "ready":
+            if worker_id not in self.workers:
+                return
+            club = self._next_club(worker_id)
+            item = None
+            if club:
+                self.in_progress[worker_id] = club
+                item = (club, self.cutoffs.get(club, self.cutoff))
+            self.workers[worker_id][1].put(item)
+        elif kind in ("done", "busy", "failed"):
+            self.in_progress.pop(worker_id, None)
+            self.results[kind].append(handle)
+            if kind == "done":
+                self.club_results[handle] = detail
+                self.events_added += detail["events_added"]
+            elif kind == "busy":
+                logger.info(f"Club {handle} is leased by another worker, skipping")
+        elif kind == "exit" and detail:
+            logger.error(f"Worker {worker_id} exited: {detail}")
+
+    def run(self):
+        started = time.perf_counter()
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+
+        while self.workers:
+            with contextlib.suppress(queue.Empty):
+                self._handle(self.outbox.get(timeout=POLL_INTERVAL_SECONDS))
+            self._reap_dead_workers()
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Sharded run completed in {elapsed:.0f}s: {len(self.results['done'])} clubs done, "
+            f"{len(self.results['busy'])} leased elsewhere, {len(self.results['failed'])} failed, "
+            f"{self.events_added} events added"
+        )
+        return self.results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scrape club profiles across worker processes"
+    )
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    parser.add_argument(
+        "--max-posts",
+        type=int,
+        default=instagram_feed.MAX_POSTS,
+        help="Per-club post limit",
+    )
+    parser.add_argument("--cutoff-days", type=int, default=instagram_feed.CUTOFF_DAYS)
+    args = parser.parse_args()
+
+    Path(instagram_feed.RUN_REPORT_FILE).parent.mkdir(parents=True, exist_ok=True)
+    ShardCoordinator(
+        load_club_handles(),
+        num_workers=args.workers,
+        options=instagram_feed.RunOptions(
+            cutoff=datetime.now(timezone.utc) - timedelta(days=args.cutoff_days),
+            max_posts=args.max_posts,
+        ),
+    ).run()
@@ -0,0 +1,153 @@
+"""
+Refresh the Clubs table from the WUSA club directory in one idempotent step:
+crawl the directory (or read a club_info.csv export) and upsert the clubs by
+name, in batches, reporting how many were inserted, updated or unchanged.
+
+Categories are merged with the stored ones rather than replaced, and a
+missing Instagram handle or club page never clears a stored one.
+
+    python sync_clubs.py [--csv FILE] [--batch-size N] [--dry-run]
+"""
+
+import argparse
+import csv
+import os
+import sys
+from itertools import islice
+
+import django
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
+django.setup()
+
+from django.db import transaction  # noqa: E402
+from logging_config import logger  # noqa: E402
+
+from apps.clubs.models import Clubs  # noqa: E402
+
+BATCH_SIZE = 200
+# Placeholders the scraper writes for values it didn't find
+MISSING = {"", "Not found", "NULL"}
+NAME_MAX_LENGTH = Clubs._meta.get_field("club_name").max_length
+
+
+def _value(text):
+    text = (text or "").strip()
+    return None if text in MISSING else text
+
+
+def _categories(value) -> list[str]:
+    if isinstance(value, list):
+        return value
+    return [c.strip() for c in (value or "").split(";") if c.strip()]
+
+
+def normalise(club: dict) -> dict | None:
+    """Scraper row -> Clubs field values, or None if the club has no name"""
+    name = _value(club.get("club_name"))
+    if not name:
+        return None
+    return {
+        "club_name": name[:NAME_MAX_LENGTH],
+        "categories": _categories(club.get("categories")),
+        "club_page": _value(club.get("club_page")),
+        "ig": _value(club.get("ig")),
+    }
+
+
+def _merge(stored: Clubs, row: dict) -> dict:
+    """Stored values updated with the scraped row: categories are a union"""
+    categories = _categories(stored.categories)
+    return {
+        "categories": categories
+        + [c for c in row["categories"] if c not in categories],
+        "club_page": row["club_page"] or stored.club_page,
+        "ig": row["ig"] or stored.ig,
+    }
+
+
+def sync_batch(rows: dict[str, dict], counts: dict, dry_run=False):
+    """Upsert one batch of normalised rows keyed by club name"""
+    with transaction.atomic():
+        stored = {
+            club.club_name: club
+            for club in Clubs.objects.select_for_update().filter(club_name__in=rows)
+        }
+        changed = []
+        for name, row in rows.items():
+            club = stored.get(name)
+            if club is None:
+                counts["inserted"] += 1
+                changed.append(Clubs(club_type="WUSA", **row))
+                continue
+            merged = _merge(club, row)
+            if all(getattr(club, field) == value for field, value in merged.items()):
+                counts["unchanged"] += 1
+                continue
+            counts["updated"] += 1
+            changed.append(Clubs(club_name=name, **merged))
+        if changed and not dry_run:
+            Clubs.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=["club_name"],
+                update_fields=["categories", "club_page", "ig"],
+            )
+
+
+def sync_clubs(clubs, batch_size=BATCH_SIZE, dry_run=False) -> dict:
+    """Stream scraper rows into Clubs; returns inserted/updated/unchanged/skipped counts"""
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    clubs = iter(clubs)
+    while batch := list(islice(clubs, batch_size)):
+        rows = {}
+        for club in batch:
+            row = normalise(club)
+            if row is None:
+                counts["skipped"] += 1
+            elif row["club_name"] in rows:
+                # Listed twice in one batch: fold into the first copy
+                first = rows[row["club_name"]]
+                first["categories"] += [
+                    c for c in row["categories"] if c not in first["categories"]
+                ]
+                first["club_page"] = first["club_page"] or row["club_page"]
+                first["ig"] = first["ig"] or row["ig"]
+            else:
+                rows[row["club_name"]] = row
+        sync_batch(rows, counts, dry_run)
+    return counts
+
+
+def read_csv(filename):
+    with open(filename, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sync the WUSA club directory into Clubs"
+    )
+    parser.add_argument(
+        "--csv", help="Load this club_info.csv export instead of crawling"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Count changes only")
+    args = parser.parse_args()
+
+    if args.csv:
+        clubs = read_csv(args.csv)
+    else:
+        from wusa_club_directory_scraper import scrape_all
+
+        clubs = scrape_all()
+    counts = sync_clubs(clubs, batch_size=args.batch_size, dry_run=args.dry_run)
+    logger.info(
+        f"Clubs sync{' (dry run)' if args.dry_run else ''}: {counts['inserted']} inserted, "
+        f"{counts['updated']} updated, {counts['unchanged']} unchanged, "
+        f"{counts['skipped']} skipped without a name"
+    )
@@ -0,0 +1,126 @@
+"""
+Train the caption pre-classifier (utils/event_classifier.py) on past outcomes:
+
+- feed archive extraction records: the LLM's verdict per post ([] = no event)
+- dead letters (including replayed ones) and the legacy events_scraped.csv:
+  every record is an extracted event, whatever its status, so these only
+  contribute positives (the description starts with the caption)
+
+    python train_event_classifier.py [--archive-dir DIR] [--dead-letter-dir DIR]
+        [--csv FILE] [--out FILE]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dead_letters import DEAD_LETTER_DIR, DeadLetterStore
+from feed_archive import ARCHIVE_DIR, FeedArchive
+from logging_config import logger
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.event_classifier import (
+    FEATURES_VERSION,
+    MODEL_PATH,
+    THRESHOLD,
+    EventClassifier,
+    train,
+)
+
+CSV_FILE = Path(__file__).resolve().parent / "events_scraped.csv"
+
+
+def _add_positive(samples, url, description):
+    key = (url or "").rstrip("/").split("/")[-1] or url
+    if key and key not in samples and description:
+        samples[key] = (description, True)
+
+
+def load_samples(archive_dir, dead_letter_dir, csv_file) -> dict[str, tuple[str, bool]]:
+    """Labelled captions keyed by post (shortcode or URL), later records winning"""
+    samples = {}
+    captions = {}
+    for record in FeedArchive(archive_dir).iter_records():
+        if record.get("kind") == "post":
+            captions[record["shortcode"]] = record.get("caption") or ""
+        elif record.get("kind") == "extraction" and record["shortcode"] in captions:
+            samples[record["shortcode"]] = (
+                captions[record["shortcode"]],
+                bool(record.get("events")),
+            )
+
+    store = DeadLetterStore(dead_letter_dir)
+    paths = sorted(store.root.rglob("dead-letters-*.jsonl.gz"))
+    for record in store.iter_records(paths):
+        _add_positive(samples, record.get("url"), record["event"].get("description"))
+
+    if Path(csv_file).exists():
+        with open(csv_file, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                _add_positive(samples, row.get("url"), row.get("description"))
+    return samples
+
+
+def _is_holdout(key: str) -> bool:
+    return hashlib.sha1(key.encode("utf-8")).digest()[0] < 52  # ~20%
+
+
+def evaluate(classifier, samples) -> dict:
+    kept_events = events = skipped = 0
+    for caption, label in samples:
+        keep, _ = classifier.is_probable_event(caption)
+        skipped += not keep
+        if label:
+            events += 1
+            kept_events += keep
+    return {
+        "samples": len(samples),
+        "event_recall": kept_events / events if events else None,
+        "skip_rate": skipped / len(samples) if samples else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the caption pre-classifier")
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR))
+    parser.add_argument("--dead-letter-dir", default=str(DEAD_LETTER_DIR))
+    parser.add_argument("--csv", default=str(CSV_FILE))
+    parser.add_argument("--out", default=str(MODEL_PATH))
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    samples = load_samples(args.archive_dir, args.dead_letter_dir, args.csv)
+    train_set = [s for key, s in samples.items() if not _is_holdout(key)]
+    holdout = [s for key, s in samples.items() if _is_holdout(key)]
+    positives = sum(label for _, label in train_set)
+    if not positives or positives == len(train_set):
+        logger.error(
+            f"Need both event and non-event posts to train ({positives}/{len(train_set)} are events)"
+        )
+        sys.exit(1)
+
+    weights = train(train_set)
+    metrics = {
+        "default": evaluate(EventClassifier(threshold=args.threshold), holdout),
+        "trained": evaluate(EventClassifier(weights, args.threshold), holdout),
+    }
+    logger.info(f"Holdout metrics at threshold {args.threshold}: {metrics}")
+    Path(args.out).write_text(
+        json.dumps(
+            {
+                "weights": weights,
+                "features_version": FEATURES_VERSION,
+                "trained_at": datetime.now(timezone.utc).isoformat(),
+                "samples": len(train_set),
+                "holdout": metrics,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    logger.info(f"Wrote classifier model to {args.out}")
@@ -1,29 +1,155 @@
 import csv
+import hashlib
+import json
+import os
+import sys
+import threading
 import time
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_session import make_session
 
 URL = "https://clubs.wusa.ca/club_listings"
-REQUEST_DELAY = 1
+# Requests in flight per host, and the minimum gap between their starts
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_MIN_INTERVAL = float(os.getenv("CRAWL_MIN_INTERVAL", "0.25"))
+HTTP_CACHE_DIR = Path(
+    os.getenv("HTTP_CACHE_DIR", Path(__file__).resolve().parent / "http_cache")
+)
+# BeautifulSoup tree builder; lxml parses several times faster than html.parser
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml")
+
+# Only the parts of each page the scraper reads are built into a tree
+CATEGORY_SECTION_CLASS = "mt-3 list-group border-0 bg-transparent"
+CATEGORY_SECTION_ONLY = SoupStrainer(class_=CATEGORY_SECTION_CLASS)
+LINKS_ONLY = SoupStrainer("a")
+# Club pages: the name heading and the links. header is kept whole so
+# find_instagram_handle can drop the site's own links
+CLUB_PAGE_ONLY = SoupStrainer(["header", "a", "h1", "h2", "h3", "h4", "h5", "h6"])
+CLUB_NAME_ONLY = SoupStrainer(class_="club-name-header")
+
+# One keep-alive connection pool for the whole crawl, with retries on GETs
+session = make_session(pool_size=CRAWL_CONCURRENCY, timeout=10)
+
+
+class HostLimiter:
+    """Bounds concurrent requests per host and spaces out their starts"""
+
+    def __init__(self, concurrency=CRAWL_CONCURRENCY, min_interval=CRAWL_MIN_INTERVAL):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).hostname
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = [threading.BoundedSemaphore(self.concurrency), 0.0]
+            state = self._hosts[host]
+        with state[0]:
+            with self._lock:
+                start = max(time.monotonic(), state[1])
+                state[1] = start + self.min_interval
+            time.sleep(max(0.0, start - time.monotonic()))
+            yield
+
+
+class HttpCache:
+    """
+    Pages fetched before, kept on disk with their ETag / Last-Modified so a
+    re-crawl asks the server with conditional requests and reuses the body
+    on 304 Not Modified
+    """
+
+    def __init__(self, root=HTTP_CACHE_DIR):
+        self.root = Path(root)
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        return self.root / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url):
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def put(self, url, response):
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "text": response.text,
+        }
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        tmp_path.replace(path)
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def fetch(self, url):
+        """Page text, revalidating any cached copy; None if the fetch failed"""
+        cached = self.get(url)
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        with limiter.slot(url):
+            res = session.get(url, headers=headers)
+        if res.status_code == 304 and cached:
+            self._count("not_modified")
+            return cached["text"]
+        if res.status_code == 200:
+            self.put(url, res)
+            self._count("fetched")
+            return res.text
+        self._count("failed")
+        print(f"Error: Status code {res.status_code} for URL: {url}")
+        return None
+
 
+limiter = HostLimiter()
+http_cache = HttpCache()
 
-def get_soup(url):
+
+def parse_html(text, only=None, parser=None):
+    """Parse page text, building only the elements `only` matches (all if None)"""
     try:
-        res = requests.get(url, timeout=10)
-        if res.status_code == 200:
-            return BeautifulSoup(res.text, "html.parser")
-        else:
-            print(f"Error: Status code {res.status_code} for URL: {url}")
+        return BeautifulSoup(text, parser or HTML_PARSER, parse_only=only)
+    except FeatureNotFound:
+        return BeautifulSoup(text, "html.parser", parse_only=only)
+
+
+def get_soup(url, only=None):
+    try:
+        text = http_cache.fetch(url)
+        if text is not None:
+            return parse_html(text, only)
     except Exception as e:
         print(f"Error fetching {url}: {e}")
 
 
 def get_categories():
-    soup = get_soup(URL)
+    soup = get_soup(URL, CATEGORY_SECTION_ONLY)
     cats = []
-    cat_section = soup.find(class_="mt-3 list-group border-0 bg-transparent")
+    cat_section = soup.find(class_=CATEGORY_SECTION_CLASS)
     if cat_section:
         for a in cat_section.find_all("a", href=True):
             cat_name = a.get_text(strip=True)
@@ -65,14 +191,15 @@ def find_instagram_handle(soup):
 
 
 def scrape_category(cat_name, cat_url):
+    """Club detail links on every page of a category"""
     page = 1
-    results = []
+    links = []
 
     while True:
         page_url = f"{cat_url}?page={page}"
         print(f"Scraping page {cat_name}, page {page}")
-        soup = get_soup(page_url)
-        if not soup:
+        soup = get_soup(page_url, LINKS_ONLY)
+        if soup is None:
             print("Failed to load page")
             break
 
@@ -80,65 +207,75 @@ def scrape_category(cat_name, cat_url):
         if not club_links:
             print(f"End of {cat_name} category")
             break
+        links.extend(club_links)
+        page += 1
+    return links
 
-        for link in club_links:
-            print(f"Visiting {link}")
-            sub_soup = get_soup(link)
-            club_name = None
-            ig_handle = None
-            if sub_soup:
-                name_tag = sub_soup.find(class_="club-name-header")
-                if name_tag:
-                    club_name = name_tag.get_text(strip=True)
-                ig_handle = find_instagram_handle(sub_soup)
-            results.append(
-                {
-                    "club_name": club_name or "Not found",
-                    "categories": cat_name,
-                    "club_page": link.split("/")[-1],
-                    "ig": ig_handle or "Not found",
-                    "discord": "NULL",
-                }
-            )
-            time.sleep(REQUEST_DELAY)
 
-        page += 1
-        time.sleep(REQUEST_DELAY)
-    return results
+def parse_club_page(text, parser=None):
+    """(club name, Instagram handle) from a club page, either may be None"""
+    soup = parse_html(text, CLUB_PAGE_ONLY, parser)
+    name_tag = soup.find(class_="club-name-header")
+    if name_tag is None:
+        # The name isn't in a heading: one more pass for just that element
+        name_tag = parse_html(text, CLUB_NAME_ONLY, parser).find(
+            class_="club-name-header"
+        )
+    club_name = name_tag.get_text(strip=True) if name_tag else None
+    return club_name, find_instagram_handle(soup)
+
+
+def scrape_club(link):
+    print(f"Visiting {link}")
+    club_name = None
+    ig_handle = None
+    try:
+        text = http_cache.fetch(link)
+        if text is not None:
+            club_name, ig_handle = parse_club_page(text)
+    except Exception as e:
+        print(f"Error fetching {link}: {e}")
+    return {
+        "club_name": club_name or "Not found",
+        "club_page": link.split("/")[-1],
+        "ig": ig_handle or "Not found",
+        "discord": "NULL",
+    }
 
 
 def scrape_all():
-    club_data = {}
+    """
+    Crawl every category concurrently, then every distinct club page once
+    (a club listed under several categories is visited a single time)
+    """
     cats = get_categories()
-    for cat in cats:
-        cat_results = scrape_category(cat["name"], cat["url"])
-        for club in cat_results:
-            club_id = club["club_page"]
-            if club_id in club_data:
-                existing_cats = club_data[club_id]["categories"]
-                if cat["name"] not in existing_cats:
-                    existing_cats.append(cat["name"])
-            else:
-                club_data[club_id] = {
-                    "club_name": club["club_name"],
-                    "categories": [cat["name"]],
-                    "club_page": club["club_page"],
-                    "ig": club["ig"],
-                    "discord": club["discord"],
+    # Club page -> its link and categories, in first-seen order
+    club_pages = {}
+    with ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY) as pool:
+        cat_links = pool.map(lambda cat: scrape_category(cat["name"], cat["url"]), cats)
+        for cat, links in zip(cats, cat_links, strict=True):
+            for link in links:
+                entry = club_pages.setdefault(
+                    link.split("/")[-1], {"link": link, "categories": []}
+                )
+                if cat["name"] not in entry["categories"]:
+                    entry["categories"].append(cat["name"])
+        clubs = pool.map(scrape_club, [entry["link"] for entry in club_pages.values()])
+
+        res = []
+        for club, entry in zip(clubs, club_pages.values(), strict=True):
+            club["categories"] = "; ".join(entry["categories"])
+            res.append(
+                {
+                    key: club[key]
+                    for key in ("club_name", "categories", "club_page", "ig", "discord")
                 }
-        time.sleep(REQUEST_DELAY)
-
-    res = []
-    for club_url, club_info in club_data.items():
-        res.append(
-            {
-                "club_name": club_info["club_name"],
-                "categories": "; ".join(club_info["categories"]),
-                "club_page": club_info["club_page"],
-                "ig": club_info["ig"],
-                "discord": club_info["discord"],
-            }
-        )
+            )
+    stats = http_cache.stats
+    print(
+        f"Crawled {len(res)} clubs: {stats['fetched']} pages fetched, "
+        f"{stats['not_modified']} not modified, {stats['failed']} failed"
+    )
     return res
 
 
@@ -31,10 +31,14 @@ def get_referenced_s3_keys() -> set[str]:
     logger.info("Querying events table for referenced image URLs...")
 
     try:
-        events = Events.objects.filter(image_url__isnull=False).values_list(
-            "image_url", flat=True
+        events = Events.objects.filter(source_image_url__isnull=False).values_list(
+            "source_image_url", "image_variants"
         )
-        referenced_keys = {urlparse(image_url).path.lstrip("/") for image_url in events}
+        referenced_keys = set()
+        for image_url, variants in events:
+            # Derivatives may be named after another upload the image was matched to
+            urls = [image_url, *(variants or {}).values()]
+            referenced_keys.update(urlparse(url).path.lstrip("/") for url in urls)
         logger.info(f"Found {len(referenced_keys)} referenced S3 keys")
         return referenced_keys
 
@@ -43,6 +47,12 @@ def get_referenced_s3_keys() -> set[str]:
         raise
 
 
+def _key_stem(key: str) -> str:
+    """Key without its extension(s): events/<name>.vision.jpg -> events/<name>"""
+    directory, _, name = key.rpartition("/")
+    return f"{directory}/{name.split('.', 1)[0]}"
+
+
 def main():
     parser = argparse.ArgumentParser(description="Clean up unused S3 objects")
     parser.add_argument(
@@ -57,7 +67,14 @@ def main():
 
         all_s3_keys = list_all_s3_objects()
 
-        orphaned_keys = set(all_s3_keys) - referenced_keys
+        # Derived copies (events/<sha256>.vision.jpg, ...) live as long as
+        # their original
+        referenced_stems = {_key_stem(key) for key in referenced_keys}
+        orphaned_keys = {
+            key
+            for key in all_s3_keys
+            if key not in referenced_keys and _key_stem(key) not in referenced_stems
+        }
 
         logger.info(f"Referenced keys: {len(referenced_keys)}")
         logger.info(f"Total S3 objects: {len(all_s3_keys)}")
@@ -0,0 +1,157 @@
+"""
+Batch job clients for bulk OpenAI requests.
+
+Requests are written as Batch API JSONL lines ({"custom_id", "method", "url",
+"body"}); a client submits the file, reports the job status and yields result
+lines ({"custom_id", "response": {"status_code", "body"}, "error"}).
+
+- OpenAIBatchClient: the OpenAI Batch API (files + batches endpoints)
+- LocalBatchClient: file-based stand-in that answers every request with a
+  responder function when the job is first polled; for tests and dry runs
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Jobs of the local client, next to the other scraper stores
+OPENAI_BATCH_DIR = Path(
+    os.getenv(
+        "OPENAI_BATCH_DIR",
+        Path(__file__).resolve().parent.parent / "scraping" / "batches" / "local",
+    )
+)
+
+
+class BatchTimeoutError(TimeoutError):
+    def __init__(self, batch_id: str, status: str, timeout: float):
+        super().__init__(f"Batch {batch_id} still {status} after {timeout}s")
+
+
+class OpenAIBatchClient:
+    def __init__(self, client: OpenAI | None = None):
+        load_dotenv()
+        self.client = client or OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def submit(self, input_path: Path, endpoint: str = "/v1/chat/completions") -> str:
+        """Upload the JSONL input file and start a batch job, returning its id"""
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=endpoint, completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} from {input_path}")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        """Yield result lines of a finished batch, including per-request errors"""
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchClient:
+    def __init__(self, root: Path, responder: Callable[[dict], dict] | None = None):
+        self.root = Path(root)
+        self.responder = responder or _empty_completion
+
+    def submit(self, input_path: Path, endpoint: str = "/v1/chat/completions") -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        batch_dir = self.root / batch_id
+        batch_dir.mkdir(parents=True)
+        (batch_dir / "input.jsonl").write_bytes(Path(input_path).read_bytes())
+        (batch_dir / "endpoint").write_text(endpoint, encoding="utf-8")
+        (batch_dir / "status").write_text("validating", encoding="utf-8")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        batch_dir = self.root / batch_id
+        status = (batch_dir / "status").read_text(encoding="utf-8")
+        if status not in TERMINAL_STATUSES:
+            endpoint = (batch_dir / "endpoint").read_text(encoding="utf-8")
+            with (
+                open(batch_dir / "input.jsonl", encoding="utf-8") as src,
+                open(batch_dir / "output.jsonl", "w", encoding="utf-8") as out,
+            ):
+                for line in src:
+                    if line.strip():
+                        result = self._respond(json.loads(line), endpoint)
+                        out.write(json.dumps(result) + "\n")
+            status = "completed"
+            (batch_dir / "status").write_text(status, encoding="utf-8")
+        return status
+
+    def _respond(self, request: dict, endpoint: str) -> dict:
+        response = None
+        # Like the Batch API, every request must target the job's endpoint
+        if request.get("url") != endpoint:
+            error = {
+                "code": "invalid_url",
+                "message": f"{request.get('url')} is not {endpoint}",
+            }
+        else:
+            try:
+                response = {"status_code": 200, "body": self.responder(request["body"])}
+                error = None
+            except Exception as e:
+                error = {"code": "responder_error", "message": str(e)}
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+            "custom_id": request["custom_id"],
+            "response": response,
+            "error": error,
+        }
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        with open(self.root / batch_id / "output.jsonl", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _empty_completion(body: dict) -> dict:
+    """Chat completion body answering every request with no events"""
+    return {
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "[]"}}],
+    }
+
+
+def wait_for_batch(
+    client, batch_id: str, poll_interval: float = 60, timeout=None
+) -> str:
+    """Poll a batch until it reaches a terminal status and return that status"""
+    started = time.monotonic()
+    while True:
+        status = client.status(batch_id)
+        if status in TERMINAL_STATUSES:
+            logger.info(f"Batch {batch_id} finished: {status}")
+            return status
+        if timeout and time.monotonic() - started > timeout:
+            raise BatchTimeoutError(batch_id, status, timeout)
+        logger.info(f"Batch {batch_id} is {status}, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+
+def get_batch_client():
+    """Batch client chosen by OPENAI_BATCH_BACKEND ("openai", or "local")"""
+    if os.getenv("OPENAI_BATCH_BACKEND", "openai") == "local":
+        return LocalBatchClient(OPENAI_BATCH_DIR)
+    return OpenAIBatchClient()
@@ -5,6 +5,8 @@ import django
 import requests
 from django.conf import settings
 
+from utils.http_session import make_session
+
 # Setup Django if not already configured
 if not settings.configured:
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
@@ -18,6 +20,14 @@ class EmailService:
         self.api_key = os.getenv("RESEND_API_KEY")
         self.from_email = os.getenv("RESEND_FROM_EMAIL", "onboarding@resend.dev")
         self.base_url = "https://api.resend.com/emails"
+        # Sends carry an Idempotency-Key, so Resend drops duplicates of retried POSTs
+        self.session = make_session(
+            retry_post=True,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
 
     def _get_events_added_today(self):
         """Fetch events that were added to the database today"""
@@ -54,7 +64,9 @@ class EmailService:
                     "location": event.location,
                     "description": event.description or "No description available.",
                     "club": club_name,
-                    "image_url": event.image_url,
+                    # The 480px card copy covers the 200px-high banner
+                    "image_url": (event.image_variants or {}).get("card")
+                    or event.image_url,
                 }
             )
 
@@ -626,6 +638,20 @@ class EmailService:
   </body>
 </html>"""
 
+    def _send(self, payload, idempotency_key):
+        """POST an email on the pooled session; the key makes retries safe"""
+        try:
+            response = self.session.post(
+                self.base_url,
+                json=payload,
+                headers={"Idempotency-Key": idempotency_key},
+            )
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"Error sending email: {e}")
+            return False
+
     def send_welcome_email(self, to_email, unsubscribe_token):
         """Send welcome email with events added today to new subscriber"""
         if not self.api_key:
@@ -642,18 +668,7 @@ class EmailService:
             "html": html_content,
         }
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-        try:
-            response = requests.post(self.base_url, json=payload, headers=headers)
-            response.raise_for_status()
-            return True
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending email: {e}")
-            return False
+        return self._send(payload, f"welcome/{date.today()}/{to_email}")
 
     def send_newsletter_email(self, to_email, unsubscribe_token):
         """Send newsletter email with events added today to subscriber"""
@@ -671,18 +686,7 @@ class EmailService:
             "html": html_content,
         }
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-        try:
-            response = requests.post(self.base_url, json=payload, headers=headers)
-            response.raise_for_status()
-            return True
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending email: {e}")
-            return False
+        return self._send(payload, f"newsletter/{date.today()}/{to_email}")
 
 
 # Singleton instance
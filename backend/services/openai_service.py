@@ -10,44 +10,116 @@ This module provides methods for interacting with OpenAI's API, including:
 import json
 import logging
 import os
+import re
+import time
 import traceback
 from datetime import datetime
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from utils.caption_parser import (
+    RULES_ONLY_EXTRACTION,
+    parse_caption,
+    prompt_hints,
+    rule_based_events,
+)
+from utils.openai_usage import openai_usage
 
 logger = logging.getLogger(__name__)
 
+# Vision detail level for image input ("low", "high" or "auto")
+OPENAI_IMAGE_DETAIL = os.getenv("OPENAI_IMAGE_DETAIL", "auto")
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Inputs per embeddings request in generate_embeddings, well within the
+# API's per-request input and token limits for caption-sized texts
+EMBEDDING_BATCH_SIZE = int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", "256"))
+
+
+def _clean_embedding_text(text: str) -> str:
+    """Collapse newlines and runs of whitespace for better embedding quality"""
+    return re.sub(r"\s+", " ", text.replace("\n", " ").replace("\r", " ").strip())
+
 
 class OpenAIService:
     def __init__(self):
         load_dotenv()
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-    def generate_embedding(self, text: str) -> list[float]:
+    def generate_embedding(
+        self, text: str, endpoint: str = "embeddings", timeout: float | None = None
+    ) -> list[float]:
         """
         Generate embedding vector for text using OpenAI's text-embedding-3-small model (1536 dimensions).
+        Usage is recorded under endpoint; returns None once its budget is spent.
         """
         if not text:
             return None
+        if endpoint == "search":
+            if not openai_usage.allow_search_embedding():
+                logger.warning("Search embedding budget exceeded, skipping embedding")
+                return None
+        elif openai_usage.over_run_budget():
+            logger.warning("OpenAI run budget exceeded, skipping embedding")
+            return None
 
-        # Clean up the text for better embedding quality
-        text = text.replace("\n", " ").replace("\r", " ").strip()
-
-        # Remove extra whitespace
-        import re
-
-        text = re.sub(r"\s+", " ", text)
-
+        text = _clean_embedding_text(text)
+        model = EMBEDDING_MODEL
+        started = time.perf_counter()
         try:
             response = self.client.embeddings.create(
-                input=[text], model="text-embedding-3-small"
+                input=[text], model=model, **({"timeout": timeout} if timeout else {})
+            )
+            openai_usage.record(
+                endpoint, model, response.usage, time.perf_counter() - started
             )
             return response.data[0].embedding
         except Exception as e:
+            openai_usage.record(
+                endpoint, model, latency_s=time.perf_counter() - started, error=True
+            )
             logger.error(f"Failed to generate embedding: {e}")
             return None
 
+    def generate_embeddings(
+        self, texts: list[str], endpoint: str = "embeddings"
+    ) -> list[list[float] | None]:
+        """
+        Embeddings for many texts in as few requests as possible (one per
+        EMBEDDING_BATCH_SIZE texts), in order. Empty texts, failed requests and
+        texts past the run budget get None, like generate_embedding.
+        """
+        embeddings = [None] * len(texts)
+        pending = [
+            (i, _clean_embedding_text(text)) for i, text in enumerate(texts) if text
+        ]
+        for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+            if openai_usage.over_run_budget():
+                logger.warning("OpenAI run budget exceeded, skipping embeddings")
+                break
+            chunk = pending[start : start + EMBEDDING_BATCH_SIZE]
+            started = time.perf_counter()
+            try:
+                response = self.client.embeddings.create(
+                    input=[text for _, text in chunk], model=EMBEDDING_MODEL
+                )
+            except Exception as e:
+                openai_usage.record(
+                    endpoint,
+                    EMBEDDING_MODEL,
+                    latency_s=time.perf_counter() - started,
+                    error=True,
+                )
+                logger.error(f"Failed to generate {len(chunk)} embeddings: {e}")
+                continue
+            openai_usage.record(
+                endpoint, EMBEDDING_MODEL, response.usage, time.perf_counter() - started
+            )
+            for (i, _), item in zip(chunk, response.data, strict=True):
+                embeddings[i] = item.embedding
+        return embeddings
+
     def generate_event_embedding(self, event) -> list[float]:
         """
         Generate embedding for an event using a rich text representation.
@@ -76,10 +148,19 @@ class OpenAIService:
         enhanced_text = " | ".join(parts)
         return self.generate_embedding(enhanced_text)
 
-    def extract_events_from_caption(
-        self, caption_text: str, image_url: str | None = None
-    ) -> list[dict[str, str | bool | float | None]]:
-        """Extract event information from Instagram caption text and optional image"""
+    def _build_extraction_request(
+        self, caption_text: str, image_url: str | None = None, hints: dict | None = None
+    ) -> dict:
+        """
+        Chat completion arguments for extracting events from a caption and
+        optional image. Fields already parsed from the caption by rules are
+        passed as hints, and a single-date caption gets a smaller max_tokens.
+        """
+        # Drop the image before building the prompt if the run can't afford it
+        if image_url and not openai_usage.allow_image_input():
+            logger.info("Image budget exceeded, extracting from caption only")
+            image_url = None
+
         # Get current date and day of week for context
         now = datetime.now()
         current_date = now.strftime("%Y-%m-%d")
@@ -130,101 +211,252 @@ class OpenAIService:
     - Return ONLY the JSON array, no additional text
     - If no events are found, return an empty array []
         {f"- An image is provided at: {image_url}. If there are conflicts between caption and image information, ALWAYS prioritize the caption text over visual cues from the image." if image_url else ""}
+        {f"- These fields were already parsed from the caption: {json.dumps(hints)}. Use them unless the caption or image clearly says otherwise" if hints else ""}
         """
 
-        try:
-            logger.debug(
-                f"Parsing caption of length: {len(caption_text) if caption_text else 0}"
-            )
-            if caption_text:
-                logger.debug(f"Caption preview: {caption_text[:100]}...")
+        logger.debug(
+            f"Parsing caption of length: {len(caption_text) if caption_text else 0}"
+        )
+        if caption_text:
+            logger.debug(f"Caption preview: {caption_text[:100]}...")
+
+        # Prepare messages for the API call
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that extracts event information from social media posts. Always return valid JSON with the exact structure requested.",
+            },
+            {"role": "user", "content": [{"type": "text", "text": prompt}]},
+        ]
+
+        model = "gpt-4o-mini"  # Vision-capable, so it also reads the image
 
-            # Prepare messages for the API call
-            messages = [
+        # Add image to the message if provided
+        if image_url:
+            logger.debug(f"Including image analysis from: {image_url}")
+            messages[1]["content"].append(
                 {
-                    "role": "system",
-                    "content": "You are a helpful assistant that extracts event information from social media posts. Always return valid JSON with the exact structure requested.",
-                },
-                {"role": "user", "content": [{"type": "text", "text": prompt}]},
-            ]
+                    "type": "image_url",
+                    "image_url": {"url": image_url, "detail": OPENAI_IMAGE_DETAIL},
+                }
+            )
 
-            # Add image to the message if provided
-            if image_url:
-                logger.debug(f"Including image analysis from: {image_url}")
-                messages[1]["content"].append(
-                    {"type": "image_url", "image_url": {"url": image_url}}
-                )
-                model = "gpt-4o-mini"  # Use vision-capable model
-            else:
-                model = "gpt-4o-mini"
+        # One event echoes the caption once in its description, plus the
+        # other fields and any image details
+        max_tokens = 2000
+        if hints and len(hints.get("dates", [])) <= 1:
+            max_tokens = min(max_tokens, 400 + len(caption_text or "") // 2)
 
-            response = self.client.chat.completions.create(
-                model=model, messages=messages, temperature=0.1, max_tokens=2000
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+        }
+
+    def _parse_caption_rules(self, caption_text: str, image_url: str | None = None):
+        """
+        Rule-based pass over the caption: (events, None) if the caption states
+        everything needed, otherwise (None, hints) for the LLM prompt
+        """
+        started = time.perf_counter()
+        facts = parse_caption(caption_text)
+        if facts["complete"] and RULES_ONLY_EXTRACTION:
+            openai_usage.record(
+                "extraction_rules", "rules", latency_s=time.perf_counter() - started
             )
+            logger.info("Caption fully parsed by rules, skipping the LLM")
+            return rule_based_events(facts, caption_text, image_url), None
+        return None, prompt_hints(facts)
 
-            # Extract the JSON response
-            response_text = response.choices[0].message.content.strip()
+    def _parse_extraction_response(
+        self, response_text: str, image_url: str | None = None
+    ) -> list[dict[str, str | bool | float | None]]:
+        """Parse the model's JSON array of events, filling in missing fields"""
+        # Try to parse the JSON response
+        try:
+            # Remove any markdown formatting if present
+            if response_text.startswith("```json"):
+                response_text = response_text[7:]
+            if response_text.endswith("```"):
+                response_text = response_text[:-3]
 
-            # Try to parse the JSON response
-            try:
-                # Remove any markdown formatting if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-
-                events_data = json.loads(response_text.strip())
-
-                # Ensure events_data is a list
-                if not isinstance(events_data, list):
-                    logger.warning("Response is not a list, wrapping in array")
-                    events_data = [events_data] if events_data else []
-
-                # Process each event in the array
-                processed_events = []
-                for event_data in events_data:
-                    # Ensure all required fields are present
-                    required_fields = [
-                        "name",
-                        "date",
-                        "start_time",
-                        "end_time",
-                        "location",
-                        "price",
-                        "food",
-                        "registration",
-                        "image_url",
-                        "description",
-                    ]
-                    for field in required_fields:
-                        if field not in event_data:
-                            if field == "price":
-                                event_data[field] = None
-                            elif field == "registration":
-                                event_data[field] = False
-                            else:
-                                event_data[field] = ""
-
-                    # Set image_url if provided
-                    if image_url and not event_data.get("image_url"):
-                        event_data["image_url"] = image_url
-
-                    processed_events.append(event_data)
-
-                return processed_events
-
-            except json.JSONDecodeError:
-                logger.exception("Error parsing JSON response")
-                logger.error(f"Response text: {response_text}")
-                # Return default structure if JSON parsing fails
-                return [_get_default_event_structure(image_url)]
+            events_data = json.loads(response_text.strip())
+
+            # Ensure events_data is a list
+            if not isinstance(events_data, list):
+                logger.warning("Response is not a list, wrapping in array")
+                events_data = [events_data] if events_data else []
+
+            # Process each event in the array
+            processed_events = []
+            for event_data in events_data:
+                # Ensure all required fields are present
+                required_fields = [
+                    "name",
+                    "date",
+                    "start_time",
+                    "end_time",
+                    "location",
+                    "price",
+                    "food",
+                    "registration",
+                    "image_url",
+                    "description",
+                ]
+                for field in required_fields:
+                    if field not in event_data:
+                        if field == "price":
+                            event_data[field] = None
+                        elif field == "registration":
+                            event_data[field] = False
+                        else:
+                            event_data[field] = ""
+
+                # Set image_url if provided
+                if image_url and not event_data.get("image_url"):
+                    event_data["image_url"] = image_url
+
+                processed_events.append(event_data)
+
+            return processed_events
 
+        except json.JSONDecodeError:
+            logger.exception("Error parsing JSON response")
+            logger.error(f"Response text: {response_text}")
+            # Return default structure if JSON parsing fails
+            return [_get_default_event_structure(image_url)]
+
+    def _extraction_request(
+        self, caption_text: str, image_url: str | None, vision_url: str | None
+    ) -> tuple[list[dict] | None, dict | None]:
+        """
+        (events, None) if the caption needs no model call (run budget spent or
+        fully parsed by rules), otherwise (None, chat completion arguments)
+        """
+        if openai_usage.over_run_budget():
+            logger.warning("OpenAI run budget exceeded, skipping extraction")
+            return [], None
+        events, hints = self._parse_caption_rules(caption_text, image_url)
+        if events:
+            return events, None
+        # The model sees the downscaled copy if there is one; events keep the original
+        return None, self._build_extraction_request(
+            caption_text, vision_url or image_url, hints
+        )
+
+    def _extraction_result(
+        self, request, started, caption_text, image_url, response=None
+    ) -> list[dict[str, str | bool | float | None]]:
+        """Record usage for an extraction call and parse its response (None if it failed)"""
+        try:
+            if response is None:
+                openai_usage.record(
+                    "extraction",
+                    request["model"],
+                    latency_s=time.perf_counter() - started,
+                    error=True,
+                )
+            else:
+                openai_usage.record(
+                    "extraction",
+                    request["model"],
+                    response.usage,
+                    time.perf_counter() - started,
+                )
+                return self._parse_extraction_response(
+                    response.choices[0].message.content.strip(), image_url
+                )
         except Exception:
             logger.exception("Error parsing caption")
-            logger.error(f"Caption text: {caption_text}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            # Return default structure if API call fails
-            return [_get_default_event_structure(image_url)]
+        logger.error(f"Caption text: {caption_text}")
+        # Return default structure if API call fails
+        return [_get_default_event_structure(image_url)]
+
+    def extract_events_from_caption(
+        self,
+        caption_text: str,
+        image_url: str | None = None,
+        vision_url: str | None = None,
+    ) -> list[dict[str, str | bool | float | None]]:
+        """
+        Extract event information from Instagram caption text and optional
+        image. vision_url, if given, is a downscaled copy of the image sent to
+        the model in place of image_url.
+        """
+        events, request = self._extraction_request(caption_text, image_url, vision_url)
+        if request is None:
+            return events
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(**request)
+        except Exception:
+            logger.exception("Error extracting events from caption")
+            response = None
+        return self._extraction_result(
+            request, started, caption_text, image_url, response
+        )
+
+    async def extract_events_from_caption_async(
+        self,
+        caption_text: str,
+        image_url: str | None = None,
+        vision_url: str | None = None,
+    ) -> list[dict[str, str | bool | float | None]]:
+        """Async variant of extract_events_from_caption, using the async client"""
+        events, request = self._extraction_request(caption_text, image_url, vision_url)
+        if request is None:
+            return events
+        started = time.perf_counter()
+        try:
+            response = await self.async_client.chat.completions.create(**request)
+        except Exception:
+            logger.exception("Error extracting events from caption")
+            response = None
+        return self._extraction_result(
+            request, started, caption_text, image_url, response
+        )
+
+    def extraction_batch_request(
+        self,
+        custom_id: str,
+        caption_text: str,
+        image_url: str | None = None,
+        vision_url: str | None = None,
+    ) -> dict:
+        """Batch API input line for extract_events_from_caption"""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._build_extraction_request(
+                caption_text,
+                vision_url or image_url,
+                prompt_hints(parse_caption(caption_text)),
+            ),
+        }
+
+    def parse_extraction_batch_result(
+        self, result: dict, image_url: str | None = None
+    ) -> list[dict[str, str | bool | float | None]] | None:
+        """
+        Events from a Batch API result line, or None if the request failed.
+        Its usage is recorded at the batch price.
+        """
+        response = result.get("response") or {}
+        body = response.get("body") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            openai_usage.record(
+                "extraction_batch", body.get("model"), body.get("usage"), error=True
+            )
+            logger.error(
+                f"Batch request {result.get('custom_id')} failed: "
+                f"{result.get('error') or response.get('status_code')}"
+            )
+            return None
+        openai_usage.record("extraction_batch", body.get("model"), body.get("usage"))
+        content = body["choices"][0]["message"]["content"] or ""
+        return self._parse_extraction_response(content.strip(), image_url)
 
     def generate_recommended_filters(self, events_data: list[dict]) -> list[str]:
         """Generate recommended filter keywords from upcoming events data using GPT"""
@@ -266,6 +498,7 @@ NO explanations, NO additional text, JUST the JSON array.
                 f"Generating recommended filters from {len(event_summaries)} events"
             )
 
+            started = time.perf_counter()
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
@@ -278,6 +511,9 @@ NO explanations, NO additional text, JUST the JSON array.
                 temperature=0.3,
                 max_tokens=300,
             )
+            openai_usage.record(
+                "filters", "gpt-4o-mini", response.usage, time.perf_counter() - started
+            )
 
             response_text = response.choices[0].message.content.strip()
 
@@ -331,10 +567,19 @@ def _get_default_event_structure(
     }
 
 
+def is_fallback_extraction(events: list[dict]) -> bool:
+    """Whether events is the placeholder returned when an extraction call failed"""
+    return len(events) == 1 and events[0] == _get_default_event_structure(
+        events[0].get("image_url")
+    )
+
+
 # Singleton instance
 openai_service = OpenAIService()
 
 # Backward compatibility - export functions that use the singleton
 generate_embedding = openai_service.generate_embedding
+generate_embeddings = openai_service.generate_embeddings
 extract_events_from_caption = openai_service.extract_events_from_caption
+extract_events_from_caption_async = openai_service.extract_events_from_caption_async
 generate_recommended_filters = openai_service.generate_recommended_filters
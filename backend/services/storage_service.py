@@ -3,21 +3,74 @@ Cloud storage service for file uploads and management.
 
 This module provides methods for uploading and managing files in cloud storage,
 specifically AWS S3. It handles image validation, optimization, and upload.
+
+Images are downloaded as ImageData (see utils/image_utils.py): the body is
+streamed under a byte cap, and format and dimensions come from the header,
+so validation and upload never decode the pixels.
+
+Uploaded images are content-addressed (events/<sha256>.<ext>): an image
+already in the bucket, or already uploaded by this process, is not uploaded
+again. With IMAGE_PHASH_DEDUP=1, near-identical images (crops, re-encodes)
+uploaded earlier in the process reuse that upload too.
+
+Derived copies are named after the stored original an image resolves to, so
+a near-duplicate shares the vision copy and derivatives of the upload it
+reused. upload_vision_variant() stores a downscaled, recompressed copy next
+to the original (events/<sha256>.vision.jpg) for use as LLM image input.
+
+schedule_derivatives() renders the IMAGE_DERIVATIVES set (thumbnail, card,
+full; WebP or AVIF) in a process pool, off the scraping path;
+collect_derivatives() uploads the finished ones (events/<sha256>.<name>.<ext>)
+and returns their URLs per original image URL.
 """
 
 import logging
+import multiprocessing
 import os
-import uuid
-from io import BytesIO
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 import boto3
-import requests
+import httpx
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from PIL import Image
+
+from utils.http_session import make_session
+from utils.image_utils import (
+    DERIVATIVE_FORMATS,
+    DOWNLOAD_CHUNK_SIZE,
+    CappedBuffer,
+    ImageData,
+    ImageRejectedError,
+    hamming_distance,
+    parse_derivative_specs,
+    render_derivatives,
+    render_variant,
+)
+from utils.run_metrics import pipeline_metrics
 
 logger = logging.getLogger(__name__)
 
+IMAGE_PHASH_DEDUP = os.getenv("IMAGE_PHASH_DEDUP", "0") == "1"
+# Difference-hash bits two images may differ by and still count as the same
+IMAGE_PHASH_MAX_DISTANCE = int(os.getenv("IMAGE_PHASH_MAX_DISTANCE", "4"))
+# LLM input copy: images up to 512px fit in a single vision tile
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "512"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "80"))
+# name:max_side:format for the frontend and newsletter copies ("" disables)
+IMAGE_DERIVATIVES = parse_derivative_specs(
+    os.getenv("IMAGE_DERIVATIVES", "thumb:160:webp,card:480:webp,full:1080:webp")
+)
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "75"))
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", "2"))
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    )
+}
+
 
 class StorageService:
     def __init__(self):
@@ -25,6 +78,16 @@ class StorageService:
         self.bucket_name = os.getenv("AWS_S3_BUCKET_NAME")
         self.region = os.getenv("AWS_DEFAULT_REGION", "us-east-2")
         self.s3_client = self._init_s3_client()
+        self.http = make_session()
+        # Keys known to be in the bucket, by content hash and perceptual hash
+        self._keys_by_sha256 = {}
+        self._keys_by_phash = {}
+        self._stored_keys = set()
+        self._derivative_pool = None
+        # Original image URL -> (Future of rendered derivatives, key stem), or
+        # their URLs if they were already stored
+        self._pending_derivatives = {}
+        self._derivatives_lock = threading.Lock()
 
     def _init_s3_client(self):
         """Initialize AWS S3 client"""
@@ -34,83 +97,154 @@ class StorageService:
             logger.exception("Failed to initialize S3 client")
             return None
 
-    def _validate_image(self, image_data: bytes) -> bool:
-        """Validate image format and size"""
-        try:
-            img = Image.open(BytesIO(image_data))
-
-            if img.format not in ["JPEG", "PNG", "WEBP"]:
-                logger.warning(f"Unsupported image format: {img.format}")
-                return False
-
-            if len(image_data) > 10 * 1024 * 1024:  # 10MB limit
-                logger.warning(f"Image too large: {len(image_data)} bytes")
-                return False
+    def _public_url(self, key: str) -> str:
+        return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
 
+    def _object_exists(self, key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
             return True
-        except Exception:
-            logger.exception("Image validation failed")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                logger.warning(f"Could not check for existing S3 object {key}: {e}")
             return False
 
-    def _download_image_from_url(self, image_url: str) -> bytes | None:
-        """Download image from URL"""
+    def _existing_key(self, image: ImageData, phash: int | None) -> str | None:
+        """Key of an already stored copy of this image, if any"""
+        key = self._keys_by_sha256.get(image.sha256)
+        if key:
+            return key
+        if phash is not None:
+            for known_phash, known_key in self._keys_by_phash.items():
+                if hamming_distance(phash, known_phash) <= IMAGE_PHASH_MAX_DISTANCE:
+                    self._keys_by_sha256[image.sha256] = known_key
+                    return known_key
+        key = f"events/{image.sha256}.{image.ext}"
+        if self._object_exists(key):
+            self._keys_by_sha256[image.sha256] = key
+            return key
+        return None
+
+    def _key_stem(self, image: ImageData) -> str:
+        """events/<sha256> of the stored original this image resolves to"""
+        key = self._keys_by_sha256.get(image.sha256) or f"events/{image.sha256}"
+        directory, _, name = key.rpartition("/")
+        return f"{directory}/{name.split('.', 1)[0]}"
+
+    def _put_public_object(self, key: str, body: bytes, content_type: str):
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType=content_type,
+            CacheControl="max-age=31536000",
+            ACL="public-read",
+        )
+
+    def _validate_image(self, image: ImageData | bytes) -> ImageData | None:
+        """Validate image format and size from its header, without decoding it"""
+        if isinstance(image, ImageData):
+            return image
         try:
-            headers = {
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-                )
-            }
-            response = requests.get(image_url, headers=headers, timeout=30)
-            response.raise_for_status()
-
-            return response.content
-        except Exception:
-            logger.exception(f"Failed to download image from {image_url}")
+            return ImageData.from_bytes(image)
+        except ImageRejectedError as e:
+            logger.warning(f"Image validation failed: {e}")
             return None
 
+    def fetch_image(self, image_url: str) -> ImageData | None:
+        """
+        Stream an image from URL, giving up as soon as it's oversized or not an
+        image. Timed as the image_download stage, which only counts failed
+        downloads as errors; rejected images are counted as images_rejected.
+        """
+        with pipeline_metrics.stage("image_download") as stage:
+            try:
+                with self.http.get(
+                    image_url, headers=DOWNLOAD_HEADERS, stream=True
+                ) as response:
+                    response.raise_for_status()
+                    buffer = CappedBuffer()
+                    buffer.check_length(response.headers.get("Content-Length"))
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        buffer.feed(chunk)
+                return ImageData.from_bytes(buffer.getvalue())
+            except ImageRejectedError as e:
+                pipeline_metrics.count("images_rejected")
+                logger.warning(f"Rejected image from {image_url}: {e}")
+                return None
+            except Exception:
+                stage.fail()
+                logger.exception(f"Failed to download image from {image_url}")
+                return None
+
+    async def fetch_image_async(
+        self, image_url: str, client: httpx.AsyncClient | None = None
+    ) -> ImageData | None:
+        """fetch_image on an async HTTP client, reusing the caller's if given"""
+        if client is None:
+            async with httpx.AsyncClient(timeout=30) as own_client:
+                return await self.fetch_image_async(image_url, own_client)
+        with pipeline_metrics.stage("image_download") as stage:
+            try:
+                async with client.stream(
+                    "GET", image_url, headers=DOWNLOAD_HEADERS, timeout=30
+                ) as response:
+                    response.raise_for_status()
+                    buffer = CappedBuffer()
+                    buffer.check_length(response.headers.get("Content-Length"))
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        buffer.feed(chunk)
+                return ImageData.from_bytes(buffer.getvalue())
+            except ImageRejectedError as e:
+                pipeline_metrics.count("images_rejected")
+                logger.warning(f"Rejected image from {image_url}: {e}")
+                return None
+            except Exception:
+                stage.fail()
+                logger.exception(f"Failed to download image from {image_url}")
+                return None
+
     def upload_image_from_url(
         self, image_url: str, filename: str | None = None
     ) -> str | None:
         """Upload image from URL to S3"""
-        try:
-            image_data = self._download_image_from_url(image_url)
-            if not image_data:
-                return None
+        image = self.fetch_image(image_url)
+        if not image:
+            return None
+        return self.upload_image(image, filename)
 
-            if not self._validate_image(image_data):
-                return None
+    def upload_image(
+        self, image: ImageData | bytes, filename: str | None = None
+    ) -> str | None:
+        """Upload a downloaded image to S3, naming the file by format if needed"""
+        try:
+            with pipeline_metrics.stage("image_validation") as stage:
+                image = self._validate_image(image)
+                if not image:
+                    stage.fail()
+                    return None
 
+            phash = None
             if not filename:
-                file_ext = "jpg"
-                try:
-                    img = Image.open(BytesIO(image_data))
-                    if img.format == "PNG":
-                        file_ext = "png"
-                    elif img.format == "WEBP":
-                        file_ext = "webp"
-                except Exception as e:
-                    logger.warning(
-                        f"Could not detect image format: {e}, defaulting to jpg"
+                phash = image.dhash() if IMAGE_PHASH_DEDUP else None
+                existing_key = self._existing_key(image, phash)
+                if existing_key:
+                    pipeline_metrics.count("image_dedup_hits")
+                    logger.info(
+                        f"Image already stored as {existing_key}, skipping upload"
                     )
-                    pass
-
-                filename = f"events/{uuid.uuid4()}.{file_ext}"
+                    return self._public_url(existing_key)
+                filename = f"events/{image.sha256}.{image.ext}"
 
             logger.info(f"Uploading image to S3: {filename}")
 
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=filename,
-                Body=image_data,
-                ContentType=f'image/{filename.split(".")[-1]}',
-                CacheControl="max-age=31536000",
-                ACL="public-read",
-            )
+            with pipeline_metrics.stage("s3_upload"):
+                self._put_public_object(filename, image.data, image.content_type)
+            self._keys_by_sha256[image.sha256] = filename
+            if phash is not None:
+                self._keys_by_phash[phash] = filename
 
-            public_url = (
-                f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{filename}"
-            )
+            public_url = self._public_url(filename)
             logger.info(f"Successfully uploaded image: {filename}")
 
             return public_url
@@ -125,23 +259,15 @@ class StorageService:
     def upload_image_data(self, image_data: bytes, filename: str) -> str | None:
         """Upload raw image data to S3"""
         try:
-            if not self._validate_image(image_data):
+            image = self._validate_image(image_data)
+            if not image:
                 return None
 
             logger.info(f"Uploading image data to S3: {filename}")
 
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=filename,
-                Body=image_data,
-                ContentType=f'image/{filename.split(".")[-1]}',
-                CacheControl="max-age=31536000",
-                ACL="public-read",
-            )
+            self._put_public_object(filename, image.data, image.content_type)
 
-            public_url = (
-                f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{filename}"
-            )
+            public_url = self._public_url(filename)
             logger.info(f"Successfully uploaded image data: {filename}")
 
             return public_url
@@ -153,6 +279,94 @@ class StorageService:
             logger.exception("Unexpected error uploading image data")
             return None
 
+    def upload_vision_variant(self, image: ImageData) -> str | None:
+        """
+        Upload the downscaled copy of an image sent to the LLM, returning its
+        URL, or None if the original is already small enough to send as is
+        """
+        if max(image.width, image.height) <= VISION_MAX_SIDE and image.format == "JPEG":
+            return None
+        key = f"{self._key_stem(image)}.vision.jpg"
+        try:
+            if key in self._stored_keys or self._object_exists(key):
+                self._stored_keys.add(key)
+                return self._public_url(key)
+            with pipeline_metrics.stage("vision_variant"):
+                data = render_variant(
+                    image.decode(), VISION_MAX_SIDE, "JPEG", VISION_JPEG_QUALITY
+                )
+                self._put_public_object(key, data, "image/jpeg")
+            self._stored_keys.add(key)
+            logger.info(
+                f"Uploaded vision variant {key} ({len(data)} of {len(image)} bytes)"
+            )
+            return self._public_url(key)
+        except Exception:
+            logger.exception(f"Failed to upload vision variant of {image.sha256}")
+            return None
+
+    def derivative_urls(self, image: ImageData) -> dict[str, str]:
+        return {
+            name: self._public_url(f"{self._key_stem(image)}.{name}.{ext}")
+            for name, _, ext in IMAGE_DERIVATIVES
+        }
+
+    def schedule_derivatives(self, image: ImageData, image_url: str):
+        """Queue the derivatives of an uploaded image for rendering in the process pool"""
+        if not IMAGE_DERIVATIVES or not image_url:
+            return
+        with self._derivatives_lock:
+            if image_url in self._pending_derivatives:
+                return
+        # Derivatives are uploaded in spec order, so the last one marks a full set
+        name, _, ext = IMAGE_DERIVATIVES[-1]
+        last_key = f"{self._key_stem(image)}.{name}.{ext}"
+        if last_key in self._stored_keys or self._object_exists(last_key):
+            pending = self.derivative_urls(image)
+        else:
+            if self._derivative_pool is None:
+                self._derivative_pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_DERIVATIVE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._derivative_pool.submit(
+                render_derivatives,
+                image.data,
+                IMAGE_DERIVATIVES,
+                IMAGE_DERIVATIVE_QUALITY,
+            )
+            pending = (future, self._key_stem(image))
+        with self._derivatives_lock:
+            self._pending_derivatives[image_url] = pending
+
+    def collect_derivatives(self, timeout=None) -> dict[str, dict[str, str]]:
+        """
+        Wait for scheduled derivatives, upload them and return their URLs by
+        original image URL. Images whose derivatives failed are left out
+        """
+        with self._derivatives_lock:
+            pending, self._pending_derivatives = self._pending_derivatives, {}
+        collected = {}
+        for image_url, job in pending.items():
+            if isinstance(job, dict):
+                collected[image_url] = job
+                continue
+            future, stem = job
+            try:
+                urls = {}
+                for name, ext, data in future.result(timeout=timeout):
+                    key = f"{stem}.{name}.{ext}"
+                    content_type = f"image/{DERIVATIVE_FORMATS[ext].lower()}"
+                    self._put_public_object(key, data, content_type)
+                    self._stored_keys.add(key)
+                    urls[name] = self._public_url(key)
+                collected[image_url] = urls
+            except Exception:
+                logger.exception(f"Failed to store derivatives of {image_url}")
+        if collected:
+            logger.info(f"Stored derivatives for {len(collected)} image(s)")
+        return collected
+
     def delete_images(self, filenames: list[str]) -> int:
         """Delete multiple images from S3"""
         logger.info(f"Deleting {len(filenames)} images from S3...")
@@ -165,6 +379,12 @@ class StorageService:
             )
 
             deleted_count = len(response.get("Deleted", []))
+            deleted_keys = {obj["Key"] for obj in response.get("Deleted", [])}
+            self._stored_keys -= deleted_keys
+            for cache in (self._keys_by_sha256, self._keys_by_phash):
+                for hash_key, key in list(cache.items()):
+                    if key in deleted_keys:
+                        del cache[hash_key]
 
             logger.info(f"Successfully deleted {deleted_count} images")
             return deleted_count
@@ -203,6 +423,12 @@ storage_service = StorageService()
 
 # Backward compatibility - export functions that use the singleton
 upload_image_from_url = storage_service.upload_image_from_url
+upload_image = storage_service.upload_image
+fetch_image = storage_service.fetch_image
+upload_vision_variant = storage_service.upload_vision_variant
+schedule_image_derivatives = storage_service.schedule_derivatives
+collect_image_derivatives = storage_service.collect_derivatives
+fetch_image_async = storage_service.fetch_image_async
 upload_image_data = storage_service.upload_image_data
 delete_images = storage_service.delete_images
 list_all_s3_objects = storage_service.list_all_s3_objects
@@ -1 +1,6 @@
 # Tests package
+import sys
+from pathlib import Path
+
+# Scraper modules run as scripts from scraping/ and import their siblings by name
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scraping"))
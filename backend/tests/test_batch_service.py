@@ -0,0 +1,62 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from services.batch_service import LocalBatchClient, wait_for_batch
+
+
+class LocalBatchClientTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.input_path = self.root / "requests.jsonl"
+        lines = [
+            {
+                "custom_id": code,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": "gpt-4o-mini"},
+            }
+            for code in ("ABC123", "DEF456")
+        ]
+        self.input_path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batch_round_trip(self):
+        """Test every request gets a result keyed by its custom_id."""
+        client = LocalBatchClient(self.root / "batches")
+        batch_id = client.submit(self.input_path)
+
+        self.assertEqual(wait_for_batch(client, batch_id, poll_interval=0), "completed")
+        results = {r["custom_id"]: r for r in client.results(batch_id)}
+        self.assertEqual(set(results), {"ABC123", "DEF456"})
+        body = results["ABC123"]["response"]["body"]
+        self.assertEqual(body["choices"][0]["message"]["content"], "[]")
+
+    def test_responder_errors_are_per_request(self):
+        """Test a failing request is reported as an error line, not raised."""
+
+        def responder(body):
+            raise ValueError("boom")
+
+        client = LocalBatchClient(self.root / "batches", responder=responder)
+        batch_id = client.submit(self.input_path)
+        client.status(batch_id)
+
+        results = list(client.results(batch_id))
+        self.assertEqual(len(results), 2)
+        self.assertIsNone(results[0]["response"])
+        self.assertEqual(results[0]["error"]["message"], "boom")
+
+    def test_requests_for_another_endpoint_fail(self):
+        """Test a request whose url isn't the job's endpoint gets an error line."""
+        client = LocalBatchClient(self.root / "batches")
+        batch_id = client.submit(self.input_path, endpoint="/v1/embeddings")
+        client.status(batch_id)
+
+        results = list(client.results(batch_id))
+        self.assertTrue(all(r["response"] is None for r in results))
+        self.assertEqual(results[0]["error"]["code"], "invalid_url")
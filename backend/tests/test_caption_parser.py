@@ -0,0 +1,41 @@
+from datetime import date
+from unittest import TestCase
+
+from utils.caption_parser import parse_caption, prompt_hints, rule_based_events
+
+TODAY = date(2026, 10, 15)  # a Thursday
+
+
+class CaptionParserTest(TestCase):
+    def test_complete_caption_becomes_event(self):
+        """Test a caption stating title, date, time and room needs no LLM."""
+        caption = (
+            "🎲 BOARD GAMES NIGHT 🎲\n\nJoin us Friday Oct 16, 6-8pm in DC 1302. "
+            "Free pizza and drinks! RSVP at the link in bio"
+        )
+        facts = parse_caption(caption, TODAY)
+        self.assertTrue(facts["complete"])
+        event = rule_based_events(facts, caption, "https://img")[0]
+        self.assertEqual(event["name"], "Board Games Night")
+        self.assertEqual(event["date"], "2026-10-16")
+        self.assertEqual((event["start_time"], event["end_time"]), ("18:00", "20:00"))
+        self.assertEqual(event["location"], "DC 1302")
+        self.assertEqual(event["food"], "Pizza, drinks")
+        self.assertIsNone(event["price"])
+        self.assertTrue(event["registration"])
+
+    def test_partial_caption_gives_hints(self):
+        """Test relative dates, inherited meridiems and prices become hints."""
+        facts = parse_caption(
+            "Hey everyone! AGM tomorrow 11-1pm, $5 at the door", TODAY
+        )
+        self.assertFalse(facts["complete"])
+        self.assertEqual(
+            prompt_hints(facts),
+            {
+                "dates": ["2026-10-16"],
+                "start_time": "11:00",
+                "end_time": "13:00",
+                "prices": [5.0],
+            },
+        )
@@ -0,0 +1,72 @@
+import gzip
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from dead_letters import DeadLetterStore, pack_embedding, unpack_embedding
+
+
+def _pending(n, embedding=None):
+    return {
+        "event_data": {"name": f"Event {n}", "date": "2026-01-15"},
+        "club_ig": "club",
+        "post_url": f"https://www.instagram.com/p/{n}/",
+        "embedding": embedding,
+    }
+
+
+class DeadLetterStoreTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_embedding_round_trip(self):
+        """Test packed embeddings come back as the same float32 values."""
+        embedding = [0.25, -1.5, 2.0**-20, 0.0]
+        packed = pack_embedding(embedding)
+        self.assertIsInstance(packed, str)
+        self.assertEqual(unpack_embedding(packed), embedding)
+        self.assertIsNone(pack_embedding(None))
+        self.assertIsNone(unpack_embedding(None))
+
+    def test_records_are_buffered_until_flush(self):
+        """Test nothing is written before flush_every records, and flush writes the rest."""
+        store = DeadLetterStore(self.root, flush_every=3)
+        store.add(_pending(1, [1.0, 2.0]), "db_unavailable", "down")
+        store.add(_pending(2), "missing_fields", "date")
+        self.assertEqual(store.files(), [])
+        store.add(_pending(3), "insert_error")
+        self.assertEqual(len(store.files()), 1)
+        store.add(_pending(4), "no_table")
+        store.flush()
+
+        records = list(store.iter_records())
+        names = [r["event"]["name"] for r in records]
+        self.assertEqual(names, ["Event 1", "Event 2", "Event 3", "Event 4"])
+        self.assertEqual(unpack_embedding(records[0]["embedding"]), [1.0, 2.0])
+        self.assertEqual([r["recoverable"] for r in records], [True, False, True, True])
+
+    def test_files_rotate_at_max_bytes(self):
+        """Test a file past max_bytes is closed and the next flush starts a new one."""
+        store = DeadLetterStore(self.root, flush_every=1, max_bytes=1)
+        for n in range(3):
+            store.add(_pending(n), "insert_error")
+        self.assertEqual(len(store.files()), 3)
+        self.assertEqual(len(list(store.iter_records())), 3)
+
+    def test_corrupt_lines_are_skipped(self):
+        """Test a truncated line is skipped without losing the records around it."""
+        store = DeadLetterStore(self.root, flush_every=2)
+        store.add(_pending(1), "insert_error")
+        store.add(_pending(2), "insert_error")
+        (path,) = store.files()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            first, second = f.readlines()
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.writelines([first, second[: len(second) // 2] + "\n", second])
+
+        records = list(store.iter_records())
+        self.assertEqual([r["event"]["name"] for r in records], ["Event 1", "Event 2"])
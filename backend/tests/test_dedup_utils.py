@@ -0,0 +1,27 @@
+from unittest import TestCase
+
+from utils.dedup_utils import build_dedup_key, normalize_string
+
+
+class DedupKeyTest(TestCase):
+    def test_normalize_string(self):
+        """Test punctuation, whitespace and case are ignored."""
+        self.assertEqual(normalize_string("  Coffee Crawl! "), "coffeecrawl")
+        self.assertEqual(normalize_string(None), "")
+
+    def test_equivalent_events_share_key(self):
+        """Test formatting differences map to the same key."""
+        a = build_dedup_key("Coffee Crawl", "2025-10-17", "DC 1302")
+        b = build_dedup_key("COFFEE-CRAWL", "2025-10-17", "dc1302")
+        self.assertEqual(a, b)
+        self.assertEqual(len(a), 64)
+
+    def test_different_date_changes_key(self):
+        """Test the date is part of the key."""
+        a = build_dedup_key("Coffee Crawl", "2025-10-17", "DC 1302")
+        b = build_dedup_key("Coffee Crawl", "2025-10-18", "DC 1302")
+        self.assertNotEqual(a, b)
+
+    def test_missing_date(self):
+        """Test events without a date get no key."""
+        self.assertIsNone(build_dedup_key("Coffee Crawl", "", "DC 1302"))
@@ -0,0 +1,63 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from utils.event_classifier import (
+    DEFAULT_WEIGHTS,
+    FEATURES_VERSION,
+    EventClassifier,
+    caption_features,
+    train,
+)
+
+EVENT = (
+    "Join us this Friday, Oct 24 at 6:30pm in DC 1302 for our fall games night! "
+    "Free pizza and drinks, RSVP at the link in bio"
+)
+RECAP = (
+    "Thank you to everyone who came out last week, what a night! "
+    "Swipe for highlights and congrats to our tournament winners"
+)
+
+
+class EventClassifierTest(TestCase):
+    def test_keeps_events_and_skips_recaps(self):
+        """Test the default weights keep an announcement and skip a recap."""
+        classifier = EventClassifier()
+        self.assertTrue(classifier.is_probable_event(EVENT)[0])
+        self.assertFalse(classifier.is_probable_event(RECAP)[0])
+        self.assertEqual(classifier.is_probable_event("New merch drop!"), (True, 1.0))
+
+    def test_train_separates_labels(self):
+        """Test trained weights score events above non-events."""
+        classifier = EventClassifier(train([(EVENT, True), (RECAP, False)] * 5))
+        self.assertGreater(classifier.score(EVENT), 0.5)
+        self.assertLess(classifier.score(RECAP), 0.5)
+
+    def test_terms_match_whole_words_once(self):
+        """Test terms match on word boundaries, phrases count once, and non-event phrases hide their words."""
+        self.assertEqual(
+            caption_features("Welcome back! Become a member in our classroom")[
+                "event_terms"
+            ],
+            0,
+        )
+        self.assertEqual(caption_features("Join us!")["event_terms"], 1)
+        features = caption_features("What a night, thanks for joining")
+        self.assertEqual(features["event_terms"], 0)
+        self.assertEqual(features["non_event_terms"], 2)
+
+    def test_load_ignores_models_trained_on_older_features(self):
+        """Test a model without the current features_version falls back to the defaults."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "model.json"
+            weights = dict.fromkeys(DEFAULT_WEIGHTS, 1.0)
+            path.write_text(json.dumps({"weights": weights}), encoding="utf-8")
+            self.assertEqual(EventClassifier.load(path).weights, DEFAULT_WEIGHTS)
+
+            path.write_text(
+                json.dumps({"weights": weights, "features_version": FEATURES_VERSION}),
+                encoding="utf-8",
+            )
+            self.assertEqual(EventClassifier.load(path).weights, weights)
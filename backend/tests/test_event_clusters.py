@@ -0,0 +1,104 @@
+import threading
+from datetime import date
+from unittest import TestCase
+
+from utils.event_clusters import RunEventIndex
+
+
+def prefer_longer(new, old):
+    return len(new) > len(old)
+
+
+def prefer_longer_text(new, old):
+    return prefer_longer(new["text"], old["text"])
+
+
+class RunEventIndexTest(TestCase):
+    def test_clusters_similar_events_on_the_same_date(self):
+        """Test copies cluster by cosine similarity only within a date, and the preferred copy wins."""
+        index = RunEventIndex(threshold=0.9)
+        day, other_day = date(2030, 1, 1), date(2030, 1, 2)
+
+        self.assertEqual(
+            index.claim(day, [1.0, 0.0, 0.0], "gala", prefer_longer), (None, True)
+        )
+        self.assertEqual(
+            index.claim(day, [0.0, 1.0, 0.0], "talk", prefer_longer), (None, True)
+        )
+        self.assertEqual(
+            index.claim(other_day, [1.0, 0.0, 0.0], "gala", prefer_longer), (None, True)
+        )
+        # Near-identical copy, not preferred: a duplicate of the canonical
+        self.assertEqual(
+            index.claim(day, [0.99, 0.05, 0.0], "gal", prefer_longer), ("gala", False)
+        )
+        # Richer copy takes over the cluster
+        self.assertEqual(
+            index.claim(day, [2.0, 0.1, 0.0], "gala night", prefer_longer),
+            ("gala", True),
+        )
+        self.assertEqual(
+            index.claim(day, [1.0, 0.0, 0.0], "gala!", prefer_longer),
+            ("gala night", False),
+        )
+        self.assertEqual(len(index), 3)
+
+        # No date or embedding: never indexed
+        self.assertEqual(
+            index.claim(None, [1.0, 0.0, 0.0], "x", prefer_longer), (None, True)
+        )
+        self.assertEqual(index.claim(day, None, "x", prefer_longer), (None, True))
+        self.assertEqual(len(index), 3)
+
+    def test_supersede_resolves_against_each_write_state(self):
+        """Test a replaced copy is dropped before its write, and unknown while preparing or still writing."""
+        index = RunEventIndex(threshold=0.9)
+
+        preparing = {}
+        self.assertEqual(index.supersede(preparing), ("unknown", None))
+        self.assertFalse(index.attach(preparing, {"replace_ids": []}))
+
+        queued = {}
+        self.assertTrue(index.attach(queued, {"replace_ids": [7]}))
+        self.assertEqual(index.supersede(queued), ("dropped", {"replace_ids": [7]}))
+        self.assertFalse(index.begin_write(queued))
+
+        stuck = {}
+        index.attach(stuck, {})
+        index.begin_write(stuck)
+        self.assertEqual(index.supersede(stuck, timeout=0.01), ("unknown", None))
+
+    def test_supersede_waits_for_an_interleaved_write(self):
+        """Test a richer copy prepared while the earlier one is being written replaces it by id, not both written."""
+        index = RunEventIndex(threshold=0.9)
+        day = date(2030, 1, 1)
+        earlier = {"text": "gala"}
+        index.claim(day, [1.0, 0.0], earlier, prefer_longer_text)
+        pending = {"replace_ids": []}
+        index.attach(earlier, pending)
+        self.assertTrue(index.begin_write(earlier))
+
+        writing = threading.Event()
+        finish = threading.Event()
+
+        def write():
+            writing.set()
+            finish.wait()
+            pending["event_id"] = 42
+            index.end_write(earlier)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait()
+
+        richer = {"text": "gala night"}
+        replaced, accepted = index.claim(day, [1.0, 0.01], richer, prefer_longer_text)
+        self.assertIs(replaced, earlier)
+        self.assertTrue(accepted)
+        threading.Timer(0.05, finish.set).start()
+        outcome, payload = index.supersede(replaced, timeout=5)
+        writer.join()
+
+        self.assertEqual(outcome, "written")
+        self.assertEqual(payload["event_id"], 42)
+        self.assertNotIn("superseded", earlier)
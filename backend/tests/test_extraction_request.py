@@ -0,0 +1,58 @@
+import os
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+# The client refuses to initialise without a key; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from services.openai_service import openai_service
+from utils.openai_usage import openai_usage
+
+IMAGE_URL = "https://example.com/events/poster.jpg"
+
+
+class ExtractionRequestTest(TestCase):
+    def test_includes_the_image_within_budget(self):
+        """Test an affordable image is sent and mentioned in the prompt."""
+        with mock.patch.object(openai_usage, "allow_image_input", return_value=True):
+            request = openai_service._build_extraction_request(
+                "Gala tonight", IMAGE_URL
+            )
+
+        content = request["messages"][1]["content"]
+        self.assertEqual(request["model"], "gpt-4o-mini")
+        self.assertEqual(content[1]["image_url"]["url"], IMAGE_URL)
+        self.assertIn(f"An image is provided at: {IMAGE_URL}", content[0]["text"])
+
+    def test_falls_back_to_the_caption_over_the_image_budget(self):
+        """Test an image over budget is dropped from the message and prompt, not an error."""
+        with mock.patch.object(openai_usage, "allow_image_input", return_value=False):
+            request = openai_service._build_extraction_request(
+                "Gala tonight", IMAGE_URL
+            )
+
+        content = request["messages"][1]["content"]
+        self.assertEqual(request["model"], "gpt-4o-mini")
+        self.assertEqual([part["type"] for part in content], ["text"])
+        self.assertNotIn("An image is provided", content[0]["text"])
+
+
+class BatchedEmbeddingsTest(TestCase):
+    def test_embeds_many_texts_in_one_request(self):
+        """Test generate_embeddings sends one request and keeps None for empty texts."""
+        response = SimpleNamespace(
+            data=[SimpleNamespace(embedding=[1.0]), SimpleNamespace(embedding=[2.0])],
+            usage=SimpleNamespace(prompt_tokens=4),
+        )
+        openai_usage.reset()
+        with mock.patch.object(
+            openai_service.client.embeddings, "create", return_value=response
+        ) as create:
+            embeddings = openai_service.generate_embeddings(
+                ["Gala\n night", "", "Talk"]
+            )
+
+        create.assert_called_once()
+        self.assertEqual(create.call_args.kwargs["input"], ["Gala night", "Talk"])
+        self.assertEqual(embeddings, [[1.0], None, [2.0]])
+        self.assertEqual(openai_usage.report()["endpoints"]["embeddings"]["calls"], 1)
@@ -0,0 +1,56 @@
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase
+
+from feed_checkpoint import DONE, EXTRACTED, FAILED, FeedCheckpoint
+
+
+def make_post(shortcode, day):
+    return SimpleNamespace(
+        shortcode=shortcode, owner_username="club", date_utc=datetime(2030, 1, day)
+    )
+
+
+class FeedCheckpointTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "checkpoint.json"
+
+    def test_high_water_stops_below_a_failed_post(self):
+        """Test high water advances only to the newest post with nothing older failed."""
+        checkpoint = FeedCheckpoint(self.path)
+        checkpoint.start_run()
+        checkpoint.update(make_post("old", 1), DONE)
+        checkpoint.update(make_post("broken", 2), FAILED, error="boom")
+        checkpoint.update(make_post("new", 3), DONE)
+        checkpoint.finish_run()
+
+        self.assertEqual(checkpoint.high_water["shortcode"], "old")
+        self.assertEqual(FeedCheckpoint.load(self.path).high_water_time().day, 1)
+
+    def test_high_water_holds_when_the_walk_stopped_early(self):
+        """Test a run stopped at max_posts leaves the high water where it was."""
+        checkpoint = FeedCheckpoint(self.path)
+        checkpoint.start_run()
+        checkpoint.update(make_post("first", 1), DONE)
+        checkpoint.finish_run()
+        checkpoint.start_run()
+        checkpoint.update(make_post("capped", 5), DONE)
+        checkpoint.finish_run(walked_to_cutoff=False)
+
+        self.assertEqual(checkpoint.high_water["shortcode"], "first")
+
+    def test_resume_retries_failed_and_in_flight_posts(self):
+        """Test a resumed run picks up failed posts as well as half-processed ones."""
+        checkpoint = FeedCheckpoint(self.path)
+        checkpoint.start_run()
+        checkpoint.update(make_post("done", 1), DONE)
+        checkpoint.update(make_post("broken", 2), FAILED, error="boom")
+        checkpoint.update(make_post("halfway", 3), EXTRACTED, events=[])
+
+        resumed = FeedCheckpoint.load(self.path)
+        resumed.start_run(resume=True)
+        self.assertEqual(sorted(resumed.unfinished_shortcodes()), ["broken", "halfway"])
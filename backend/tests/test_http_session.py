@@ -0,0 +1,28 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from requests.adapters import HTTPAdapter
+
+from utils.http_session import make_session
+
+
+class HttpSessionTest(TestCase):
+    def test_default_timeout_and_retries(self):
+        """Test requests get the session timeout and only idempotent methods retry."""
+        session = make_session(pool_size=2, retries=2, timeout=(1, 2))
+        adapter = session.get_adapter("https://example.com")
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn("GET", adapter.max_retries.allowed_methods)
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+        self.assertIn(
+            "POST",
+            make_session(retry_post=True)
+            .get_adapter("https://x")
+            .max_retries.allowed_methods,
+        )
+
+        with patch.object(HTTPAdapter, "send", return_value="ok") as send:
+            adapter.send("request")
+            adapter.send("request", timeout=9)
+        self.assertEqual(send.call_args_list[0].kwargs["timeout"], (1, 2))
+        self.assertEqual(send.call_args_list[1].kwargs["timeout"], 9)
@@ -0,0 +1,80 @@
+from io import BytesIO
+from unittest import TestCase
+
+from PIL import Image
+
+from utils.image_utils import (
+    CappedBuffer,
+    ImageData,
+    ImageRejectedError,
+    hamming_distance,
+    parse_derivative_specs,
+    render_derivatives,
+    render_variant,
+)
+
+
+def _png(width=40, height=20):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class ImageDataTest(TestCase):
+    def test_reads_format_and_size_from_header(self):
+        """Test header metadata is read without decoding, and decode works once."""
+        image = ImageData.from_bytes(_png())
+        self.assertEqual((image.format, image.width, image.height), ("PNG", 40, 20))
+        self.assertEqual((image.ext, image.content_type), ("png", "image/png"))
+        self.assertEqual(image.decode().getpixel((0, 0)), (255, 0, 0))
+        with self.assertRaises(ImageRejectedError):
+            ImageData.from_bytes(b"<html>not found</html>")
+
+    def test_capped_buffer_rejects_early(self):
+        """Test streamed bodies stop at the first non-image chunk or the byte cap."""
+        with self.assertRaises(ImageRejectedError):
+            CappedBuffer().feed(b"<!DOCTYPE html><html>")
+        with self.assertRaises(ImageRejectedError):
+            CappedBuffer(limit=100).check_length("5000")
+        buffer = CappedBuffer(limit=100)
+        buffer.feed(_png()[:60])
+        with self.assertRaises(ImageRejectedError) as rejected:
+            buffer.feed(b"\0" * 60)
+        self.assertEqual(rejected.exception.reason, "over_limit")
+        self.assertEqual(str(rejected.exception), "Image too large: over 100 bytes")
+
+    def test_dhash_matches_reencoded_copies(self):
+        """Test a resized re-encode stays within a few bits of the original."""
+        poster = Image.new("RGB", (200, 200), "white")
+        poster.paste(Image.new("RGB", (100, 200), "black"))
+        original, reencoded, other = BytesIO(), BytesIO(), BytesIO()
+        poster.save(original, "PNG")
+        poster.resize((120, 120)).save(reencoded, "JPEG", quality=60)
+        poster.transpose(Image.Transpose.FLIP_TOP_BOTTOM).rotate(90).save(other, "PNG")
+        phash = ImageData.from_bytes(original.getvalue()).dhash()
+        self.assertLessEqual(
+            hamming_distance(phash, ImageData.from_bytes(reencoded.getvalue()).dhash()),
+            4,
+        )
+        self.assertGreater(
+            hamming_distance(phash, ImageData.from_bytes(other.getvalue()).dhash()), 4
+        )
+
+    def test_render_variant_bounds_longest_side(self):
+        """Test variants are scaled down to fit, keeping the aspect ratio."""
+        image = ImageData.from_bytes(_png(1080, 1350))
+        variant = ImageData.from_bytes(render_variant(image.decode(), 512, "JPEG", 80))
+        self.assertEqual(
+            (variant.format, variant.width, variant.height), ("JPEG", 410, 512)
+        )
+
+    def test_render_derivatives_from_one_decode(self):
+        """Test each derivative spec is rendered at its size and format."""
+        specs = parse_derivative_specs("thumb:160:webp, card:480:jpg")
+        rendered = render_derivatives(_png(1080, 1350), specs)
+        self.assertEqual(
+            [(name, ext) for name, ext, _ in rendered],
+            [("thumb", "webp"), ("card", "jpg")],
+        )
+        thumb = ImageData.from_bytes(rendered[0][2])
+        self.assertEqual((thumb.format, thumb.height), ("WEBP", 160))
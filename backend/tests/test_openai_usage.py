@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from utils.openai_usage import UsageTracker, call_cost
+
+
+class UsageTrackerTest(TestCase):
+    def test_call_cost_discounts_cached_tokens(self):
+        """Test cached prompt tokens are billed at the cached rate."""
+        full = call_cost("gpt-4o-mini", 1_000_000, 0)
+        cached = call_cost("gpt-4o-mini", 1_000_000, 0, cached_tokens=1_000_000)
+        self.assertAlmostEqual(full, 0.15)
+        self.assertAlmostEqual(cached, 0.075)
+        self.assertEqual(call_cost("unknown-model", 1000, 1000), 0.0)
+
+    def test_record_aggregates_per_endpoint(self):
+        """Test tokens, cache hits, errors and latency are summed per endpoint."""
+        tracker = UsageTracker()
+        usage = SimpleNamespace(
+            prompt_tokens=1000,
+            completion_tokens=200,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=500),
+        )
+        tracker.record("extraction", "gpt-4o-mini", usage, latency_s=2.0)
+        tracker.record("extraction", "gpt-4o-mini", latency_s=4.0, error=True)
+        tracker.record(
+            "embeddings", "text-embedding-3-small", SimpleNamespace(prompt_tokens=10)
+        )
+
+        report = tracker.report()
+        extraction = report["endpoints"]["extraction"]
+        self.assertEqual(extraction["calls"], 2)
+        self.assertEqual(extraction["errors"], 1)
+        self.assertEqual(extraction["cache_hits"], 1)
+        self.assertEqual(extraction["prompt_tokens"], 1000)
+        self.assertAlmostEqual(extraction["mean_latency_s"], 3.0)
+        self.assertEqual(report["tokens"], 1210)
+        self.assertAlmostEqual(
+            tracker.window_cost("embeddings", 60), tracker.total_cost("embeddings")
+        )
+
+    def test_batch_results_are_costed_at_the_batch_price(self):
+        """Test Batch API usage dicts are recorded and billed at the batch price."""
+        tracker = UsageTracker()
+        usage = {
+            "prompt_tokens": 1_000_000,
+            "completion_tokens": 0,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        tracker.record("extraction_batch", "gpt-4o-mini", usage)
+        tracker.record("extraction", "gpt-4o-mini", usage)
+
+        self.assertAlmostEqual(tracker.total_cost("extraction_batch"), 0.075)
+        self.assertAlmostEqual(tracker.total_cost("extraction"), 0.15)
+        self.assertEqual(tracker.report()["tokens"], 2_000_000)
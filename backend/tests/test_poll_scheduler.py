@@ -0,0 +1,83 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from poll_scheduler import SMOOTHING, PollScheduler, run_scheduled
+
+NOW = datetime(2026, 1, 15, tzinfo=timezone.utc)
+
+
+def _polled(days_ago, post_rate, hit_rate):
+    return {
+        "last_polled": (NOW - timedelta(days=days_ago)).isoformat(),
+        "post_rate": post_rate,
+        "hit_rate": hit_rate,
+        "polls": 1,
+        "events_added": 0,
+    }
+
+
+class PollSchedulerTest(TestCase):
+    def setUp(self):
+        self.scheduler = PollScheduler("unused.json")
+        self.scheduler.clubs = {
+            # ~24 new posts since the last poll: most valuable, but 4 requests
+            "busy": _polled(2, post_rate=12, hit_rate=0.8),
+            "slow": _polled(3, post_rate=1, hit_rate=0.5),
+            # Interval is 4 days, polled 2 days ago
+            "quiet": _polled(2, post_rate=0.5, hit_rate=0.5),
+            # Never expected to post, but past the forced check
+            "dormant": _polled(15, post_rate=0, hit_rate=0.05),
+        }
+        self.handles = ["busy", "slow", "quiet", "dormant", "new"]
+
+    def test_plan_ranks_due_clubs(self):
+        """Test forced and first polls lead, then due clubs by expected event posts."""
+        plan = self.scheduler.plan(self.handles, budget=100, now=NOW)
+        self.assertEqual(plan, ["dormant", "new", "busy", "slow"])
+
+    def test_plan_skips_clubs_over_budget(self):
+        """Test a club that would overrun the budget is skipped, not the cheaper ones after it."""
+        plan = self.scheduler.plan(self.handles, budget=7, now=NOW)
+        self.assertEqual(plan, ["dormant", "new", "slow"])
+
+    def test_overdue_clubs_are_forced(self):
+        """Test a dormant club is only due once MAX_INTERVAL_DAYS have passed."""
+        self.scheduler.clubs["dormant"] = _polled(13, post_rate=0, hit_rate=0.05)
+        self.assertEqual(self.scheduler.plan(["dormant"], now=NOW), [])
+        self.scheduler.clubs["dormant"] = _polled(14, post_rate=0, hit_rate=0.05)
+        self.assertEqual(self.scheduler.plan(["dormant"], now=NOW), ["dormant"])
+
+    def test_record_poll_smooths_rates(self):
+        """Test the first poll sets the rates and later polls blend them in."""
+        result = {"posts": 3, "event_posts": 1, "events_added": 2, "newest_post": None}
+        self.scheduler.record_poll("new", result, polled_at=NOW)
+        stats = self.scheduler.clubs["new"]
+        self.assertAlmostEqual(stats["post_rate"], 3 / 14)
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+
+        result = {"posts": 2, "event_posts": 2, "events_added": 3, "newest_post": None}
+        self.scheduler.record_poll("new", result, polled_at=NOW + timedelta(days=1))
+        self.assertAlmostEqual(
+            stats["post_rate"], SMOOTHING * 2 + (1 - SMOOTHING) * 3 / 14
+        )
+        self.assertAlmostEqual(stats["hit_rate"], SMOOTHING + (1 - SMOOTHING) / 3)
+        self.assertEqual((stats["polls"], stats["events_added"]), (2, 5))
+
+    def test_record_poll_without_posts_keeps_hit_rate(self):
+        """Test a poll with no new posts lowers the post rate only."""
+        result = {"posts": 0, "event_posts": 0, "events_added": 0, "newest_post": None}
+        self.scheduler.record_poll("slow", result, polled_at=NOW)
+        stats = self.scheduler.clubs["slow"]
+        self.assertAlmostEqual(stats["post_rate"], (1 - SMOOTHING) * 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_run_without_due_clubs_starts_no_workers(self):
+        """Test an empty plan returns before any worker logs in."""
+        sharded_feed = SimpleNamespace(
+            load_club_handles=list, ShardCoordinator=mock.Mock()
+        )
+        with mock.patch.dict(sys.modules, {"sharded_feed": sharded_feed}):
+            run_scheduled()
+        sharded_feed.ShardCoordinator.assert_not_called()
@@ -0,0 +1,53 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ProxyError
+
+from utils.proxy_pool import ProxyPool
+
+
+class ProxyPoolTest(TestCase):
+    def setUp(self):
+        self.pool = ProxyPool(
+            ["http://proxy-a:8011", "http://proxy-b:8011"],
+            ["instagram.com"],
+            headers={"Zyte-Geolocation": "CA"},
+        )
+
+    def test_routes_only_configured_hosts(self):
+        """Test only the configured domains and their subdomains are proxied."""
+        self.assertTrue(self.pool.routes("https://www.instagram.com/graphql/query"))
+        self.assertTrue(self.pool.routes("https://instagram.com/"))
+        self.assertFalse(self.pool.routes("https://bucket.s3.amazonaws.com/a.jpg"))
+        self.assertFalse(self.pool.routes("https://notinstagram.com/"))
+        self.assertFalse(
+            ProxyPool([], ["instagram.com"]).routes("https://instagram.com")
+        )
+
+    def test_fails_over_to_next_endpoint(self):
+        """Test a refused proxy is skipped and cooled down, and direct hosts get no proxy."""
+        used = []
+
+        def send(adapter, request, **kwargs):
+            used.append((kwargs.get("proxies") or {}).get("https"))
+            if used[-1] == "http://proxy-a:8011":
+                raise ProxyError("refused")
+            return "ok"
+
+        adapter = self.pool.mount(requests.Session()).get_adapter("https://x")
+        with patch.object(HTTPAdapter, "send", send):
+            for url in (
+                "https://www.instagram.com/",
+                "https://www.instagram.com/",
+                "https://api.openai.com/",
+            ):
+                self.assertEqual(
+                    adapter.send(requests.Request("GET", url).prepare()), "ok"
+                )
+        self.assertEqual(
+            used,
+            ["http://proxy-a:8011", "http://proxy-b:8011", "http://proxy-b:8011", None],
+        )
+        self.assertEqual(self.pool.candidates()[-1], "http://proxy-a:8011")
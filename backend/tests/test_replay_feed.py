@@ -0,0 +1,63 @@
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from feed_archive import FeedArchive
+from replay_feed import replay
+
+from apps.events.models import Events
+
+
+class ReplayFeedTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.archive = FeedArchive(self.tmp.name)
+        # A post scraped in 2024, for an event a week later
+        self.archive._append(
+            {
+                "kind": "post",
+                "archived_at": "2024-03-01T12:00:00+00:00",
+                "shortcode": "PAST1",
+                "owner_username": "chessclub",
+                "date_utc": "2024-03-01T10:00:00",
+                "caption": "Chess night next Friday in SLC 3102, 7pm!",
+                "image_url": None,
+                "image_sha256": None,
+                "node": {},
+            }
+        )
+        self.archive.append_extraction(
+            "PAST1",
+            [
+                {
+                    "name": "Chess Night",
+                    "date": "2024-03-08",
+                    "start_time": "19:00",
+                    "end_time": "",
+                    "location": "SLC 3102",
+                    "price": None,
+                    "food": "",
+                    "registration": False,
+                    "image_url": "",
+                    "description": "Chess night next Friday in SLC 3102, 7pm!",
+                }
+            ],
+        )
+        keep = mock.patch(
+            "instagram_feed.event_classifier.is_probable_event",
+            return_value=(True, 1.0),
+        )
+        keep.start()
+        self.addCleanup(keep.stop)
+
+    def test_replays_past_dated_archive_as_of_its_run(self):
+        """Test events upcoming when the post was archived are replayed, not dropped as past."""
+        self.assertEqual(replay(self.archive), 1)
+        # Rolled back unless --commit
+        self.assertFalse(Events.objects.filter(title="Chess Night").exists())
+
+    def test_commit_keeps_replayed_rows(self):
+        """Test --commit keeps the replayed event."""
+        self.assertEqual(replay(self.archive, commit=True), 1)
+        self.assertTrue(Events.objects.filter(title="Chess Night").exists())
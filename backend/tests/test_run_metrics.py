@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from utils.run_metrics import RunMetrics
+
+
+class RunMetricsTest(TestCase):
+    def setUp(self):
+        self.metrics = RunMetrics()
+
+    def test_stage_counts_errors(self):
+        """Test fail() and exceptions both count as stage errors."""
+        with self.metrics.stage("image_download") as stage:
+            stage.fail()
+        with self.metrics.stage("image_download"):
+            pass
+        with self.assertRaises(ValueError), self.metrics.stage("image_download"):
+            raise ValueError("boom")
+
+        stats = self.metrics.report()["stages"]["image_download"]
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual(stats["errors"], 2)
+        self.assertAlmostEqual(stats["error_rate"], 2 / 3)
+
+    def test_timed_iter_records_each_fetch(self):
+        """Test every fetch is timed, including the one that ends the feed."""
+        items = list(self.metrics.timed_iter("feed_fetch", [1, 2, 3]))
+        self.assertEqual(items, [1, 2, 3])
+        self.assertEqual(self.metrics.report()["stages"]["feed_fetch"]["count"], 4)
+
+    def test_prometheus_output(self):
+        """Test stages and counters are exported in text exposition format."""
+        self.metrics.count("events_added", 2)
+        with self.metrics.stage("db_insert"):
+            pass
+        text = self.metrics.to_prometheus()
+        self.assertIn('scraper_stage_calls_total{stage="db_insert"} 1', text)
+        self.assertIn('scraper_events_total{name="events_added"} 2', text)
@@ -0,0 +1,100 @@
+from io import BytesIO
+from unittest import TestCase, mock
+
+import requests
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from services.storage_service import StorageService
+from utils.image_utils import ImageData
+from utils.run_metrics import pipeline_metrics
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, **kwargs):
+        if kwargs["Key"] not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def put_object(self, **kwargs):
+        self.objects[kwargs["Key"]] = kwargs["Body"]
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+    def iter_content(self, _chunk_size):
+        yield self.body
+
+
+class StorageServiceTest(TestCase):
+    def test_fetch_counts_rejected_images_apart_from_failed_downloads(self):
+        """Test only failed downloads are image_download errors; rejected images are counted."""
+        service = StorageService.__new__(StorageService)
+        service.http = mock.Mock()
+        pipeline_metrics.reset()
+
+        service.http.get.return_value = FakeResponse(b"not an image")
+        self.assertIsNone(service.fetch_image("https://example.com/a.jpg"))
+        service.http.get.return_value = FakeResponse(b"", status_code=503)
+        self.assertIsNone(service.fetch_image("https://example.com/b.jpg"))
+
+        report = pipeline_metrics.report()
+        self.assertEqual(report["stages"]["image_download"]["count"], 2)
+        self.assertEqual(report["stages"]["image_download"]["errors"], 1)
+        self.assertEqual(report["counters"]["images_rejected"], 1)
+
+    def test_identical_images_are_uploaded_once(self):
+        """Test content-addressed keys skip the upload for repeated images."""
+        buffer = BytesIO()
+        Image.new("RGB", (10, 10), "blue").save(buffer, "PNG")
+        service = StorageService.__new__(StorageService)
+        service.bucket_name, service.region = "bucket", "us-east-2"
+        service._keys_by_sha256, service._keys_by_phash = {}, {}
+        service.s3_client = s3 = FakeS3()
+
+        first = service.upload_image(buffer.getvalue())
+        service._keys_by_sha256.clear()  # a later run only has the bucket
+        second = service.upload_image(buffer.getvalue())
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(s3.objects), 1)
+        self.assertRegex(first, r"/events/[0-9a-f]{64}\.png$")
+
+    def test_near_duplicates_share_the_reused_upload_keys(self):
+        """Test a phash match names its vision copy after the reused original."""
+        poster = Image.new("RGB", (800, 600), "white")
+        poster.paste(Image.new("RGB", (400, 600), "black"))
+        original, reencoded = BytesIO(), BytesIO()
+        poster.save(original, "PNG")
+        poster.save(reencoded, "JPEG", quality=70)
+        service = StorageService.__new__(StorageService)
+        service.bucket_name, service.region = "bucket", "us-east-2"
+        service._keys_by_sha256, service._keys_by_phash = {}, {}
+        service._stored_keys = set()
+        service.s3_client = s3 = FakeS3()
+
+        with mock.patch("services.storage_service.IMAGE_PHASH_DEDUP", True):
+            first = service.upload_image(original.getvalue())
+            copy = ImageData.from_bytes(reencoded.getvalue())
+            second = service.upload_image(copy)
+        vision_url = service.upload_vision_variant(copy)
+
+        self.assertEqual(first, second)
+        self.assertEqual(vision_url, first.replace(".png", ".vision.jpg"))
+        self.assertEqual(len(s3.objects), 2)
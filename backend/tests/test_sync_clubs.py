@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.test import TestCase
+from sync_clubs import _merge, normalise, sync_batch, sync_clubs
+
+from apps.clubs.models import Clubs
+
+IG = "https://www.instagram.com/{}/"
+
+
+def _row(name, categories="", club_page="Not found", ig="Not found"):
+    return {
+        "club_name": name,
+        "categories": categories,
+        "club_page": club_page,
+        "ig": ig,
+        "discord": "NULL",
+    }
+
+
+class NormaliseTest(TestCase):
+    def test_normalise_scraper_row(self):
+        """Test placeholders become None and categories are split."""
+        row = normalise(
+            _row("  Chess Club ", "Games; Academic ;", ig=IG.format("chess"))
+        )
+        self.assertEqual(
+            row,
+            {
+                "club_name": "Chess Club",
+                "categories": ["Games", "Academic"],
+                "club_page": None,
+                "ig": IG.format("chess"),
+            },
+        )
+
+    def test_normalise_skips_nameless_and_truncates_long_names(self):
+        """Test rows without a name are dropped and names fit the column."""
+        self.assertIsNone(normalise(_row("Not found")))
+        self.assertIsNone(normalise({"club_name": "  "}))
+        self.assertEqual(len(normalise(_row("x" * 300))["club_name"]), 100)
+
+    def test_merge_unions_categories_and_keeps_stored_values(self):
+        """Test categories are a union and placeholders never clear stored values."""
+        stored = Clubs(
+            club_name="Chess Club",
+            categories=["Games"],
+            club_page="https://clubs.wusa.ca/clubs/1",
+            ig=IG.format("chess"),
+        )
+        merged = _merge(stored, normalise(_row("Chess Club", "Academic; Games")))
+        self.assertEqual(
+            merged,
+            {
+                "categories": ["Games", "Academic"],
+                "club_page": "https://clubs.wusa.ca/clubs/1",
+                "ig": IG.format("chess"),
+            },
+        )
+
+    def test_duplicates_in_a_batch_are_folded(self):
+        """Test a club listed twice in one batch is synced once with both copies' values."""
+        with mock.patch("sync_clubs.sync_batch") as batch:
+            counts = sync_clubs(
+                [
+                    _row("Chess Club", "Games"),
+                    _row("Chess Club", "Academic", ig=IG.format("chess")),
+                    _row("Not found"),
+                ]
+            )
+        rows = batch.call_args.args[0]
+        self.assertEqual(
+            rows["Chess Club"],
+            {
+                "club_name": "Chess Club",
+                "categories": ["Games", "Academic"],
+                "club_page": None,
+                "ig": IG.format("chess"),
+            },
+        )
+        self.assertEqual(counts["skipped"], 1)
+
+
+class SyncBatchTest(TestCase):
+    def setUp(self):
+        Clubs.objects.create(
+            club_name="Chess Club",
+            categories=["Games"],
+            ig=IG.format("chess"),
+            club_type="WUSA",
+        )
+        Clubs.objects.create(
+            club_name="Debate Society",
+            categories=["Academic"],
+            ig=IG.format("debate"),
+            club_type="Student Society",
+        )
+
+    def test_counts_and_upserts(self):
+        """Test unchanged, updated and new clubs are counted and written."""
+        counts = sync_clubs(
+            [
+                _row("Chess Club", "Games", ig=IG.format("chess")),
+                _row("Debate Society", "Politics"),
+                _row("Robotics", "Engineering", ig=IG.format("robotics")),
+                _row(""),
+            ]
+        )
+
+        self.assertEqual(
+            counts, {"inserted": 1, "updated": 1, "unchanged": 1, "skipped": 1}
+        )
+        debate = Clubs.objects.get(club_name="Debate Society")
+        self.assertEqual(debate.categories, ["Academic", "Politics"])
+        self.assertEqual(debate.ig, IG.format("debate"))
+        self.assertEqual(debate.club_type, "Student Society")
+        robotics = Clubs.objects.get(club_name="Robotics")
+        self.assertEqual(robotics.club_type, "WUSA")
+        self.assertEqual(Clubs.objects.count(), 3)
+
+        # A second sync of the same rows changes nothing
+        self.assertEqual(
+            sync_clubs([_row("Debate Society", "Politics")])["unchanged"], 1
+        )
+
+    def test_dry_run_counts_without_writing(self):
+        """Test a dry run reports the changes but leaves the table alone."""
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        sync_batch(
+            {"Robotics": normalise(_row("Robotics", "Engineering"))},
+            counts,
+            dry_run=True,
+        )
+        self.assertEqual(counts["inserted"], 1)
+        self.assertFalse(Clubs.objects.filter(club_name="Robotics").exists())
@@ -0,0 +1,374 @@
+"""
+Rule-based extraction of the fields captions usually state explicitly
+("Friday Oct 17, 6-8pm, DC 1302, free pizza"): dates, time ranges, location,
+price, food and registration.
+
+parse_caption() returns what it found plus a `complete` flag. Complete
+captions (one date, a start time, a location and a title line) are turned
+into events directly by rule_based_events(); anything else is passed to the
+LLM prompt as hints.
+"""
+
+import os
+import re
+from datetime import date, datetime, timedelta
+
+# Set to 0 to always call the LLM, using parsed fields only as hints
+RULES_ONLY_EXTRACTION = os.getenv("RULES_ONLY_EXTRACTION", "1") == "1"
+
+MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+MONTH_NAME = (
+    r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|"
+    r"aug(?:ust)?|sep(?:t|tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+)
+MONTH_DAY_RE = re.compile(
+    rf"\b{MONTH_NAME}\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(\d{{4}}))?", re.IGNORECASE
+)
+DAY_MONTH_RE = re.compile(
+    rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{MONTH_NAME}\b(?:,?\s+(\d{{4}}))?",
+    re.IGNORECASE,
+)
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+# Full names only: "sat" and "sun" are ordinary words
+WEEKDAY_RE = re.compile(
+    r"\b(mon|tue|wed|thu|fri|sat|sun)(?:day|sday|nesday|rsday|urday)\b", re.IGNORECASE
+)
+RELATIVE_RE = re.compile(r"\b(today|tonight|tomorrow)\b", re.IGNORECASE)
+RECURRING_RE = re.compile(r"\b(every|weekly|biweekly|each week)\b", re.IGNORECASE)
+
+CLOCK = r"(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?"
+TIME_RANGE_RE = re.compile(
+    rf"\b{CLOCK}\s*(?:-|\u2013|\u2014|to|until|till)\s*{CLOCK}(?![\d/])", re.IGNORECASE
+)
+TIME_RE = re.compile(
+    r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)(?!\w)|\b(\d{1,2}):(\d{2})\b|\b(noon)\b",
+    re.IGNORECASE,
+)
+
+LOCATION_LINE_RE = re.compile(
+    r"(?:📍|\blocation\s*:|\bwhere\s*:|\broom\s*:)\s*([^\n|•]+)", re.IGNORECASE
+)
+# Campus rooms ("DC 1302", "E7 4053"); four digits so course codes don't match
+ROOM_RE = re.compile(r"\b([A-Z]{1,4}\d?)\s?(\d{4})\b")
+# Capitalised words that precede a year rather than a room number
+NOT_BUILDINGS = {m.upper() for m in MONTHS} | {
+    "FALL",
+    "WINTER",
+    "SPRING",
+    "JUNE",
+    "JULY",
+    "SEPT",
+}
+
+PRICE_RE = re.compile(
+    r"\$\s?(\d+(?:\.\d{2})?)|\b(\d+(?:\.\d{2})?)\s*(?:dollars|bucks)\b", re.IGNORECASE
+)
+FREE_RE = re.compile(r"\bfree\b(?!\s+(?:food|pizza|snacks|drinks|swag))", re.IGNORECASE)
+REGISTRATION_RE = re.compile(
+    r"\b(rsvp|register|registration|sign[\s-]?up|tickets?)\b", re.IGNORECASE
+)
+
+# Food and drink terms, as written in the food field
+FOOD_TERMS = (
+    "pizza",
+    "bubble tea",
+    "boba",
+    "coffee",
+    "tea",
+    "hot chocolate",
+    "donuts",
+    "cookies",
+    "cupcakes",
+    "cake",
+    "ice cream",
+    "popcorn",
+    "candy",
+    "chips",
+    "samosas",
+    "dumplings",
+    "sushi",
+    "tacos",
+    "burgers",
+    "bbq",
+    "pancakes",
+    "breakfast",
+    "lunch",
+    "dinner",
+    "snacks",
+    "refreshments",
+    "drinks",
+    "pop",
+)
+FOOD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(term) for term in FOOD_TERMS) + r")\b", re.IGNORECASE
+)
+GENERIC_FOOD_RE = re.compile(r"\bfood\b", re.IGNORECASE)
+
+TITLE_MAX_WORDS = 8
+# First words of an opening sentence rather than a title
+NOT_TITLES = {
+    "hey",
+    "hi",
+    "hello",
+    "join",
+    "come",
+    "happy",
+    "we",
+    "we're",
+    "our",
+    "don't",
+    "calling",
+    "thank",
+    "thanks",
+}
+EMOJI_RE = re.compile(r"[^\w\s&'\u2019:!?.,\-/()#@+]")
+
+
+def _year_for(month, day, today):
+    """This year's date, or next year's if it's more than a month past"""
+    try:
+        candidate = date(today.year, month, day)
+    except ValueError:
+        return None
+    if candidate < today - timedelta(days=31):
+        candidate = candidate.replace(year=today.year + 1)
+    return candidate
+
+
+def _explicit_date(month, day, year, today):
+    if year:
+        try:
+            return date(int(year), month, day)
+        except ValueError:
+            return None
+    return _year_for(month, day, today)
+
+
+def parse_dates(text: str, today: date) -> tuple[list[date], list[int]]:
+    """Explicit dates in order of appearance, plus the weekdays mentioned"""
+    dates = [
+        _explicit_date(
+            MONTHS[m.group(1)[:3].lower()], int(m.group(2)), m.group(3), today
+        )
+        for m in MONTH_DAY_RE.finditer(text)
+    ]
+    dates += [
+        _explicit_date(
+            MONTHS[m.group(2)[:3].lower()], int(m.group(1)), m.group(3), today
+        )
+        for m in DAY_MONTH_RE.finditer(text)
+    ]
+    dates += [_iso_date(m.group(0)) for m in ISO_DATE_RE.finditer(text)]
+    for m in RELATIVE_RE.finditer(text):
+        offset = 1 if m.group(1).lower() == "tomorrow" else 0
+        dates.append(today + timedelta(days=offset))
+    weekdays = [WEEKDAYS.index(m.group(1).lower()) for m in WEEKDAY_RE.finditer(text)]
+    return list(dict.fromkeys(d for d in dates if d)), list(dict.fromkeys(weekdays))
+
+
+def _iso_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _next_weekday(weekday, today):
+    return today + timedelta(days=(weekday - today.weekday()) % 7)
+
+
+def _to_24h(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if hour > 23 or minute > 59:
+        return None
+    meridiem = (meridiem or "").replace(".", "").lower()
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_times(text: str) -> tuple[str, str]:
+    """(start_time, end_time) as HH:MM, empty strings where not found"""
+    for m in TIME_RANGE_RE.finditer(text):
+        start_h, start_m, start_mer, end_h, end_m, end_mer = m.groups()
+        if not (start_mer or end_mer or start_m or end_m):
+            continue  # "10-17" is more likely a date or score than a time
+        if not start_mer and end_mer:
+            # "6-8pm": the start shares the end's meridiem unless that puts it
+            # after the end ("11-1pm" starts in the morning)
+            start_mer = end_mer
+            if end_mer.lower().startswith("p") and int(start_h) % 12 > int(end_h) % 12:
+                start_mer = "am"
+        elif start_mer and not end_mer:
+            end_mer = start_mer
+        start = _to_24h(start_h, start_m, start_mer)
+        end = _to_24h(end_h, end_m, end_mer)
+        if start and end:
+            return start, end
+    for m in TIME_RE.finditer(text):
+        if m.group(6):
+            return "12:00", ""
+        hour, minute, meridiem = (
+            m.group(1, 2, 3) if m.group(1) else (m.group(4), m.group(5), None)
+        )
+        start = _to_24h(hour, minute, meridiem)
+        if start:
+            return start, ""
+    return "", ""
+
+
+def _room(text):
+    for m in ROOM_RE.finditer(text):
+        if m.group(1) not in NOT_BUILDINGS:
+            return f"{m.group(1)} {m.group(2)}"
+    return ""
+
+
+def parse_location(caption: str) -> str:
+    """The 📍/Location: line (just the room if it names one), else a room code"""
+    m = LOCATION_LINE_RE.search(caption)
+    room = _room(m.group(1) if m else "")
+    if room:
+        return room
+    if m:
+        # "📍 SLC Great Hall, 6pm. Bring a friend!": keep the place only
+        location = re.split(r"[.!;]\s", m.group(1) + " ")[0]
+        time_match = TIME_RE.search(location)
+        if time_match:
+            location = location[: time_match.start()]
+        return location.strip(" .,-@")
+    return _room(caption)
+
+
+def parse_prices(text: str) -> list[float]:
+    prices = [float(m.group(1) or m.group(2)) for m in PRICE_RE.finditer(text)]
+    return list(dict.fromkeys(prices))
+
+
+def parse_food(text: str) -> str:
+    """Food items in order of appearance, "Yes!" if food is only mentioned generically"""
+    items = list(dict.fromkeys(m.group(1).lower() for m in FOOD_RE.finditer(text)))
+    if not items:
+        return "Yes!" if GENERIC_FOOD_RE.search(text) else ""
+    items[0] = items[0][:1].upper() + items[0][1:]
+    return ", ".join(items)
+
+
+def _title_case(line):
+    if line.isupper():
+        return " ".join(word.capitalize() for word in line.split())
+    return " ".join(word[:1].upper() + word[1:] for word in line.split())
+
+
+def parse_title(caption: str) -> str:
+    """The caption's first line if it reads like a title, else an empty string"""
+    lines = [line.strip() for line in caption.strip().splitlines()]
+    if len(lines) < 2:
+        return ""
+    line = re.sub(r"\s+", " ", EMOJI_RE.sub(" ", lines[0])).strip(" -:!.,")
+    words = line.split()
+    if not 2 <= len(words) <= TITLE_MAX_WORDS or line.endswith("?"):
+        return ""
+    if words[0].lower() in NOT_TITLES or line.startswith(("@", "#")):
+        return ""
+    if TIME_RE.search(line) or MONTH_DAY_RE.search(line) or WEEKDAY_RE.search(line):
+        return ""
+    # Titles are capitalised ("Games Night", "GAMES NIGHT"), sentences aren't
+    capitalised = [w for w in words if w[:1].isupper()]
+    if len(capitalised) * 2 < len(words):
+        return ""
+    return _title_case(line)
+
+
+def parse_caption(caption: str, today: date | None = None) -> dict:
+    """Fields parsed from a caption, with complete=True if no LLM call is needed"""
+    caption = caption or ""
+    today = today or datetime.now().date()
+    text = caption.replace("\u2009", " ").replace("\u202f", " ")
+
+    dates, weekdays = parse_dates(text, today)
+    if not dates and len(weekdays) == 1:
+        dates = [_next_weekday(weekdays[0], today)]
+    # A weekday that disagrees with the only explicit date means one of them
+    # was misread (or there are two events)
+    consistent = not (
+        len(dates) == 1 and weekdays and dates[0].weekday() not in weekdays
+    )
+    start_time, end_time = parse_times(text)
+    prices = parse_prices(text)
+    facts = {
+        "dates": [d.isoformat() for d in dates],
+        "start_time": start_time,
+        "end_time": end_time,
+        "location": parse_location(text),
+        "price": prices[0] if len(prices) == 1 else None,
+        "prices": prices,
+        "free": bool(FREE_RE.search(text)) and not prices,
+        "food": parse_food(text),
+        "registration": bool(REGISTRATION_RE.search(text)),
+        "name": parse_title(text),
+        "recurring": bool(RECURRING_RE.search(text)),
+    }
+    facts["complete"] = bool(
+        len(dates) == 1
+        and consistent
+        and len(prices) <= 1
+        and start_time
+        and facts["location"]
+        and facts["name"]
+        and not facts["recurring"]
+        and dates[0] >= today
+    )
+    return facts
+
+
+def prompt_hints(facts: dict) -> dict:
+    """The parsed fields worth passing to the LLM (empty if nothing was found)"""
+    hints = {}
+    if facts["dates"]:
+        hints["dates"] = facts["dates"]
+    for key in ("start_time", "end_time", "location", "food", "name"):
+        if facts[key]:
+            hints[key] = facts[key]
+    if facts["prices"]:
+        hints["prices"] = facts["prices"]
+    elif facts["free"]:
+        hints["price"] = None
+    return hints
+
+
+def rule_based_events(
+    facts: dict, caption: str, image_url: str | None = None
+) -> list[dict]:
+    """The single event of a complete parse, in the LLM extraction's format"""
+    return [
+        {
+            "name": facts["name"],
+            "date": facts["dates"][0],
+            "start_time": facts["start_time"],
+            "end_time": facts["end_time"],
+            "location": facts["location"],
+            "price": facts["price"],
+            "food": facts["food"],
+            "registration": facts["registration"],
+            "image_url": image_url or "",
+            "description": caption,
+        }
+    ]
@@ -0,0 +1,22 @@
+import hashlib
+import re
+from datetime import date
+
+
+def normalize_string(s):
+    if not s:
+        return ""
+    return re.sub(r"\W+", "", s).lower().strip()
+
+
+def build_dedup_key(title: str, event_date: date | str, location: str) -> str | None:
+    """
+    Build the stored dedup key for an event: SHA-256 of normalized title,
+    ISO date and normalized location. Returns None if there is no date.
+    """
+    if not event_date:
+        return None
+    if isinstance(event_date, date):
+        event_date = event_date.isoformat()
+    raw = f"{normalize_string(title)}|{event_date.strip()}|{normalize_string(location)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -0,0 +1,225 @@
+"""
+CPU-only pre-classifier that scores how likely a caption announces an event,
+so clear non-events (recaps, memes, member spotlights) can skip the LLM.
+
+Captions are reduced to a handful of keyword, date, time, location and price
+features and scored with a logistic model. Hand-set weights are used unless a
+model trained by scraping/train_event_classifier.py exists at MODEL_PATH.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path(
+    os.getenv(
+        "EVENT_CLASSIFIER_MODEL",
+        Path(__file__).resolve().parent.parent / "scraping" / "event_classifier.json",
+    )
+)
+# Captions scoring below this are skipped; keep it low so only clear
+# non-events are dropped
+THRESHOLD = float(os.getenv("EVENT_CLASSIFIER_THRESHOLD", "0.15"))
+# Shorter captions carry too little signal (the event may be in the image)
+MIN_WORDS = 8
+
+EVENT_TERMS = (
+    "join us",
+    "join",
+    "come",
+    "rsvp",
+    "register",
+    "registration",
+    "sign up",
+    "signup",
+    "tickets",
+    "link in bio",
+    "location",
+    "room",
+    "workshop",
+    "meeting",
+    "info session",
+    "panel",
+    "talk",
+    "hackathon",
+    "tournament",
+    "social",
+    "mixer",
+    "party",
+    "night",
+    "free",
+    "pizza",
+    "food",
+    "snacks",
+    "drinks",
+    "see you",
+    "don't miss",
+    "happening",
+    "event",
+)
+NON_EVENT_TERMS = (
+    "recap",
+    "thank you",
+    "thanks to everyone",
+    "thanks for coming",
+    "thanks for joining",
+    "congrats",
+    "congratulations",
+    "meet our",
+    "meet the",
+    "introducing",
+    "throwback",
+    "highlights",
+    "was a blast",
+    "what a night",
+    "winner",
+    "we're hiring",
+    "applications are open",
+    "apply now",
+    "happy birthday",
+)
+MONTHS = (
+    r"jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|"
+    r"sep(t|tember)?|oct(ober)?|nov(ember)?|dec(ember)?"
+)
+WEEKDAYS = r"mon(day)?|tue(s|sday)?|wed(nesday)?|thu(rs|rsday)?|fri(day)?|sat(urday)?|sun(day)?"
+
+DATE_RE = re.compile(
+    rf"\b(({MONTHS})\.?\s+\d{{1,2}}(st|nd|rd|th)?|\d{{1,2}}(st|nd|rd|th)?\s+({MONTHS})\b"
+    rf"|\d{{1,2}}/\d{{1,2}}(/\d{{2,4}})?|{WEEKDAYS}|tonight|tomorrow|this week(end)?)\b",
+    re.IGNORECASE,
+)
+TIME_RE = re.compile(
+    r"\b(\d{1,2}(:\d{2})?\s*(am|pm)|\d{1,2}:\d{2}|noon|midnight)\b", re.IGNORECASE
+)
+# Campus room codes ("DC 1302", "SLC 3103", "E7 4053"), matched case-sensitively
+ROOM_RE = re.compile(r"\b[A-Z]{1,4}\d?\s?\d{3,4}\b")
+LOCATION_RE = re.compile(r"📍|\blocation:|\bwhere:", re.IGNORECASE)
+PRICE_RE = re.compile(r"\$\s?\d+|\bfree\b", re.IGNORECASE)
+PAST_RE = re.compile(
+    r"\b(was|were|had|thanks for|last (week|night|weekend))\b", re.IGNORECASE
+)
+
+
+def _terms_re(terms):
+    """One word-bounded alternation, longest first so a phrase beats its words"""
+    alternatives = sorted(terms, key=len, reverse=True)
+    return re.compile(rf"\b(?:{'|'.join(map(re.escape, alternatives))})\b")
+
+
+EVENT_TERMS_RE = _terms_re(EVENT_TERMS)
+NON_EVENT_TERMS_RE = _terms_re(NON_EVENT_TERMS)
+
+# Bumped whenever feature extraction changes; models trained on other
+# features are ignored until retrained
+FEATURES_VERSION = 2
+FEATURES = (
+    "bias",
+    "event_terms",
+    "non_event_terms",
+    "has_date",
+    "has_time",
+    "has_location",
+    "has_price",
+    "past_tense",
+    "log_words",
+)
+
+DEFAULT_WEIGHTS = {
+    "bias": -1.5,
+    "event_terms": 0.6,
+    "non_event_terms": -1.5,
+    "has_date": 1.5,
+    "has_time": 1.5,
+    "has_location": 1.0,
+    "has_price": 0.5,
+    "past_tense": -0.7,
+    "log_words": 0.1,
+}
+
+
+def _count_terms(text, terms_re):
+    """Distinct whole-word terms in text; a phrase doesn't also count its words"""
+    return len(set(terms_re.findall(text)))
+
+
+def caption_features(caption: str) -> dict[str, float]:
+    text = (caption or "").lower()
+    # Words inside a non-event phrase ("what a night") aren't event terms
+    event_text = NON_EVENT_TERMS_RE.sub(" ", text)
+    return {
+        "bias": 1.0,
+        "event_terms": min(_count_terms(event_text, EVENT_TERMS_RE), 5),
+        "non_event_terms": min(_count_terms(text, NON_EVENT_TERMS_RE), 3),
+        "has_date": float(bool(DATE_RE.search(text))),
+        "has_time": float(bool(TIME_RE.search(text))),
+        "has_location": float(
+            bool(ROOM_RE.search(caption or "") or LOCATION_RE.search(text))
+        ),
+        "has_price": float(bool(PRICE_RE.search(text))),
+        "past_tense": float(bool(PAST_RE.search(text))),
+        "log_words": math.log1p(len(text.split())),
+    }
+
+
+def _sigmoid(z):
+    return 1 / (1 + math.exp(-max(min(z, 30), -30)))
+
+
+class EventClassifier:
+    def __init__(self, weights: dict[str, float] | None = None, threshold=THRESHOLD):
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH, threshold=THRESHOLD):
+        """Trained weights from path if present and current, else the hand-set defaults"""
+        try:
+            model = json.loads(Path(path).read_text(encoding="utf-8"))
+            if model.get("features_version") != FEATURES_VERSION:
+                logger.warning(
+                    f"Classifier model {path} was trained on older features, "
+                    "using the default weights until it is retrained"
+                )
+                return cls(threshold=threshold)
+            return cls(model["weights"], threshold)
+        except FileNotFoundError:
+            return cls(threshold=threshold)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable classifier model {path}: {e}")
+            return cls(threshold=threshold)
+
+    def score(self, caption: str) -> float:
+        features = caption_features(caption)
+        return _sigmoid(sum(self.weights.get(k, 0.0) * v for k, v in features.items()))
+
+    def is_probable_event(self, caption: str) -> tuple[bool, float]:
+        """(keep, score); short or empty captions are always kept"""
+        if len((caption or "").split()) < MIN_WORDS:
+            return True, 1.0
+        score = self.score(caption)
+        return score >= self.threshold, score
+
+
+def train(samples, epochs=300, learning_rate=0.1, l2=0.001) -> dict[str, float]:
+    """Fit logistic weights on (caption, is_event) pairs by batch gradient descent"""
+    rows = [(caption_features(caption), float(label)) for caption, label in samples]
+    weights = dict.fromkeys(FEATURES, 0.0)
+    for _ in range(epochs):
+        gradient = dict.fromkeys(FEATURES, 0.0)
+        for features, label in rows:
+            error = _sigmoid(sum(weights[k] * features[k] for k in FEATURES)) - label
+            for k in FEATURES:
+                gradient[k] += error * features[k]
+        for k in FEATURES:
+            weights[k] -= learning_rate * (gradient[k] / len(rows) + l2 * weights[k])
+    return weights
+
+
+# Singleton instance
+event_classifier = EventClassifier.load()
@@ -0,0 +1,148 @@
+"""
+In-memory clustering of the events a scraper run extracts, so copies of one
+event posted by several clubs resolve against each other without a pgvector
+query per copy.
+
+Events are blocked by date: only events on the same day are compared, by
+cosine similarity of their embeddings (one matrix-vector product per event).
+Each cluster keeps one canonical item; a new copy either joins its cluster
+as a duplicate or, if preferred, takes over as the canonical.
+
+Posts are prepared and written concurrently, so a canonical can be replaced
+while its own write is running. Items are dicts moving through
+preparing -> queued (attach) -> writing (begin_write) -> written (end_write),
+and every transition, like supersede(), happens under the index lock: a
+replaced copy is either dropped before its write starts or, once written,
+replaced by id, never both written.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+IN_RUN_DEDUP_THRESHOLD = float(os.getenv("IN_RUN_DEDUP_THRESHOLD", "0.90"))
+# How long a richer copy waits for the copy it replaces to finish writing
+RUN_WRITE_WAIT_SECONDS = float(os.getenv("RUN_WRITE_WAIT_SECONDS", "30"))
+
+PREPARING, QUEUED, WRITING, WRITTEN = "preparing", "queued", "writing", "written"
+
+
+def _unit(embedding) -> np.ndarray | None:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class _Block:
+    """Unit embeddings of one date's clusters and their canonical items"""
+
+    def __init__(self):
+        self.vectors = []
+        self.canonicals = []
+        self._matrix = None
+
+    def best_match(self, vector: np.ndarray) -> tuple[int | None, float]:
+        if not self.vectors:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+
+    def append(self, vector: np.ndarray, item):
+        self.vectors.append(vector)
+        self.canonicals.append(item)
+        self._matrix = None
+
+
+class RunEventIndex:
+    """Clusters of near-duplicate events seen during one run"""
+
+    def __init__(self, threshold: float = IN_RUN_DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._blocks = {}
+        self._lock = threading.Condition()
+
+    def claim(self, block_key, embedding, item, prefer):
+        """
+        Place item in its cluster. Returns (previous canonical, accepted):
+
+        - (None, True): nothing similar on that date yet; item starts a cluster
+        - (canonical, True): prefer(item, canonical) held; item replaces it
+        - (canonical, False): item is a duplicate of the canonical
+
+        Items without a date or embedding are always (None, True) and not indexed.
+        """
+        vector = (
+            _unit(embedding)
+            if block_key is not None and embedding is not None
+            else None
+        )
+        if vector is None:
+            return None, True
+        with self._lock:
+            block = self._blocks.setdefault(block_key, _Block())
+            index, similarity = block.best_match(vector)
+            if index is None or similarity < self.threshold:
+                block.append(vector, item)
+                return None, True
+            canonical = block.canonicals[index]
+            if prefer(item, canonical):
+                block.canonicals[index] = item
+                return canonical, True
+            return canonical, False
+
+    def attach(self, item: dict, payload) -> bool:
+        """Queue a prepared item for writing; False if it was superseded meanwhile"""
+        with self._lock:
+            if item.get("superseded"):
+                return False
+            item["payload"] = payload
+            item["state"] = QUEUED
+            return True
+
+    def begin_write(self, item: dict | None) -> bool:
+        """Claim an item for writing; False if a richer copy superseded it first"""
+        if item is None:
+            return True
+        with self._lock:
+            if item.get("superseded"):
+                return False
+            item["state"] = WRITING
+            return True
+
+    def end_write(self, item: dict | None):
+        """Mark an item's write finished (written or failed) and wake waiters"""
+        if item is None:
+            return
+        with self._lock:
+            item["state"] = WRITTEN
+            self._lock.notify_all()
+
+    def supersede(self, earlier: dict, timeout: float = RUN_WRITE_WAIT_SECONDS):
+        """
+        Resolve the canonical a preferred item just replaced. Returns
+        (outcome, payload):
+
+        - ("dropped", payload): it was queued and now won't be written
+        - ("written", payload): its write finished (waited for if running)
+        - ("unknown", None): still preparing (it drops itself on attach) or
+          still writing after timeout
+        """
+        with self._lock:
+            state = earlier.get("state", PREPARING)
+            if state in (PREPARING, QUEUED):
+                earlier["superseded"] = True
+                if state == PREPARING:
+                    return "unknown", None
+                return "dropped", earlier["payload"]
+            if not self._lock.wait_for(
+                lambda: earlier["state"] == WRITTEN, timeout=timeout
+            ):
+                return "unknown", None
+            return "written", earlier["payload"]
+
+    def __len__(self):
+        return sum(len(block.canonicals) for block in self._blocks.values())
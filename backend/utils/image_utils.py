@@ -0,0 +1,214 @@
+"""
+Downloaded image handling shared by the storage service and the scrapers.
+
+Downloads are read in chunks through CappedBuffer, which rejects a body as
+soon as its first bytes aren't a supported image or it grows past the size
+cap. ImageData carries the bytes with the format and dimensions read from the
+header only; pixels are decoded once, on first use of decode().
+"""
+
+import hashlib
+import os
+from io import BytesIO
+
+from PIL import Image, features
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Decompression bomb guard, checked from the header before decoding
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+SUPPORTED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+# Output formats for derivatives, by file extension
+DERIVATIVE_FORMATS = {"webp": "WEBP", "avif": "AVIF", "jpg": "JPEG"}
+
+
+class ImageRejectedError(ValueError):
+    """A download that isn't a supported image or is over the size cap"""
+
+    MESSAGES = {
+        "declared_too_large": "Image too large: {size} bytes declared (limit {limit})",
+        "too_large": "Image too large: {size} bytes (limit {limit})",
+        "over_limit": "Image too large: over {limit} bytes",
+        "too_many_pixels": "Image too large: {width}x{height}",
+        "not_an_image": "Not a supported image (starts with {head!r})",
+        "unreadable": "Unreadable image header: {error}",
+        "unsupported_format": "Unsupported image format: {format}",
+    }
+
+    def __init__(self, reason: str, **details):
+        self.reason = reason
+        self.details = details
+        super().__init__(self.MESSAGES[reason].format(**details))
+
+
+class DerivativeSpecError(ValueError):
+    """A DERIVATIVE_SPECS entry with an output format we can't write"""
+
+    def __init__(self, ext: str):
+        self.ext = ext
+        super().__init__(f"Unsupported derivative format: {ext}")
+
+
+def sniff_format(head: bytes) -> str | None:
+    """Image format from the file signature, or None if unsupported"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+class CappedBuffer:
+    """Accumulates downloaded chunks, rejecting non-images and oversized bodies early"""
+
+    def __init__(self, limit: int = MAX_IMAGE_BYTES):
+        self.limit = limit
+        self.buffer = bytearray()
+        self.format = None
+
+    def check_length(self, content_length: str | None):
+        if content_length and int(content_length) > self.limit:
+            raise ImageRejectedError(
+                "declared_too_large", size=content_length, limit=self.limit
+            )
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        if len(self.buffer) > self.limit:
+            raise ImageRejectedError("over_limit", limit=self.limit)
+        if self.format is None and len(self.buffer) >= 12:
+            self.format = sniff_format(bytes(self.buffer[:12]))
+            if self.format is None:
+                raise ImageRejectedError("not_an_image", head=bytes(self.buffer[:12]))
+
+    def getvalue(self) -> bytes:
+        return bytes(self.buffer)
+
+
+class ImageData:
+    """Image bytes plus the format and dimensions read from the header"""
+
+    def __init__(self, data: bytes, image_format: str, width: int, height: int):
+        self.data = data
+        self.format = image_format
+        self.width = width
+        self.height = height
+        self._decoded = None
+        self._sha256 = None
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ImageData":
+        """Read the header only; raises ImageRejectedError for unusable images"""
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ImageRejectedError("too_large", size=len(data), limit=MAX_IMAGE_BYTES)
+        if sniff_format(data[:12]) is None:
+            raise ImageRejectedError("not_an_image", head=data[:12])
+        try:
+            img = Image.open(BytesIO(data))  # lazy: parses the header only
+        except Exception as e:
+            raise ImageRejectedError("unreadable", error=e) from e
+        if img.format not in SUPPORTED_FORMATS:
+            raise ImageRejectedError("unsupported_format", format=img.format)
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise ImageRejectedError(
+                "too_many_pixels", width=img.width, height=img.height
+            )
+        image = cls(data, img.format, img.width, img.height)
+        image._decoded = img
+        return image
+
+    @property
+    def ext(self) -> str:
+        return SUPPORTED_FORMATS[self.format]
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.format.lower()}"
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    def dhash(self) -> int:
+        """64-bit difference hash; near-identical crops and re-encodes differ in few bits"""
+        pixels = (
+            self.decode()
+            .convert("L")
+            .resize((9, 8), Image.Resampling.LANCZOS)
+            .tobytes()
+        )
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+                bits = bits << 1 | (left > right)
+        return bits
+
+    def decode(self) -> Image.Image:
+        """The decoded image, decoding the pixels on first call only"""
+        if self._decoded is None:
+            self._decoded = Image.open(BytesIO(self.data))
+        self._decoded.load()
+        return self._decoded
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"<ImageData {self.format} {self.width}x{self.height} {len(self.data)} bytes>"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def render_variant(
+    decoded: Image.Image, max_side: int, image_format: str = "JPEG", quality: int = 75
+) -> bytes:
+    """Re-encode an image scaled down to fit max_side (never scaled up)"""
+    variant = decoded.copy()
+    if variant.mode not in ("RGB", "RGBA") or (
+        image_format == "JPEG" and variant.mode != "RGB"
+    ):
+        variant = variant.convert("RGB")
+    variant.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=quality, optimize=image_format == "JPEG")
+    return buffer.getvalue()
+
+
+def parse_derivative_specs(text: str) -> list[tuple[str, int, str]]:
+    """
+    "thumb:160:webp,card:480:avif" -> [(name, max_side, ext), ...]. AVIF falls
+    back to WebP when this Pillow build can't encode it
+    """
+    specs = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, max_side, ext = item.split(":")
+        if ext not in DERIVATIVE_FORMATS:
+            raise DerivativeSpecError(ext)
+        if ext == "avif" and not features.check("avif"):
+            ext = "webp"
+        specs.append((name, int(max_side), ext))
+    return specs
+
+
+def render_derivatives(
+    data: bytes, specs: list[tuple[str, int, str]], quality: int = 75
+) -> list[tuple[str, str, bytes]]:
+    """
+    Decode once and render every (name, max_side, ext) spec, returning
+    (name, ext, bytes) for each. Runs in a worker process, so it takes and
+    returns plain bytes
+    """
+    decoded = Image.open(BytesIO(data))
+    decoded.load()
+    return [
+        (name, ext, render_variant(decoded, max_side, DERIVATIVE_FORMATS[ext], quality))
+        for name, max_side, ext in specs
+    ]
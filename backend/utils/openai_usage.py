@@ -0,0 +1,172 @@
+"""
+Token, cost and latency accounting for OpenAI calls, plus the budgets that
+decide when callers should degrade (text-only extraction, lexical search).
+
+Every call is recorded under an endpoint name ("extraction", "embeddings",
+"search", ...) with its model, prompt/completion/cached tokens and latency.
+Totals are kept since the last reset (one scraper run), and recent calls are
+kept for rolling-window budgets (e.g. search cost per hour in the web app).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+}
+# Endpoints whose requests go through the Batch API, billed at
+# BATCH_PRICE_FACTOR of the prices above
+BATCH_ENDPOINTS = {"extraction_batch"}
+BATCH_PRICE_FACTOR = 0.5
+
+
+def _env_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+# Per scraper run: beyond the image budget extraction goes text-only, beyond
+# the run budget no more calls are made
+RUN_BUDGET_USD = _env_float("OPENAI_RUN_BUDGET_USD")
+IMAGE_BUDGET_USD = _env_float("OPENAI_IMAGE_BUDGET_USD")
+# Mean extraction latency above which images are dropped as well
+EXTRACTION_LATENCY_BUDGET_S = _env_float("OPENAI_EXTRACTION_LATENCY_BUDGET_S")
+# Search embeddings: rolling hourly spend and a per-call timeout
+SEARCH_BUDGET_USD_PER_HOUR = _env_float("OPENAI_SEARCH_BUDGET_USD_PER_HOUR")
+SEARCH_TIMEOUT_S = float(os.getenv("OPENAI_SEARCH_TIMEOUT_S", "3"))
+
+RECENT_CALLS = 10000
+
+
+def _usage_field(usage, name):
+    """A usage field from an SDK usage object or a raw (Batch API) usage dict"""
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+def call_cost(model, prompt_tokens, completion_tokens, cached_tokens=0) -> float:
+    prices = next(
+        (p for name, p in MODEL_PRICES.items() if model and model.startswith(name)),
+        None,
+    )
+    if not prices:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+class UsageTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=RECENT_CALLS)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def record(self, endpoint: str, model: str, usage=None, latency_s=0.0, error=False):
+        """
+        Record one call; usage is the response's usage object or a Batch API
+        usage dict (or None). Calls to BATCH_ENDPOINTS get the batch price.
+        """
+        prompt_tokens = _usage_field(usage, "prompt_tokens") or 0
+        completion_tokens = _usage_field(usage, "completion_tokens") or 0
+        details = _usage_field(usage, "prompt_tokens_details")
+        cached_tokens = _usage_field(details, "cached_tokens") or 0
+        cost = call_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        if endpoint in BATCH_ENDPOINTS:
+            cost *= BATCH_PRICE_FACTOR
+        with self._lock:
+            stats = self.endpoints.setdefault(
+                endpoint,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "cache_hits": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cached_tokens": 0,
+                    "cost_usd": 0.0,
+                    "latency_s": 0.0,
+                    "max_latency_s": 0.0,
+                    "models": {},
+                },
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["cache_hits"] += int(cached_tokens > 0)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["cost_usd"] += cost
+            stats["latency_s"] += latency_s
+            stats["max_latency_s"] = max(stats["max_latency_s"], latency_s)
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            self._recent.append((time.monotonic(), endpoint, cost))
+
+    def total_cost(self, endpoint: str | None = None) -> float:
+        with self._lock:
+            if endpoint:
+                return self.endpoints.get(endpoint, {}).get("cost_usd", 0.0)
+            return sum(s["cost_usd"] for s in self.endpoints.values())
+
+    def mean_latency(self, endpoint: str) -> float:
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            return stats["latency_s"] / stats["calls"] if stats else 0.0
+
+    def window_cost(self, endpoint: str, seconds: float) -> float:
+        since = time.monotonic() - seconds
+        with self._lock:
+            return sum(c for t, e, c in self._recent if e == endpoint and t >= since)
+
+    def report(self) -> dict:
+        with self._lock:
+            endpoints = {
+                name: {
+                    **stats,
+                    "models": dict(stats["models"]),
+                    "mean_latency_s": stats["latency_s"] / stats["calls"],
+                }
+                for name, stats in self.endpoints.items()
+            }
+        return {
+            "cost_usd": sum(s["cost_usd"] for s in endpoints.values()),
+            "tokens": sum(
+                s["prompt_tokens"] + s["completion_tokens"] for s in endpoints.values()
+            ),
+            "endpoints": endpoints,
+        }
+
+    def over_run_budget(self) -> bool:
+        return RUN_BUDGET_USD is not None and self.total_cost() >= RUN_BUDGET_USD
+
+    def allow_image_input(self) -> bool:
+        """False once the run is past its image budget or extraction is too slow"""
+        if IMAGE_BUDGET_USD is not None and self.total_cost() >= IMAGE_BUDGET_USD:
+            return False
+        return not (
+            EXTRACTION_LATENCY_BUDGET_S is not None
+            and self.mean_latency("extraction") > EXTRACTION_LATENCY_BUDGET_S
+        )
+
+    def allow_search_embedding(self) -> bool:
+        return (
+            SEARCH_BUDGET_USD_PER_HOUR is None
+            or self.window_cost("search", 3600) < SEARCH_BUDGET_USD_PER_HOUR
+        )
+
+
+# Singleton instance
+openai_usage = UsageTracker()
@@ -0,0 +1,142 @@
+"""
+Routes requests for selected hosts through a pool of proxy endpoints.
+
+ProxyPool.mount(session) installs one shared ProxyRoutingAdapter on a
+requests.Session. Requests to a routed host (PROXY_HOSTS, matched by domain
+suffix) go through the first healthy endpoint; everything else goes direct.
+An endpoint that refuses or times out the connection is put on cooldown and
+the request fails over to the next one. Because the adapter is shared, its
+connection pools are reused by every session it's mounted on.
+"""
+
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.exceptions import ConnectTimeout, ProxyError
+
+from utils.http_session import TimeoutHTTPAdapter
+from utils.run_metrics import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+PROXY_HOSTS = os.getenv("PROXY_HOSTS", "instagram.com")
+PROXY_HEALTH_URL = os.getenv("PROXY_HEALTH_URL", "https://ipapi.co/json/")
+PROXY_COOLDOWN = float(os.getenv("PROXY_COOLDOWN", "60"))
+PROXY_POOL_SIZE = int(os.getenv("PROXY_POOL_SIZE", "8"))
+
+
+def _split(text: str | None) -> list[str]:
+    return [item.strip() for item in (text or "").split(",") if item.strip()]
+
+
+class ProxyPool:
+    """Proxy endpoints for a set of hosts, with health checks and failover"""
+
+    def __init__(self, endpoints, hosts, headers=None, cert_path=None):
+        self.endpoints = list(endpoints)
+        self.hosts = [host.lower().lstrip(".") for host in hosts]
+        self.headers = dict(headers or {})
+        self.verify = str(cert_path) if cert_path else True
+        self._failed_at = {}
+        self._lock = threading.Lock()
+        self.adapter = ProxyRoutingAdapter(self)
+
+    @classmethod
+    def from_env(cls, headers=None, cert_path=None) -> "ProxyPool":
+        """Endpoints from PROXY_URLS (comma separated), else ZYTE_PROXY"""
+        endpoints = _split(os.getenv("PROXY_URLS")) or _split(os.getenv("ZYTE_PROXY"))
+        return cls(endpoints, _split(PROXY_HOSTS), headers, cert_path)
+
+    def routes(self, url: str) -> bool:
+        """Whether requests to this URL should go through the proxy"""
+        if not self.endpoints:
+            return False
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == h or host.endswith(f".{h}") for h in self.hosts)
+
+    def candidates(self) -> list[str]:
+        """Healthy endpoints in configured order, then cooling ones, oldest failure first"""
+        now = time.monotonic()
+        with self._lock:
+            cooling = {
+                endpoint: failed_at
+                for endpoint, failed_at in self._failed_at.items()
+                if now - failed_at < PROXY_COOLDOWN
+            }
+        healthy = [endpoint for endpoint in self.endpoints if endpoint not in cooling]
+        return healthy + sorted(cooling, key=cooling.get)
+
+    def mark_failed(self, endpoint: str, error: Exception):
+        with self._lock:
+            self._failed_at[endpoint] = time.monotonic()
+        pipeline_metrics.count("proxy_failures")
+        logger.warning(f"Proxy {_redact(endpoint)} failed: {error}")
+
+    def mark_ok(self, endpoint: str):
+        if endpoint in self._failed_at:
+            with self._lock:
+                self._failed_at.pop(endpoint, None)
+
+    def check(self, endpoint: str, timeout: float = 15) -> bool:
+        """Fetch PROXY_HEALTH_URL through the endpoint"""
+        try:
+            resp = requests.get(
+                PROXY_HEALTH_URL,
+                proxies={"http": endpoint, "https": endpoint},
+                headers=self.headers,
+                verify=self.verify,
+                timeout=timeout,
+            )
+            resp.raise_for_status()
+        except Exception as e:
+            self.mark_failed(endpoint, e)
+            return False
+        self.mark_ok(endpoint)
+        logger.debug(f"Proxy {_redact(endpoint)} healthy: {resp.text[:200]}")
+        return True
+
+    def health_check(self) -> int:
+        """Check every endpoint; returns how many are healthy"""
+        return sum(self.check(endpoint) for endpoint in self.endpoints)
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+
+class ProxyRoutingAdapter(TimeoutHTTPAdapter):
+    """Sends routed hosts through the pool's endpoints, failing over on connect errors"""
+
+    def __init__(self, pool: ProxyPool):
+        self.pool = pool
+        super().__init__(pool_connections=PROXY_POOL_SIZE, pool_maxsize=PROXY_POOL_SIZE)
+
+    def send(self, request, **kwargs):
+        if not self.pool.routes(request.url):
+            return super().send(request, **kwargs)
+        request.headers.update(self.pool.headers)
+        kwargs["verify"] = self.pool.verify
+        error = None
+        for endpoint in self.pool.candidates():
+            kwargs["proxies"] = {"http": endpoint, "https": endpoint}
+            try:
+                response = super().send(request, **kwargs)
+            # The request never reached the target, so another endpoint can retry it
+            except (ProxyError, ConnectTimeout) as e:
+                self.pool.mark_failed(endpoint, e)
+                error = e
+                continue
+            self.pool.mark_ok(endpoint)
+            return response
+        raise error
+
+
+def _redact(endpoint: str) -> str:
+    """Endpoint URL without credentials, for logs"""
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.hostname}:{parts.port}" if parts.hostname else "?"
@@ -0,0 +1,157 @@
+"""
+Per-stage timing and counters for the scraping pipeline.
+
+Stages are timed with `pipeline_metrics.stage(name)`; a stage counts as an
+error if its block raises or calls `fail()`. At the end of a run the totals are
+written as a JSON report and, optionally, in Prometheus text exposition format
+(for the node_exporter textfile collector).
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class StageTimer:
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+
+    def _record(self, name: str, seconds: float, failed: bool):
+        with self._lock:
+            stats = self.stages.setdefault(
+                name, {"count": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0}
+            )
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["total_s"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        timer = StageTimer()
+        started = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.fail()
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started, timer.failed)
+
+    def timed_iter(self, name: str, iterable):
+        """Yield from iterable, timing each fetch of the next item as a stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {
+                    **stats,
+                    "mean_s": stats["total_s"] / stats["count"] if stats["count"] else 0.0,
+                    "error_rate": stats["errors"] / stats["count"] if stats["count"] else 0.0,
+                }
+                for name, stats in self.stages.items()
+            }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "duration_s": time.perf_counter() - self._started,
+                "counters": dict(self.counters),
+                "stages": stages,
+            }
+
+    def to_prometheus(self, prefix: str = "scraper") -> str:
+        report = self.report()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+
+        stages = sorted(report["stages"].items())
+        metric(
+            "stage_calls_total",
+            "counter",
+            "Number of times each pipeline stage ran.",
+            [(f'{{stage="{name}"}}', s["count"]) for name, s in stages],
+        )
+        metric(
+            "stage_errors_total",
+            "counter",
+            "Number of failed runs of each pipeline stage.",
+            [(f'{{stage="{name}"}}', s["errors"]) for name, s in stages],
+        )
+        metric(
+            "stage_duration_seconds_total",
+            "counter",
+            "Total time spent in each pipeline stage.",
+            [(f'{{stage="{name}"}}', round(s["total_s"], 6)) for name, s in stages],
+        )
+        metric(
+            "stage_duration_seconds_max",
+            "gauge",
+            "Slowest single run of each pipeline stage.",
+            [(f'{{stage="{name}"}}', round(s["max_s"], 6)) for name, s in stages],
+        )
+        metric(
+            "events_total",
+            "counter",
+            "Pipeline counters (posts processed, events added, ...).",
+            [(f'{{name="{name}"}}', value) for name, value in sorted(report["counters"].items())],
+        )
+        metric(
+            "run_duration_seconds",
+            "gauge",
+            "Wall-clock duration of the run.",
+            [("", round(report["duration_s"], 6))],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_report(
+        self,
+        json_path: Path,
+        prometheus_path: Path | None = None,
+        extra: dict | None = None,
+    ):
+        """Write the JSON report (plus any extra sections) and optional Prometheus file"""
+        json_path = Path(json_path)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        report = {**self.report(), **(extra or {})}
+        json_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        if prometheus_path:
+            Path(prometheus_path).write_text(self.to_prometheus(), encoding="utf-8")
+
+
+# Singleton instance
+pipeline_metrics = RunMetrics()
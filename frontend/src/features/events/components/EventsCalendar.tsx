@@ -84,7 +84,7 @@ const EventPopup: React.FC<{
     {event.image_url && (
       <div className="mb-3 -mx-4 -mt-4">
         <img
-          src={event.image_url}
+          src={event.image_variants?.card ?? event.image_url}
           alt={event.name}
           className="w-full h-40 object-cover rounded-t-lg"
           onError={(e) => {
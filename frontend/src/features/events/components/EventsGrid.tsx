@@ -152,7 +152,7 @@ const EventsGrid = memo(
                 {/* Event Image */}
                 {event.image_url && (
                   <img
-                    src={event.image_url}
+                    src={event.image_variants?.card ?? event.image_url}
                     alt={event.name}
                     loading="lazy"
                     className="w-full h-40 object-cover rounded-t-xl"
@@ -8,6 +8,7 @@ export interface Event {
   end_time: string | null;
   location: string;
   image_url: string | null;
+  image_variants?: { thumb?: string; card?: string; full?: string } | null;
   categories?: string[];
   price: number | null;
   food: string | null;